@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def stamp_existing_menus(apps, schema_editor):
+    Business = apps.get_model('businesses', 'Business')
+    MenuItem = apps.get_model('menus', 'MenuItem')
+    newest_items = dict(
+        MenuItem.objects.values_list('category__business_id').annotate(newest=Max('updated_at'))
+    )
+    businesses = list(Business.objects.all())
+    for business in businesses:
+        newest = newest_items.get(business.pk)
+        business.menu_updated_at = max(business.updated_at, newest) if newest else business.updated_at
+    Business.objects.bulk_update(businesses, ['menu_updated_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0002_business_show_hours_businesshour_is_visible'),
+        ('menus', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='menu_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(stamp_existing_menus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:32
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_existing_menus(apps, schema_editor):
+    Business = apps.get_model('businesses', 'Business')
+    MenuCategory = apps.get_model('menus', 'MenuCategory')
+    MenuItem = apps.get_model('menus', 'MenuItem')
+    categories = dict(MenuCategory.objects.values_list('business_id').annotate(total=Count('pk')))
+    items = {
+        row['category__business_id']: row
+        for row in MenuItem.objects.values('category__business_id').annotate(
+            items=Count('pk'),
+            active=Count('pk', filter=Q(is_active=True)),
+            featured=Count('pk', filter=Q(is_featured=True)),
+        )
+    }
+    businesses = list(Business.objects.all())
+    for business in businesses:
+        totals = items.get(business.pk, {})
+        business.categories_count = categories.get(business.pk, 0)
+        business.items_count = totals.get('items', 0)
+        business.active_items_count = totals.get('active', 0)
+        business.featured_items_count = totals.get('featured', 0)
+    Business.objects.bulk_update(
+        businesses,
+        ['categories_count', 'items_count', 'active_items_count', 'featured_items_count'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0003_business_menu_updated_at'),
+        ('menus', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='active_items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='categories_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='featured_items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_menus, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
-from django.utils.text import slugify
+
+from .slugs import UniqueSlugMixin
 
 User = get_user_model()
 
 
-class Business(models.Model):
+class Business(UniqueSlugMixin, models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='businesses')
     name = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, help_text="آدرس یکتای منو")
@@ -29,24 +30,34 @@ class Business(models.Model):
     show_hours = models.BooleanField(default=True, verbose_name="نمایش ساعات کاری", help_text="آیا ساعات کاری در منو نمایش داده شود؟")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    menu_updated_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # Dashboard counters, kept in step by menus.counters (see `recount_menus`).
+    categories_count = models.PositiveIntegerField(default=0, editable=False)
+    items_count = models.PositiveIntegerField(default=0, editable=False)
+    active_items_count = models.PositiveIntegerField(default=0, editable=False)
+    featured_items_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='business_name_idx'),
+        ]
         verbose_name = "کسب‌وکار"
         verbose_name_plural = "کسب‌وکارها"
 
+    # Written only through queryset updates; saving a stale copy must not undo them.
+    MAINTAINED_FIELDS = {'menu_updated_at', 'categories_count', 'items_count', 'active_items_count', 'featured_items_count'}
+
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name, allow_unicode=True)
-            slug = base_slug
-            counter = 1
-            while Business.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -0,0 +1,80 @@
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+# Retries when a concurrent insert takes the slug between lookup and INSERT.
+ATTEMPTS = 5
+# ``base``, ``base-1`` .. ``base-19`` are looked up together; the next twenty
+# only once all of those are taken.
+CANDIDATES = 20
+# Keeps each lookup well under SQLite's bound parameter limit.
+BASES_PER_QUERY = 200
+
+
+def slug_base(value, fallback):
+    return slugify(value, allow_unicode=True) or fallback
+
+
+def candidate_slugs(base, start=0):
+    return [f"{base}-{number}" if number else base for number in range(start, start + CANDIDATES)]
+
+
+def taken_slugs(scope, bases, start=0):
+    # Which candidates of each base are in use: one indexed IN lookup, or one
+    # per BASES_PER_QUERY distinct bases in batch mode.
+    bases = sorted(set(bases))
+    taken = set()
+    for offset in range(0, len(bases), BASES_PER_QUERY):
+        chunk = bases[offset : offset + BASES_PER_QUERY]
+        candidates = [slug for base in chunk for slug in candidate_slugs(base, start)]
+        taken.update(scope.filter(slug__in=candidates).values_list("slug", flat=True))
+    return taken
+
+
+def next_free_slug(base, taken, scope):
+    # ``taken`` holds the first window of candidates; further windows are
+    # looked up in ``scope`` and added to it.
+    start = 0
+    while True:
+        for slug in candidate_slugs(base, start):
+            if slug not in taken:
+                return slug
+        start += CANDIDATES
+        taken.update(taken_slugs(scope, [base], start))
+
+
+def assign_slugs(instances, scope):
+    # Batch mode for bulk_create: every instance shares the namespace ``scope``.
+    pending = [instance for instance in instances if not instance.slug]
+    if not pending:
+        return instances
+    bases = [instance.get_slug_base() for instance in pending]
+    taken = taken_slugs(scope, bases) | {instance.slug for instance in instances if instance.slug}
+    for instance, base in zip(pending, bases):
+        instance.slug = next_free_slug(base, taken, scope)
+        taken.add(instance.slug)
+    return instances
+
+
+class UniqueSlugMixin:
+    slug_source = "name"
+
+    def get_slug_base(self):
+        return slug_base(getattr(self, self.slug_source), self._meta.model_name)
+
+    def slug_scope(self):
+        return type(self)._default_manager.all()
+
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+        base = self.get_slug_base()
+        for attempt in range(1, ATTEMPTS + 1):
+            try:
+                with transaction.atomic(using=kwargs.get("using")):
+                    scope = self.slug_scope().exclude(pk=self.pk)
+                    self.slug = next_free_slug(base, taken_slugs(scope, [base]), scope)
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug, self.slug = self.slug, ""
+                if attempt == ATTEMPTS or not self.slug_scope().filter(slug=slug).exists():
+                    raise
@@ -7,11 +7,14 @@ from .views import (
     CategoryListView,
     CategoryUpdateView,
     DashboardHomeView,
+    ImageJobStatusView,
     ItemCreateView,
     ItemDeleteView,
     ItemListView,
     ItemUpdateView,
+    MenuExportView,
     MenuOrderView,
+    MenuTransferView,
     UpdateCategoryOrderView,
     UpdateItemOrderView,
 )
@@ -33,5 +36,8 @@ urlpatterns = [
     path("items/new/", ItemCreateView.as_view(), name="item_create"),
     path("items/<int:pk>/edit/", ItemUpdateView.as_view(), name="item_edit"),
     path("items/<int:pk>/delete/", ItemDeleteView.as_view(), name="item_delete"),
+    path("menu-transfer/", MenuTransferView.as_view(), name="menu_transfer"),
+    path("menu-transfer/export/", MenuExportView.as_view(), name="menu_export"),
+    path("images/status/", ImageJobStatusView.as_view(), name="image_status"),
 ]
 
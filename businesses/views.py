@@ -2,15 +2,21 @@ import json
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views import View
 from django.views.generic import TemplateView
 
 from businesses.forms import BusinessForm, BusinessHourFormSet
 from businesses.models import Business, BusinessHour
+from menus.analytics import view_series
 from menus.forms import MenuCategoryForm, MenuItemForm, MenuItemImageFormSet
+from menus.jobs import enqueue, job_status
 from menus.models import MenuCategory, MenuItem, MenuItemImage
+from menus.ordering import parse_order, parse_pk, reorder_categories, reorder_items
+from menus.signals import notify_menu_changed
+from menus.transfer import COLUMNS, FORMATS, ImportFormatError, MenuImporter, export_stream, read_rows
 
 
 class OwnerBusinessMixin(LoginRequiredMixin):
@@ -34,6 +40,20 @@ class OwnerBusinessMixin(LoginRequiredMixin):
         for code, _label in BusinessHour.DAYS_OF_WEEK:
             BusinessHour.objects.get_or_create(business=business, day_of_week=code)
 
+    def add_gallery_images(self, menu_item, files, start_index=0):
+        # One INSERT for the whole upload; resizing is left to the image worker.
+        if not files:
+            return []
+        images = MenuItemImage.objects.bulk_create(
+            [
+                MenuItemImage(menu_item=menu_item, image=file, order=start_index + index)
+                for index, file in enumerate(files)
+            ]
+        )
+        enqueue(images)
+        notify_menu_changed(MenuItemImage, self.business.slug)
+        return images
+
 
 class DashboardHomeView(OwnerBusinessMixin, TemplateView):
     template_name = "dashboard/home.html"
@@ -41,16 +61,20 @@ class DashboardHomeView(OwnerBusinessMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         business = self.business
-        items = MenuItem.objects.filter(category__business=business)
         context.update(
             {
                 "business": business,
-                "categories_count": business.categories.count(),
-                "items_count": items.count(),
-                "active_items": items.filter(is_active=True).count(),
-                "featured_items": items.filter(is_featured=True).count(),
+                "categories_count": business.categories_count,
+                "items_count": business.items_count,
+                "active_items": business.active_items_count,
+                "featured_items": business.featured_items_count,
             }
         )
+        views = view_series(business)
+        context["view_charts"] = [
+            ("👁️ بازدید ۷ روز گذشته", views["days"], "l"),
+            ("📈 بازدید ماه‌های گذشته", views["months"], "F Y"),
+        ]
         return context
 
 
@@ -156,7 +180,9 @@ class ItemListView(OwnerBusinessMixin, TemplateView):
         context.update(
             {
                 "business": self.business,
-                "items": MenuItem.objects.filter(category__business=self.business).select_related("category"),
+                "items": MenuItem.objects.filter(category__business=self.business)
+                .select_related("category")
+                .prefetch_related("gallery"),
             }
         )
         return context
@@ -181,9 +207,7 @@ class ItemCreateView(OwnerBusinessMixin, View):
         form.fields["category"].queryset = self.business.categories.all()
         if form.is_valid():
             menu_item = form.save()
-            gallery_files = request.FILES.getlist("gallery_images")
-            for index, file in enumerate(gallery_files):
-                MenuItemImage.objects.create(menu_item=menu_item, image=file, order=index)
+            self.add_gallery_images(menu_item, request.FILES.getlist("gallery_images"))
             messages.success(request, "محصول جدید اضافه شد.")
             return redirect("dashboard:item_list")
         messages.error(request, "لطفا خطاهای فرم را بررسی کنید.")
@@ -217,10 +241,10 @@ class ItemUpdateView(OwnerBusinessMixin, View):
         if form.is_valid() and formset.is_valid():
             menu_item = form.save()
             formset.save()
-            gallery_files = request.FILES.getlist("gallery_images")
-            start_index = menu_item.gallery.count()
-            for idx, file in enumerate(gallery_files):
-                MenuItemImage.objects.create(menu_item=menu_item, image=file, order=start_index + idx)
+            # The formset already loaded the gallery, so continue after it without a COUNT.
+            orders = [gallery_form.instance.order for gallery_form in formset.forms if gallery_form.instance.pk]
+            start_index = max(orders, default=-1) + 1
+            self.add_gallery_images(menu_item, request.FILES.getlist("gallery_images"), start_index)
             messages.success(request, "محصول به‌روزرسانی شد.")
             return redirect("dashboard:item_list")
         messages.error(request, "لطفا خطاهای فرم را بررسی کنید.")
@@ -237,6 +261,11 @@ class ItemUpdateView(OwnerBusinessMixin, View):
                 field.widget.attrs["class"] = f"input-control {classes}".strip()
 
 
+class ImageJobStatusView(OwnerBusinessMixin, View):
+    def get(self, request):
+        return JsonResponse(job_status(self.business))
+
+
 class ItemDeleteView(OwnerBusinessMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(MenuItem, pk=pk, category__business=self.business)
@@ -245,19 +274,64 @@ class ItemDeleteView(OwnerBusinessMixin, View):
         return redirect("dashboard:item_list")
 
 
+class MenuTransferView(OwnerBusinessMixin, TemplateView):
+    template_name = "dashboard/menu_transfer.html"
+    shown_errors = 200
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({"business": self.business, "columns": COLUMNS})
+        return context
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            messages.error(request, "فایلی انتخاب نشده است.")
+            return redirect("dashboard:menu_transfer")
+        dry_run = "dry_run" in request.POST
+        file_format = upload.name.rsplit(".", 1)[-1].lower()
+        try:
+            report = MenuImporter(self.business).run(read_rows(upload, file_format), dry_run=dry_run)
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            messages.error(request, f"فایل قابل خواندن نیست: {e}")
+            return redirect("dashboard:menu_transfer")
+        if report.created and not dry_run:
+            messages.success(request, f"{report.created} محصول اضافه شد.")
+        return self.render_to_response(
+            self.get_context_data(
+                report=report,
+                dry_run=dry_run,
+                errors=report.errors[: self.shown_errors],
+                hidden_errors=max(len(report.errors) - self.shown_errors, 0),
+            )
+        )
+
+
+class MenuExportView(OwnerBusinessMixin, View):
+    def get(self, request):
+        file_format = request.GET.get("format", "csv")
+        if file_format not in FORMATS:
+            file_format = "csv"
+        content_type = "text/csv" if file_format == "csv" else "application/json"
+        response = StreamingHttpResponse(
+            export_stream(self.business, file_format), content_type=f"{content_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="menu-{self.business.pk}.{file_format}"'
+        return response
+
+
 class MenuOrderView(OwnerBusinessMixin, TemplateView):
     template_name = "dashboard/menu_order.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        categories = self.business.categories.all().order_by('order', 'id')
-        categories_data = []
-        for category in categories:
-            items = category.items.all().order_by('sort_order', 'id')
-            categories_data.append({
-                'category': category,
-                'items': items,
-            })
+        categories = self.business.categories.order_by('order', 'id').prefetch_related(
+            Prefetch('items', queryset=MenuItem.objects.order_by('sort_order', 'id'))
+        )
+        categories_data = [
+            {'category': category, 'items': category.items.all()}
+            for category in categories
+        ]
         context.update({
             'business': self.business,
             'categories_data': categories_data,
@@ -268,45 +342,19 @@ class MenuOrderView(OwnerBusinessMixin, TemplateView):
 class UpdateCategoryOrderView(OwnerBusinessMixin, View):
     def post(self, request):
         try:
-            data = json.loads(request.body)
-            category_orders = data.get('categories', [])
-            
-            for index, category_id in enumerate(category_orders):
-                category = get_object_or_404(
-                    MenuCategory, 
-                    pk=category_id, 
-                    business=self.business
-                )
-                category.order = index
-                category.save()
-            
-            return JsonResponse({'success': True, 'message': 'ترتیب دسته‌بندی‌ها به‌روزرسانی شد'})
-        except Exception as e:
+            ids, position = parse_order(json.loads(request.body), "categories")
+            changed = reorder_categories(self.business, ids, position)
+        except ValueError as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return JsonResponse({'success': True, 'message': 'ترتیب دسته‌بندی‌ها به‌روزرسانی شد', 'changed': changed})
 
 
 class UpdateItemOrderView(OwnerBusinessMixin, View):
     def post(self, request):
         try:
             data = json.loads(request.body)
-            category_id = data.get('category_id')
-            item_orders = data.get('items', [])
-            
-            category = get_object_or_404(
-                MenuCategory,
-                pk=category_id,
-                business=self.business
-            )
-            
-            for index, item_id in enumerate(item_orders):
-                item = get_object_or_404(
-                    MenuItem,
-                    pk=item_id,
-                    category=category
-                )
-                item.sort_order = index
-                item.save()
-            
-            return JsonResponse({'success': True, 'message': 'ترتیب محصولات به‌روزرسانی شد'})
-        except Exception as e:
+            ids, position = parse_order(data, 'items')
+            changed = reorder_items(self.business, parse_pk(data.get('category_id')), ids, position)
+        except ValueError as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return JsonResponse({'success': True, 'message': 'ترتیب محصولات به‌روزرسانی شد', 'changed': changed})
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Public menu pages and guest notes are served by menus/async_views.py here
+(see MENU_ASYNC_URLCONF), e.g. ``uvicorn cafe_menu.asgi:application``.
 """
 
 import os
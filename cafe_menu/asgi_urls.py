@@ -0,0 +1,10 @@
+from django.urls import include, path
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+# The URLconf under ASGI (see MENU_ASYNC_URLCONF): the same site, with the
+# menus app's public pages served by its async views.
+urlpatterns = [
+    path('', include('menus.async_urls')) if getattr(pattern, 'app_name', None) == 'menu' else pattern
+    for pattern in wsgi_urlpatterns
+]
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'menus.instrumentation.RequestMetricsMiddleware',
+    'menus.async_views.AsyncViewsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,7 +62,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -68,11 +69,23 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template once per process, in development too.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'cafe_menu.wsgi.application'
+ASGI_APPLICATION = 'cafe_menu.asgi.application'
+
+# Under ASGI the public menu pages and guest note endpoints resolve against
+# this URLconf, whose views are async; unset it to serve the sync ones.
+MENU_ASYNC_URLCONF = 'cafe_menu.asgi_urls'
 
 
 # Database
@@ -86,6 +99,65 @@ DATABASES = {
 }
 
 
+# Cache
+# File-based so that every worker process sees the same menu snapshots and
+# invalidations; swap for Redis/Memcached when one is available. Past
+# MAX_ENTRIES files a write evicts a random third of them, so keep it well
+# above the working set: four entries per business (menu snapshot and
+# version, API payload and probe) plus one per menu category block.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'menus.instrumentation.InstrumentedFileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# Seconds a built menu snapshot stays cached; edits invalidate it immediately.
+MENU_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Snapshot hits and misses are counted per process and added to the totals
+# `menu_cache_stats` reports at most this often.
+MENU_SNAPSHOT_STATS_FLUSH_SECONDS = 60
+
+# Seconds a rendered category block stays cached; edits change its key.
+MENU_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Pre-rendered menu pages for the front web server (see `publish_menus`).
+# Serve <MENU_PUBLISH_ROOT>/<slug>/index.html and .../item/<item-slug>/index.html
+# before falling back to Django. With MENU_PUBLISH_ON_SAVE every committed edit
+# also re-renders the pages it touched, inside the request that made it; keep
+# it off and run `publish_menus` from cron on busy sites.
+MENU_PUBLISH_ROOT = BASE_DIR / 'publish'
+MENU_PUBLISH_ON_SAVE = False
+
+# Menu page views are buffered per process and flushed as hourly upserts after
+# this many seconds or views; run `rollup_menu_views` to fold them into the
+# daily and monthly totals the dashboard chart reads.
+MENU_VIEWS_FLUSH_SECONDS = 30
+MENU_VIEWS_FLUSH_SIZE = 1000
+
+# RequestMetricsMiddleware: per-request DB, template and cache timings go out
+# as a Server-Timing header and to the `menus.requests` logger (one line per
+# request at INFO; possible N+1 queries, repeated at least this often, at WARNING).
+MENU_SERVER_TIMING = True
+MENU_REPEATED_QUERY_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'menus.requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
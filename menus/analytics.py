@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Value
+from django.dispatch import receiver
+from django.utils import timezone
+
+from businesses.models import Business
+from .models import MenuViewDay, MenuViewHour, MenuViewMonth
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("menu_views", "item_views")
+# Daily rows older than this are dropped; monthly totals are kept for good.
+DAY_RETENTION = timedelta(days=400)
+
+# (business slug, local hour) -> [menu views, item views], shared by all
+# threads of this process and written out as one upsert per bucket. Counts
+# still buffered when the process exits are lost, at most one flush interval.
+_lock = threading.Lock()
+_buffer = defaultdict(lambda: [0, 0])
+_state = {"pending": 0, "flushed": time.monotonic()}
+
+
+def current_hour(now=None):
+    return timezone.localtime(now).replace(minute=0, second=0, microsecond=0)
+
+
+def month_start(day, months_back=0):
+    index = day.year * 12 + day.month - 1 - months_back
+    return day.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def record_view(slug, kind):
+    key = (slug, current_hour())
+    with _lock:
+        _buffer[key][KINDS.index(kind)] += 1
+        _state["pending"] += 1
+
+
+def flush_due():
+    with _lock:
+        return _state["pending"] and (
+            _state["pending"] >= getattr(settings, "MENU_VIEWS_FLUSH_SIZE", 1000)
+            or time.monotonic() - _state["flushed"] >= getattr(settings, "MENU_VIEWS_FLUSH_SECONDS", 30)
+        )
+
+
+def _take_buffer():
+    with _lock:
+        buffered = dict(_buffer)
+        _buffer.clear()
+        _state["pending"] = 0
+        _state["flushed"] = time.monotonic()
+    return buffered
+
+
+def _restore_buffer(buffered):
+    with _lock:
+        for key, counts in buffered.items():
+            for index, count in enumerate(counts):
+                _buffer[key][index] += count
+            _state["pending"] += sum(counts)
+
+
+def increment(model, period_field, rows):
+    # INSERT .. ON CONFLICT DO UPDATE adds to the bucket instead of replacing it,
+    # so concurrent flushes from several processes never lose counts.
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    business_column = quote(model._meta.get_field("business").column)
+    period = model._meta.get_field(period_field)
+    period_column = quote(period.column)
+    updates = ", ".join(f"{quote(kind)} = {table}.{quote(kind)} + excluded.{quote(kind)}" for kind in KINDS)
+    sql = (
+        f"INSERT INTO {table} ({business_column}, {period_column}, {', '.join(quote(kind) for kind in KINDS)}) "
+        f"VALUES (%s, %s, %s, %s) ON CONFLICT ({business_column}, {period_column}) DO UPDATE SET {updates}"
+    )
+    params = [
+        (business_id, period.get_db_prep_value(value, connection), *counts)
+        for (business_id, value), counts in rows.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def flush_views():
+    buffered = _take_buffer()
+    if not buffered:
+        return 0
+    try:
+        ids = dict(Business.objects.filter(slug__in={slug for slug, _hour in buffered}).values_list("slug", "pk"))
+        rows = {(ids[slug], hour): counts for (slug, hour), counts in buffered.items() if slug in ids}
+        increment(MenuViewHour, "hour", rows)
+    except DatabaseError:
+        logger.warning("Could not flush menu view counts; keeping them for the next flush", exc_info=True)
+        _restore_buffer(buffered)
+        return 0
+    return sum(sum(counts) for counts in buffered.values())
+
+
+def take_hours():
+    # DELETE .. RETURNING claims the hourly buckets in one statement: a flush
+    # either lands before it and is counted here, or writes a fresh bucket for
+    # the next rollup, and two rollups never count the same bucket.
+    table = connection.ops.quote_name(MenuViewHour._meta.db_table)
+    return list(MenuViewHour.objects.raw(f"DELETE FROM {table} RETURNING *"))
+
+
+def rollup_views(today=None):
+    # Moves every flushed hourly bucket into the daily and monthly totals.
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        hours = take_hours()
+        days, months = defaultdict(lambda: [0, 0]), defaultdict(lambda: [0, 0])
+        for row in hours:
+            day = timezone.localtime(row.hour).date()
+            for totals in (days[(row.business_id, day)], months[(row.business_id, month_start(day))]):
+                totals[0] += row.menu_views
+                totals[1] += row.item_views
+        increment(MenuViewDay, "day", days)
+        increment(MenuViewMonth, "month", months)
+        MenuViewDay.objects.filter(day__lt=today - DAY_RETENTION).delete()
+    return len(hours)
+
+
+def view_series(business, days=7, months=6, today=None):
+    # Both series come back from one UNION ALL over the rolled-up tables.
+    today = today or timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    first_month = month_start(today, months - 1)
+    daily = (
+        MenuViewDay.objects.filter(business=business, day__gte=first_day)
+        .annotate(series=Value("day"))
+        .values_list("series", "day", *KINDS)
+    )
+    monthly = (
+        MenuViewMonth.objects.filter(business=business, month__gte=first_month)
+        .annotate(series=Value("month"))
+        .values_list("series", "month", *KINDS)
+    )
+    found = {(series, period): menu + item for series, period, menu, item in daily.union(monthly, all=True)}
+    day_periods = [first_day + timedelta(days=offset) for offset in range(days)]
+    month_periods = [month_start(today, back) for back in reversed(range(months))]
+    return {
+        "days": _bars([(period, found.get(("day", period), 0)) for period in day_periods]),
+        "months": _bars([(period, found.get(("month", period), 0)) for period in month_periods]),
+    }
+
+
+def _bars(points):
+    peak = max((views for _period, views in points), default=0) or 1
+    return [{"period": period, "views": views, "percent": round(views * 100 / peak)} for period, views in points]
+
+
+@receiver(request_finished)
+def flush_after_response(sender, **kwargs):
+    # Runs once the response has been sent, so visitors never wait on it.
+    if flush_due():
+        flush_views()
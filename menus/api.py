@@ -0,0 +1,139 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import get_menu_snapshot, snapshot_timeout
+from .signals import menu_changed
+
+SCHEMA_VERSION = 1
+PAYLOAD_KEY = "menu_api:v{schema}:{slug}"
+PROBE_KEY = "menu_api:v{schema}:probe:{slug}"
+
+
+def _compact(data):
+    return {key: value for key, value in data.items() if value not in (None, "", [])}
+
+
+def _url(field):
+    return field.url if field else None
+
+
+def _time(value):
+    return value.strftime("%H:%M") if value else None
+
+
+def serialize_business(business):
+    return _compact(
+        {
+            "slug": business.slug,
+            "name": business.name,
+            "tagline": business.tagline,
+            "description": business.description,
+            "city": business.city,
+            "address": business.address,
+            "phone": business.primary_phone,
+            "logo": _url(business.logo),
+            "cover": _url(business.cover_image),
+            "theme": [business.theme_primary, business.theme_secondary],
+        }
+    )
+
+
+def serialize_hour(hour):
+    return _compact(
+        {
+            "day": hour.day_of_week,
+            "opens": _time(hour.opens_at),
+            "closes": _time(hour.closes_at),
+            "closed": hour.is_closed or None,
+        }
+    )
+
+
+def serialize_item(item):
+    return _compact(
+        {
+            "id": item.pk,
+            "slug": item.slug,
+            "name": item.name,
+            "description": item.description,
+            "price": item.price,
+            "effective_price": item.effective_price,
+            "discount_percent": item.discount_percent,
+            "badge": item.badge,
+            "tags": [tag.strip() for tag in item.tags.split(",") if tag.strip()],
+            "calories": item.calories,
+            "featured": item.is_featured or None,
+            "image": _url(item.primary_image),
+            "gallery": [image.image.url for image in item.gallery.all()],
+        }
+    )
+
+
+def serialize_category(entry):
+    category = entry["category"]
+    return _compact(
+        {
+            "id": category.pk,
+            "slug": category.slug,
+            "title": category.title,
+            "description": category.description,
+            "cover": _url(category.cover_image),
+            "items": [serialize_item(item) for item in entry["items"]],
+        }
+    )
+
+
+def build_menu_payload(snapshot):
+    business = snapshot["business"]
+    hours = [serialize_hour(hour) for hour in business.hours.all()] if business.show_hours else []
+    expires_at = snapshot["expires_at"]
+    data = {
+        "schema": SCHEMA_VERSION,
+        "business": serialize_business(business),
+        "hours": hours,
+        "categories": [serialize_category(entry) for entry in snapshot["categories"]],
+    }
+    if expires_at is not None:
+        data["valid_until"] = expires_at.isoformat()
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return {
+        "body": body,
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "last_modified": snapshot["version"]["last_modified"],
+        "expires_at": expires_at,
+    }
+
+
+def get_menu_payload(slug):
+    key = PAYLOAD_KEY.format(schema=SCHEMA_VERSION, slug=slug)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_menu_payload(get_menu_snapshot(slug))
+        cache.set(key, payload, snapshot_timeout(payload, timezone.localtime()))
+    return payload
+
+
+def get_menu_probe(slug):
+    # Pollers only need the version; keep it in its own tiny cache entry so a
+    # probe never unpickles the whole payload.
+    key = PROBE_KEY.format(schema=SCHEMA_VERSION, slug=slug)
+    probe = cache.get(key)
+    if probe is None:
+        payload = get_menu_payload(slug)
+        probe = {field: payload[field] for field in ("etag", "last_modified", "expires_at")}
+        cache.set(key, probe, snapshot_timeout(probe, timezone.localtime()))
+    return probe
+
+
+@receiver(menu_changed)
+def invalidate_menu_payload(sender, business_slug, **kwargs):
+    cache.delete_many(
+        [
+            PAYLOAD_KEY.format(schema=SCHEMA_VERSION, slug=business_slug),
+            PROBE_KEY.format(schema=SCHEMA_VERSION, slug=business_slug),
+        ]
+    )
@@ -0,0 +1,47 @@
+from django.db.models import Prefetch, Q
+
+from businesses.models import Business, BusinessHour
+from .models import MenuCategory, MenuItem
+
+
+def load_business(slug):
+    return (
+        Business.objects.prefetch_related(
+            Prefetch("hours", queryset=BusinessHour.objects.filter(is_visible=True)),
+            Prefetch("categories", queryset=MenuCategory.objects.filter(is_active=True)),
+        )
+        .filter(slug=slug)
+        .first()
+    )
+
+
+def menu_items(business):
+    return (
+        MenuItem.objects.filter(category__business=business, category__is_active=True, is_active=True)
+        .prefetch_related("gallery")
+        .order_by("sort_order", "name")
+    )
+
+
+def search_menu_items(items, query):
+    return items.filter(
+        Q(name__icontains=query)
+        | Q(description__icontains=query)
+        | Q(tags__icontains=query)
+        | Q(badge__icontains=query)
+    )
+
+
+def assemble_menu(business, items):
+    categories = list(business.categories.all())
+    by_category = {}
+    for category in categories:
+        category.business = business
+        by_category[category.pk] = (category, [])
+    for item in items:
+        entry = by_category.get(item.category_id)
+        if entry is None:
+            continue
+        item.category = entry[0]
+        entry[1].append(item)
+    return [{"category": category, "items": category_items} for category, category_items in by_category.values()]
@@ -0,0 +1,27 @@
+from django.urls import path
+
+from . import async_views, urls
+
+# menus/urls.py with the public pages and guest note endpoints answered by
+# menus/async_views.py; the menu API stays sync.
+ASYNC_VIEWS = {
+    "home": async_views.HomeView,
+    "search": async_views.SearchView,
+    "notes": async_views.NoteListView,
+    "notes_clear": async_views.ClearNotesView,
+    "notes_state": async_views.NoteStateView,
+    "notes_batch": async_views.NoteBatchView,
+    "add_note": async_views.AddNoteView,
+    "remove_note": async_views.RemoveNoteView,
+    "item_detail": async_views.ItemDetailView,
+    "business_detail": async_views.BusinessDetailView,
+}
+
+app_name = urls.app_name
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name].as_view(), name=pattern.name)
+    if pattern.name in ASYNC_VIEWS
+    else pattern
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,194 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.translation import gettext as _
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
+
+from businesses.models import Business
+from . import conditional, views
+from .cache import aget_menu_snapshot
+from .conditional import acondition
+from .featured import aget_featured_feed
+from .notes import (
+    NoteBatchError,
+    adelete_notes,
+    aguest_note_entries,
+    aguest_notes,
+    anote_count,
+    apply_operations,
+    asave_note,
+    ensure_guest_token,
+    guest_token,
+    parse_operations,
+)
+from .pagination import apaginate_businesses, decode_cursor
+
+# The public pages and guest note endpoints of menus/views.py for ASGI
+# deployments. Each view subclasses its sync original and awaits the same
+# data through the async ORM and cache API before handing it to the original's
+# get_context_data() or response method. Work Django cannot do asynchronously
+# (full-text search, menu assembly, transactions) goes through sync_to_async.
+
+
+class AsyncViewsMiddleware:
+    # Under ASGI, resolves requests against settings.MENU_ASYNC_URLCONF, which
+    # routes to the views below. WSGI handlers drop the middleware entirely.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.urlconf = getattr(settings, "MENU_ASYNC_URLCONF", None)
+        if not self.urlconf or not iscoroutinefunction(get_response):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        request.urlconf = self.urlconf
+        return await self.get_response(request)
+
+
+@method_decorator(views.revalidate, name="get")
+@method_decorator(
+    acondition(etag_func=conditional.home_etag, last_modified_func=conditional.home_last_modified), name="get"
+)
+class HomeView(views.HomeView):
+    async def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "").strip()
+        cursor = request.GET.get("cursor")
+        if query:
+            page = await sync_to_async(self._search)(query, cursor)
+        elif cursor:
+            page = await apaginate_businesses(Business.objects.all(), decode_cursor(cursor), self.page_size)
+        else:
+            page = await self._afirst_page()
+        context = self.get_context_data(page=page, featured_items=await aget_featured_feed(), **kwargs)
+        return self.render_to_response(context)
+
+    async def _afirst_page(self):
+        version = await sync_to_async(conditional.site_version)(self.request)
+        key = views.HOME_PAGE_KEY.format(version=version["etag"])
+        page = await cache.aget(key)
+        if page is None:
+            page = await apaginate_businesses(Business.objects.all(), None, self.page_size)
+            await cache.aadd(key, page, views.HOME_PAGE_TIMEOUT)
+        return page
+
+
+@method_decorator(views.revalidate, name="get")
+@method_decorator(
+    acondition(
+        etag_func=conditional.business_detail_etag,
+        last_modified_func=conditional.business_detail_last_modified,
+    ),
+    name="get",
+)
+class BusinessDetailView(views.BusinessDetailView):
+    async def get(self, request, *args, **kwargs):
+        slug = kwargs.get("slug")
+        query = request.GET.get("q", "").strip()
+        if query:
+            menu = await sync_to_async(self._search_menu)(slug, query, timezone.localtime())
+        else:
+            snapshot = await aget_menu_snapshot(slug)
+            menu = snapshot["business"], snapshot["categories"]
+        context = self.get_context_data(menu=menu, notes=await aguest_notes(request), **kwargs)
+        return self.render_to_response(context)
+
+
+@method_decorator(views.revalidate, name="get")
+@method_decorator(
+    acondition(
+        etag_func=conditional.item_detail_etag,
+        last_modified_func=conditional.item_detail_last_modified,
+    ),
+    name="get",
+)
+class ItemDetailView(views.ItemDetailView):
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        context = self.get_context_data(
+            object=self.object,
+            related_items=[item async for item in self.related_items()],
+            notes=await aguest_notes(request),
+        )
+        return self.render_to_response(context)
+
+    async def aget_object(self):
+        # get_queryset() already narrows to the slug in the URL.
+        queryset = self.get_queryset()
+        try:
+            return await queryset.aget()
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                _("No %(verbose_name)s found matching the query") % {"verbose_name": queryset.model._meta.verbose_name}
+            )
+
+
+class SearchView(views.SearchView):
+    async def get(self, request, *args, **kwargs):
+        # The full-text match and the keyset chunks run in one thread.
+        page = await sync_to_async(self.search)(request.GET.get("q", "").strip(), request.GET.get("business"))
+        return self.render_to_response(self.get_context_data(page=page, **kwargs))
+
+
+class NoteListView(views.NoteListView):
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(note_items=await aguest_note_entries(request), **kwargs)
+        return self.render_to_response(context)
+
+
+@method_decorator([never_cache, ensure_csrf_cookie], name="get")
+class NoteStateView(views.NoteStateView):
+    async def get(self, request):
+        return self._state(await aguest_notes(request))
+
+
+class AsyncNoteMixin:
+    async def _aget_item(self, business_slug, item_id):
+        return await aget_object_or_404(self._item_lookup(business_slug, item_id))
+
+
+class AddNoteView(AsyncNoteMixin, views.AddNoteView):
+    async def post(self, request, business_slug, item_id):
+        item = await self._aget_item(business_slug, item_id)
+        note_text, next_url = self._read(request, item)
+        token = ensure_guest_token(request)
+
+        if note_text:
+            await asave_note(token, item.pk, note_text)
+        else:
+            await adelete_notes(token, [item.pk])
+        return self._saved(request, note_text, next_url, await anote_count(token) if self._is_ajax(request) else None)
+
+
+class RemoveNoteView(AsyncNoteMixin, views.RemoveNoteView):
+    async def post(self, request, business_slug, item_id):
+        item = await self._aget_item(business_slug, item_id)
+        token = guest_token(request)
+        removed = await adelete_notes(token, [item.pk]) if token else 0
+        return self._removed(request, removed, await anote_count(token) if self._is_ajax(request) else None)
+
+
+class NoteBatchView(views.NoteBatchView):
+    async def post(self, request):
+        try:
+            operations = parse_operations(self._get_data(request))
+        except NoteBatchError as error:
+            return self._rejected(error)
+        # Django has no async transactions; the batch is written in one thread.
+        return self._applied(request, *await sync_to_async(apply_operations)(request, operations))
+
+
+class ClearNotesView(views.ClearNotesView):
+    async def post(self, request):
+        token = guest_token(request)
+        if token:
+            await adelete_notes(token)
+        return self._cleared(request)
@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.dispatch import receiver
+from django.http import Http404
+from django.utils import timezone
+
+from .assembly import assemble_menu, load_business, menu_items
+from .schedule import earliest_visibility_change
+from .signals import menu_changed
+
+SNAPSHOT_KEY = "menu_snapshot:{slug}"
+VERSION_KEY = "menu_version:{slug}"
+STATS_KEY = "menu_snapshot:stats:{kind}"
+
+# Hits and misses are counted in memory by each process and added to the
+# shared totals in the cache at most once per flush interval, so a snapshot
+# hit never writes to the cache.
+_stats_lock = threading.Lock()
+_stats = Counter()
+_stats_state = {"flushed": time.monotonic()}
+
+
+def _snapshot_timeout():
+    return getattr(settings, "MENU_SNAPSHOT_TIMEOUT", 60 * 60 * 24)
+
+
+def _count(kind):
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def build_menu_snapshot(slug, now=None):
+    now = now or timezone.localtime()
+    business = load_business(slug)
+    if business is None:
+        return None
+    active_items = list(menu_items(business))
+    visible_items = [item for item in active_items if item.is_visible(now)]
+    expires_at = earliest_visibility_change(active_items, now)
+    return {
+        "business": business,
+        "categories": assemble_menu(business, visible_items),
+        "built_at": now,
+        "expires_at": expires_at,
+        "version": build_menu_version(business, visible_items, now, expires_at),
+    }
+
+
+def build_menu_version(business, visible_items, now, expires_at):
+    updated_at = business.menu_updated_at or business.updated_at
+    fingerprint = ":".join(
+        [str(business.pk), updated_at.isoformat(), ",".join(str(item.pk) for item in visible_items)]
+    )
+    # A schedule-dependent menu changes when items appear or disappear, which
+    # happens without any write; the rebuild time is the safe lower bound then.
+    return {
+        "etag": hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:20],
+        "last_modified": updated_at if expires_at is None else max(updated_at, now),
+    }
+
+
+def get_menu_snapshot(slug):
+    key = SNAPSHOT_KEY.format(slug=slug)
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        _count("hits")
+        return snapshot
+    _count("misses")
+    snapshot = build_menu_snapshot(slug)
+    if snapshot is None:
+        raise Http404("No Business matches the given query.")
+    cache.set(key, snapshot, snapshot_timeout(snapshot))
+    return snapshot
+
+
+async def aget_menu_snapshot(slug):
+    key = SNAPSHOT_KEY.format(slug=slug)
+    snapshot = await cache.aget(key)
+    if snapshot is not None:
+        _count("hits")
+        return snapshot
+    _count("misses")
+    # Assembly is a dozen dependent queries; they run together in one thread.
+    snapshot = await sync_to_async(build_menu_snapshot)(slug)
+    if snapshot is None:
+        raise Http404("No Business matches the given query.")
+    await cache.aset(key, snapshot, snapshot_timeout(snapshot))
+    return snapshot
+
+
+def get_menu_version(slug):
+    key = VERSION_KEY.format(slug=slug)
+    version = cache.get(key)
+    if version is None:
+        snapshot = get_menu_snapshot(slug)
+        version = snapshot["version"]
+        cache.set(key, version, snapshot_timeout(snapshot, timezone.localtime()))
+    return version
+
+
+def snapshot_timeout(snapshot, now=None):
+    timeout = _snapshot_timeout()
+    if snapshot["expires_at"] is not None:
+        remaining = (snapshot["expires_at"] - (now or snapshot["built_at"])).total_seconds()
+        timeout = max(0, min(timeout, int(remaining)))
+    return timeout
+
+
+def _take_stats():
+    with _stats_lock:
+        counts = dict(_stats)
+        _stats.clear()
+        _stats_state["flushed"] = time.monotonic()
+    return counts
+
+
+def flush_snapshot_stats():
+    for kind, count in _take_stats().items():
+        key = STATS_KEY.format(kind=kind)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.add(key, count, None)
+
+
+def get_snapshot_stats():
+    flush_snapshot_stats()
+    hits = cache.get(STATS_KEY.format(kind="hits")) or 0
+    misses = cache.get(STATS_KEY.format(kind="misses")) or 0
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+    }
+
+
+def reset_snapshot_stats():
+    _take_stats()
+    cache.delete_many([STATS_KEY.format(kind="hits"), STATS_KEY.format(kind="misses")])
+
+
+@receiver(request_finished)
+def flush_stats_after_response(sender, **kwargs):
+    with _stats_lock:
+        due = _stats and time.monotonic() - _stats_state["flushed"] >= getattr(
+            settings, "MENU_SNAPSHOT_STATS_FLUSH_SECONDS", 60
+        )
+    if due:
+        flush_snapshot_stats()
+
+
+@receiver(menu_changed)
+def invalidate_menu_snapshot(sender, business_slug, **kwargs):
+    cache.delete_many([SNAPSHOT_KEY.format(slug=business_slug), VERSION_KEY.format(slug=business_slug)])
@@ -0,0 +1,136 @@
+import hashlib
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from businesses.models import Business
+from .api import get_menu_payload, get_menu_probe
+from .cache import get_menu_version
+from .notes import guest_notes
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    # condition() for async views. The validators read the cache, the session
+    # and the notes, so Django's decorator runs around an empty view in one
+    # sync_to_async call: its 304 or 412 is the answer, otherwise its ETag and
+    # Last-Modified go on the real response. The values stay memoized on the
+    # request for the view.
+    check = condition(etag_func=etag_func, last_modified_func=last_modified_func)(
+        lambda request, *args, **kwargs: HttpResponse()
+    )
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            checked = await sync_to_async(check)(request, *args, **kwargs)
+            if checked.status_code != 200:
+                return checked
+            response = await view(request, *args, **kwargs)
+            for header in ("Last-Modified", "ETag"):
+                if header in checked.headers and header not in response.headers:
+                    response.headers[header] = checked.headers[header]
+            return response
+
+        return inner
+
+    return decorator
+
+
+def _memo(request, name, compute):
+    # condition() asks for the ETag and Last-Modified separately; work them out once.
+    attribute = f"_menu_{name}"
+    if not hasattr(request, attribute):
+        setattr(request, attribute, compute())
+    return getattr(request, attribute)
+
+
+def _personal_state(request):
+    # Notes, the signed-in user, pending flash messages and the CSRF cookie all
+    # end up in the HTML, so they are part of the validator. Anonymous guests
+    # without a session or notes cookie cost no query here.
+    def compute():
+        user = request.user.pk if request.user.is_authenticated else None
+        notes = sorted(guest_notes(request).items())
+        pending = len(get_messages(request))
+        # Make sure the secret exists now, so the first response and its
+        # revalidations are fingerprinted with the same CSRF cookie.
+        get_token(request)
+        state = [user, notes, pending, request.META.get("CSRF_COOKIE")]
+        digest = hashlib.sha1(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return digest, bool(user or notes or pending)
+
+    return _memo(request, "personal_state", compute)
+
+
+def _etag(version, request):
+    digest, _personalized = _personal_state(request)
+    return f'{version["etag"]}-{digest}'
+
+
+def _last_modified(version, request):
+    # Last-Modified cannot see note edits, so personalized pages rely on the ETag alone.
+    _digest, personalized = _personal_state(request)
+    return None if personalized else version["last_modified"]
+
+
+def _business_version(request, slug):
+    return _memo(request, "business_version", lambda: get_menu_version(slug))
+
+
+def site_version(request):
+    def compute():
+        summary = Business.objects.aggregate(updated=Max("menu_updated_at"), count=Count("pk"))
+        updated = summary["updated"]
+        fingerprint = f'{summary["count"]}:{updated.isoformat() if updated else ""}'
+        return {
+            "etag": hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:20],
+            "last_modified": updated,
+        }
+
+    return _memo(request, "site_version", compute)
+
+
+def business_detail_etag(request, slug):
+    return _etag(_business_version(request, slug), request)
+
+
+def business_detail_last_modified(request, slug):
+    return _last_modified(_business_version(request, slug), request)
+
+
+def item_detail_etag(request, business_slug, item_slug):
+    return _etag(_business_version(request, business_slug), request)
+
+
+def item_detail_last_modified(request, business_slug, item_slug):
+    return _last_modified(_business_version(request, business_slug), request)
+
+
+def home_etag(request):
+    return _etag(site_version(request), request)
+
+
+def home_last_modified(request):
+    return _last_modified(site_version(request), request)
+
+
+def api_payload(request, slug):
+    return _memo(request, "api_payload", lambda: get_menu_payload(slug))
+
+
+def api_etag(request, slug):
+    return api_payload(request, slug)["etag"]
+
+
+def api_last_modified(request, slug):
+    return api_payload(request, slug)["last_modified"]
+
+
+def api_version_etag(request, slug):
+    return get_menu_probe(slug)["etag"]
@@ -0,0 +1,126 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from businesses.models import Business
+from .models import MenuCategory, MenuItem
+from .signals import cascaded
+
+ITEM_COUNTERS = {
+    "items_count": Q(),
+    "active_items_count": Q(is_active=True),
+    "featured_items_count": Q(is_featured=True),
+}
+
+
+def adjust(businesses, **deltas):
+    # One UPDATE with F() expressions; a negative delta is clamped at zero so
+    # drift can never trip the column's CHECK constraint.
+    changes = {
+        name: F(name) + delta if delta > 0 else Greatest(F(name) + delta, Value(0))
+        for name, delta in deltas.items()
+        if delta
+    }
+    if changes:
+        businesses.update(**changes)
+
+
+def item_deltas(is_active, is_featured, sign=1):
+    return {"items_count": sign, "active_items_count": sign * is_active, "featured_items_count": sign * is_featured}
+
+
+def _business_of_category(category_id):
+    return Business.objects.filter(categories__pk=category_id)
+
+
+@receiver(pre_save, sender=MenuItem)
+def remember_counted_state(sender, instance, raw=False, **kwargs):
+    instance._counted = None
+    if instance.pk and not raw:
+        instance._counted = (
+            MenuItem.objects.filter(pk=instance.pk)
+            .values_list("category_id", "category__business_id", "is_active", "is_featured")
+            .first()
+        )
+
+
+@receiver(post_save, sender=MenuItem)
+def count_saved_item(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_counted", None)
+    if created or previous is None:
+        adjust(_business_of_category(instance.category_id), **item_deltas(instance.is_active, instance.is_featured))
+        return
+    category_id, business_id, was_active, was_featured = previous
+    if category_id != instance.category_id:
+        new_business_id = MenuCategory.objects.filter(pk=instance.category_id).values_list("business_id", flat=True).first()
+        if new_business_id != business_id:
+            adjust(Business.objects.filter(pk=business_id), **item_deltas(was_active, was_featured, -1))
+            adjust(Business.objects.filter(pk=new_business_id), **item_deltas(instance.is_active, instance.is_featured))
+            return
+    adjust(
+        Business.objects.filter(pk=business_id),
+        active_items_count=instance.is_active - was_active,
+        featured_items_count=instance.is_featured - was_featured,
+    )
+
+
+@receiver(post_delete, sender=MenuItem)
+def count_deleted_item(sender, instance, origin=None, **kwargs):
+    if not cascaded(origin, MenuItem):
+        adjust(_business_of_category(instance.category_id), **item_deltas(instance.is_active, instance.is_featured, -1))
+
+
+@receiver(pre_save, sender=MenuCategory)
+def remember_category_business(sender, instance, raw=False, **kwargs):
+    instance._counted = None
+    if instance.pk and not raw:
+        instance._counted = MenuCategory.objects.filter(pk=instance.pk).values_list("business_id", flat=True).first()
+
+
+@receiver(post_save, sender=MenuCategory)
+def count_saved_category(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_counted", None)
+    if created or previous is None:
+        adjust(Business.objects.filter(pk=instance.business_id), categories_count=1)
+    elif previous != instance.business_id:
+        totals = category_totals(instance.pk)
+        adjust(Business.objects.filter(pk=previous), categories_count=-1, **{k: -v for k, v in totals.items()})
+        adjust(Business.objects.filter(pk=instance.business_id), categories_count=1, **totals)
+        MenuItem.objects.filter(category_id=instance.pk).update(business_id=instance.business_id)
+
+
+@receiver(pre_delete, sender=MenuCategory)
+def count_deleted_category(sender, instance, origin=None, **kwargs):
+    if cascaded(origin, MenuCategory):
+        return
+    totals = category_totals(instance.pk)
+    adjust(Business.objects.filter(pk=instance.business_id), categories_count=-1, **{k: -v for k, v in totals.items()})
+
+
+def category_totals(category_id):
+    return MenuItem.objects.filter(category_id=category_id).aggregate(
+        **{name: Count("pk", filter=condition) for name, condition in ITEM_COUNTERS.items()}
+    )
+
+
+def recount(businesses=None):
+    # Rebuilds every counter from scratch in a single UPDATE.
+    businesses = Business.objects.all() if businesses is None else businesses
+    categories = (
+        MenuCategory.objects.filter(business=OuterRef("pk")).order_by().values("business").annotate(total=Count("pk"))
+    )
+    values = {"categories_count": Coalesce(Subquery(categories.values("total")), 0)}
+    for name, condition in ITEM_COUNTERS.items():
+        items = (
+            MenuItem.objects.filter(condition, category__business=OuterRef("pk"))
+            .order_by()
+            .values("category__business")
+            .annotate(total=Count("pk"))
+        )
+        values[name] = Coalesce(Subquery(items.values("total")), 0)
+    return businesses.update(**values)
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MenuItem
+from .signals import cascaded, menu_changed
+
+# The home page's cross-business featured feed, kept in the cache and rebuilt
+# only when something it shows changes.
+FEED_KEY = "home_featured"
+FEED_SIZE = 6
+
+
+def featured_items():
+    return (
+        MenuItem.objects.filter(is_active=True, is_featured=True)
+        .select_related("category", "category__business")
+        .order_by("-updated_at")[:FEED_SIZE]
+    )
+
+
+def build_featured_feed():
+    return list(featured_items())
+
+
+def get_featured_feed():
+    feed = cache.get(FEED_KEY)
+    if feed is None:
+        feed = build_featured_feed()
+        cache.set(FEED_KEY, feed, None)
+    return feed
+
+
+async def aget_featured_feed():
+    feed = await cache.aget(FEED_KEY)
+    if feed is None:
+        feed = [item async for item in featured_items()]
+        await cache.aset(FEED_KEY, feed, None)
+    return feed
+
+
+def refresh_featured_feed():
+    feed = build_featured_feed()
+    cache.set(FEED_KEY, feed, None)
+    return feed
+
+
+def schedule_refresh():
+    # Readers rebuild it themselves until the new list lands after commit.
+    cache.delete(FEED_KEY)
+    transaction.on_commit(refresh_featured_feed)
+
+
+def _cached_feed():
+    return cache.get(FEED_KEY) or []
+
+
+@receiver(post_save, sender=MenuItem)
+def featured_item_saved(sender, instance, raw=False, **kwargs):
+    # Saving bumps updated_at, so a featured item always moves to the front;
+    # an item already in the feed may have dropped out of it.
+    if raw:
+        return
+    if (instance.is_active and instance.is_featured) or instance.pk in {item.pk for item in _cached_feed()}:
+        schedule_refresh()
+
+
+@receiver(post_delete, sender=MenuItem)
+def featured_item_deleted(sender, instance, origin=None, **kwargs):
+    # A deleted category or business reaches the feed through menu_changed.
+    if not cascaded(origin, MenuItem) and instance.pk in {item.pk for item in _cached_feed()}:
+        schedule_refresh()
+
+
+@receiver(menu_changed)
+def featured_business_changed(sender, business_slug, **kwargs):
+    # Category titles and business names and slugs are shown in the feed too.
+    if sender is not MenuItem and business_slug in {item.category.business.slug for item in _cached_feed()}:
+        schedule_refresh()
@@ -8,6 +8,13 @@ class MultiFileInput(ClearableFileInput):
     allow_multiple_selected = True
 
 
+class MultipleFileField(forms.FileField):
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [super(MultipleFileField, self).clean(file, initial) for file in data]
+        return super().clean(data, initial)
+
+
 class MenuCategoryForm(forms.ModelForm):
     class Meta:
         model = MenuCategory
@@ -43,7 +50,7 @@ class MenuItemForm(forms.ModelForm):
         widget=forms.CheckboxSelectMultiple,
         label="روزهای ارائه",
     )
-    gallery_images = forms.FileField(
+    gallery_images = MultipleFileField(
         required=False,
         widget=MultiFileInput(attrs={"multiple": True}),
         label="تصاویر گالری",
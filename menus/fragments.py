@@ -0,0 +1,60 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import MenuCategory, MenuItem, MenuItemImage
+from .signals import cascaded
+
+# business_detail.html caches each category block, one cache entry per
+# category rather than per item card. A block is keyed by its category's
+# content_updated_at plus the items it lists (schedules and searches show
+# different subsets) and by the business slug its links use. Nothing is
+# deleted: every item change bumps the categories listing the item.
+
+
+def fragment_timeout():
+    return getattr(settings, "MENU_FRAGMENT_TIMEOUT", 60 * 60 * 24)
+
+
+def listed(items):
+    return hashlib.md5(",".join(str(item.pk) for item in items).encode("ascii")).hexdigest()
+
+
+def _bump_categories(condition):
+    MenuCategory.objects.filter(condition).update(content_updated_at=timezone.now())
+
+
+def touch(categories=(), items=(), images=()):
+    # For changes that bypass MenuItem.save(): bumps every category listing
+    # ``items`` (or the items of ``images``) in one UPDATE. The items keep
+    # their updated_at, which orders the featured feed.
+    if categories or items or images:
+        _bump_categories(Q(pk__in=categories) | Q(items__pk__in=items) | Q(items__gallery__pk__in=images))
+
+
+@receiver(pre_save, sender=MenuItem)
+def item_saving(sender, instance, raw=False, **kwargs):
+    # Before the save, so an item moving to another category bumps both.
+    if raw:
+        return
+    condition = Q(pk=instance.category_id)
+    if instance.pk:
+        condition |= Q(items__pk=instance.pk)
+    _bump_categories(condition)
+
+
+@receiver(pre_delete, sender=MenuItem)
+def item_deleting(sender, instance, origin=None, **kwargs):
+    if not cascaded(origin, MenuItem):
+        _bump_categories(Q(pk=instance.category_id))
+
+
+@receiver(post_save, sender=MenuItemImage)
+@receiver(pre_delete, sender=MenuItemImage)
+def item_image_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not cascaded(origin, MenuItemImage):
+        touch(items=[instance.menu_item_id])
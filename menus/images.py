@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from businesses.models import Business
+from .models import MenuCategory, MenuItem, MenuItemImage
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each derivative; originals are never upscaled.
+SIZES = {
+    "thumb": 160,
+    "card": 640,
+    "full": 1600,
+}
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+DERIVATIVES_DIR = "derivatives"
+RENDER_ERRORS = (OSError, Image.DecompressionBombError, ValueError)
+
+IMAGE_FIELDS = {
+    Business: ("logo", "cover_image"),
+    MenuCategory: ("cover_image",),
+    MenuItem: ("primary_image",),
+    MenuItemImage: ("image",),
+}
+
+# Names whose derivatives are known to exist. Upload names are unique, so a
+# positive answer never goes stale and templates skip the storage lookup.
+_known = set()
+# Names found without derivatives, shared with the job workers through the
+# cache: a worker deletes the entry as soon as it has stored them.
+MISSING_KEY = "image_missing:{digest}"
+MISSING_TIMEOUT = 60 * 5
+
+
+def derivative_name(name, size, extension):
+    stem, _extension = os.path.splitext(name)
+    return f"{DERIVATIVES_DIR}/{stem}.{size}.{extension}"
+
+
+def missing_key(name):
+    return MISSING_KEY.format(digest=hashlib.md5(name.encode("utf-8")).hexdigest())
+
+
+def has_derivatives(field_file):
+    if not field_file:
+        return False
+    name = field_file.name
+    if name not in _known:
+        key = missing_key(name)
+        if cache.get(key):
+            return False
+        if not field_file.storage.exists(derivative_name(name, "full", "jpg")):
+            cache.set(key, True, MISSING_TIMEOUT)
+            return False
+        _known.add(name)
+    return True
+
+
+def derivative_url(field_file, size, extension="jpg"):
+    return field_file.storage.url(derivative_name(field_file.name, size, extension))
+
+
+def srcset(field_file, extension="jpg"):
+    return ", ".join(
+        f"{derivative_url(field_file, size, extension)} {width}w" for size, width in SIZES.items()
+    )
+
+
+def _encode(image, extension):
+    options = dict(FORMATS[extension])
+    if options["format"] == "JPEG" and image.mode != "RGB":
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def render_derivatives(name, data):
+    # Pure function of the original's bytes so it can run in a worker process.
+    # EXIF orientation is applied and then dropped along with the rest of the
+    # metadata; phone photos otherwise carry tens of kilobytes of it.
+    with Image.open(BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    rendered = {}
+    for size, edge in SIZES.items():
+        image = original.copy()
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        for extension in FORMATS:
+            rendered[derivative_name(name, size, extension)] = _encode(image, extension)
+    return rendered
+
+
+def read_original(storage, name):
+    with storage.open(name, "rb") as original:
+        return original.read()
+
+
+def store_derivatives(storage, name, rendered):
+    # The "full" JPEG is written last and doubles as the completion marker.
+    marker = derivative_name(name, "full", "jpg")
+    for derivative in [*(derivative for derivative in rendered if derivative != marker), marker]:
+        if storage.exists(derivative):
+            storage.delete(derivative)
+        storage.save(derivative, ContentFile(rendered[derivative]))
+    _known.add(name)
+    cache.delete(missing_key(name))
+
+
+def generate_derivatives(field_file, force=False):
+    if not field_file or (not force and has_derivatives(field_file)):
+        return False
+    storage = field_file.storage
+    if not storage.exists(field_file.name):
+        return False
+    rendered = render_derivatives(field_file.name, read_original(storage, field_file.name))
+    store_derivatives(storage, field_file.name, rendered)
+    return True
+
+
+def generate_instance_derivatives(instance, force=False):
+    generated = 0
+    for field_name in IMAGE_FIELDS[type(instance)]:
+        field_file = getattr(instance, field_name)
+        try:
+            generated += generate_derivatives(field_file, force=force)
+        except RENDER_ERRORS:
+            logger.warning("Could not build image derivatives for %s", field_file.name, exc_info=True)
+    return generated
+
@@ -0,0 +1,207 @@
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connections
+
+logger = logging.getLogger("menus.requests")
+
+_current = contextvars.ContextVar("menu_request_metrics", default=None)
+# Set while the cache reads a key for its own bookkeeping (incr, get_or_set).
+_uncounted = contextvars.ContextVar("menu_cache_uncounted", default=False)
+_missing = object()
+# "IN (%s, %s, %s)" and "IN (%s)" are the same query shape.
+_placeholder_list = re.compile(r"\((?:%s, )*%s\)")
+
+
+def query_shape(sql):
+    return _placeholder_list.sub("(...)", sql)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is not None and not _uncounted.get():
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+class InstrumentedFileBasedCache(FileBasedCache):
+    # Counts hits and misses for the request being measured: one per key for
+    # get() and get_many(), one per get_or_set(), none for incr() and decr().
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        record_cache(value is not _missing)
+        return default if value is _missing else value
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _missing, version)
+        if value is not _missing:
+            return value
+        if callable(default):
+            default = default()
+        self.add(key, default, timeout, version)
+        return super().get(key, default, version)
+
+    async def aget_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = await self.aget(key, _missing, version)
+        if value is not _missing:
+            return value
+        if callable(default):
+            default = default()
+        await self.aadd(key, default, timeout, version)
+        token = _uncounted.set(True)
+        try:
+            return await self.aget(key, default, version)
+        finally:
+            _uncounted.reset(token)
+
+    def incr(self, key, delta=1, version=None):
+        token = _uncounted.set(True)
+        try:
+            return super().incr(key, delta, version)
+        finally:
+            _uncounted.reset(token)
+
+    async def aincr(self, key, delta=1, version=None):
+        token = _uncounted.set(True)
+        try:
+            return await super().aincr(key, delta, version)
+        finally:
+            _uncounted.reset(token)
+
+
+def watch_queries(stack, metrics):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(metrics.record_query))
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class RequestMetricsMiddleware:
+    # Query count and DB time, template rendering and cache use for every
+    # request, sent back as Server-Timing and logged under the URL name.
+    # Work done later by a streaming response's iterator is not included.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                watch_queries(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        # Under ASGI the queries of a request run in its own thread-sensitive
+        # thread, so the wrappers go on that thread's connections.
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        stack = ExitStack()
+        try:
+            await sync_to_async(watch_queries)(stack, metrics)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        if getattr(settings, "MENU_SERVER_TIMING", True):
+            response["Server-Timing"] = self.server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = _current.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.template_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total):
+        return ", ".join(
+            [
+                f'db;dur={_ms(metrics.db_time)};desc="{metrics.queries} queries"',
+                f"tpl;dur={_ms(metrics.template_time)}",
+                f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses"',
+                f"total;dur={_ms(total)}",
+            ]
+        )
+
+    def log(self, request, response, metrics, total):
+        match = request.resolver_match
+        url_name = match.view_name if match else ""
+        threshold = getattr(settings, "MENU_REPEATED_QUERY_THRESHOLD", 5)
+        repeated = metrics.repeated_queries(threshold)
+        record = {
+            "url_name": url_name,
+            "method": request.method,
+            "status": response.status_code,
+            "total_ms": _ms(total),
+            "db_ms": _ms(metrics.db_time),
+            "queries": metrics.queries,
+            "template_ms": _ms(metrics.template_time),
+            "cache_hits": metrics.cache_hits,
+            "cache_misses": metrics.cache_misses,
+            "repeated_queries": len(repeated),
+        }
+        logger.info(" ".join(f"{name}={value}" for name, value in record.items()), extra={"metrics": record})
+        for shape, count in repeated:
+            logger.warning(
+                "url_name=%s possible N+1: %s identical queries: %s",
+                url_name,
+                count,
+                shape[:300],
+                extra={"metrics": {"url_name": url_name, "count": count, "query": shape}},
+            )
@@ -0,0 +1,146 @@
+import uuid
+from concurrent.futures import Future
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from businesses.models import Business
+from .fragments import touch
+from .images import IMAGE_FIELDS, RENDER_ERRORS, has_derivatives, read_original, render_derivatives, store_derivatives
+from .models import ImageJob, MenuCategory, MenuItem, MenuItemImage
+from .signals import notify_menu_changed
+
+# A job still "processing" after this long belonged to a worker that died.
+STALE_AFTER = timedelta(minutes=10)
+
+
+def _business_id(instance):
+    if isinstance(instance, Business):
+        return instance.pk
+    if isinstance(instance, MenuCategory):
+        return instance.business_id
+    if isinstance(instance, MenuItem):
+        return instance.category.business_id
+    return instance.menu_item.category.business_id
+
+
+def pending_jobs(instances):
+    jobs = []
+    for instance in instances:
+        for field_name in IMAGE_FIELDS[type(instance)]:
+            field_file = getattr(instance, field_name)
+            if field_file and not has_derivatives(field_file):
+                jobs.append(
+                    ImageJob(
+                        business_id=_business_id(instance),
+                        model_label=instance._meta.label,
+                        object_id=instance.pk,
+                        field_name=field_name,
+                        file_name=field_file.name,
+                    )
+                )
+    return jobs
+
+
+def enqueue(instances):
+    jobs = pending_jobs(instances)
+    if jobs:
+        ImageJob.objects.bulk_create(jobs, ignore_conflicts=True)
+    return len(jobs)
+
+
+def claim_jobs(limit):
+    # The UPDATE re-checks availability, so two workers racing for the same
+    # rows cannot both win; each then reads back only its own claim token.
+    now = timezone.now()
+    available = Q(status=ImageJob.PENDING) | Q(status=ImageJob.PROCESSING, updated_at__lt=now - STALE_AFTER)
+    ids = list(ImageJob.objects.filter(available).values_list("pk", flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    ImageJob.objects.filter(available, pk__in=ids).update(
+        status=ImageJob.PROCESSING, claim=token, attempts=F("attempts") + 1, updated_at=now
+    )
+    return list(ImageJob.objects.filter(claim=token))
+
+
+def retry_failed():
+    return ImageJob.objects.filter(status=ImageJob.FAILED).update(status=ImageJob.PENDING, claim="", error="")
+
+
+def _storage(job):
+    return apps.get_model(job.model_label)._meta.get_field(job.field_name).storage
+
+
+def _run_now(function, *args):
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def process_jobs(jobs, executor=None):
+    # Reading and writing storage stays in this process; only the Pillow work
+    # is handed to ``executor`` (a process pool) when one is given.
+    submit = executor.submit if executor is not None else _run_now
+    started, failed = [], []
+    for job in jobs:
+        try:
+            storage = _storage(job)
+            data = read_original(storage, job.file_name)
+        except (LookupError, FieldDoesNotExist, OSError) as error:
+            failed.append((job, error))
+            continue
+        started.append((job, storage, submit(render_derivatives, job.file_name, data)))
+    done = []
+    for job, storage, future in started:
+        try:
+            store_derivatives(storage, job.file_name, future.result())
+        except RENDER_ERRORS as error:
+            failed.append((job, error))
+        else:
+            done.append(job)
+    ImageJob.objects.filter(pk__in=[job.pk for job in done]).delete()
+    for job, error in failed:
+        ImageJob.objects.filter(pk=job.pk).update(
+            status=ImageJob.FAILED, claim="", error=str(error)[:1000] or type(error).__name__
+        )
+    if done:
+        # Pages rendered before the derivatives existed point at the original.
+        changed = {model: [] for model in (MenuCategory, MenuItem, MenuItemImage)}
+        for job in done:
+            model = apps.get_model(job.model_label)
+            if model in changed:
+                changed[model].append(job.object_id)
+        touch(categories=changed[MenuCategory], items=changed[MenuItem], images=changed[MenuItemImage])
+        business_ids = {job.business_id for job in done}
+        slugs = Business.objects.filter(pk__in=business_ids).values_list("slug", flat=True)
+        notify_menu_changed(ImageJob, *slugs)
+    return len(done), len(failed)
+
+
+def job_status(business):
+    jobs = ImageJob.objects.filter(business=business)
+    counts = dict(jobs.values_list("status").annotate(count=Count("pk")).order_by())
+    return {
+        "pending": counts.get(ImageJob.PENDING, 0),
+        "processing": counts.get(ImageJob.PROCESSING, 0),
+        "failed": counts.get(ImageJob.FAILED, 0),
+        "failures": list(jobs.filter(status=ImageJob.FAILED).values("file_name", "error")[:10]),
+    }
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_save, sender=MenuCategory)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=MenuItemImage)
+def enqueue_uploaded_images(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue([instance])
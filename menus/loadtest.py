@@ -0,0 +1,236 @@
+import asyncio
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import unquote, unquote_to_bytes, urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connections
+from django.urls import reverse
+
+from businesses.models import Business
+from .models import MenuItem
+from .synthetic import WORDS
+
+# Relative weights of each URL name in the replayed traffic: mostly guests
+# reading menus, with a trickle of owners on the dashboard.
+MIX = {
+    "menu:business_detail": 35,
+    "menu:item_detail": 25,
+    "menu:home": 10,
+    "menu:search": 8,
+    "menu:api_menu": 5,
+    "menu:api_menu_version": 5,
+    "menu:notes_state": 4,
+    "dashboard:home": 3,
+    "dashboard:item_list": 2,
+    "dashboard:menu_order": 2,
+    "dashboard:category_list": 1,
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def parse_mix(value):
+    # "menu:home=5,menu:search=1"
+    mix = {}
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        name, _sep, weight = part.partition("=")
+        if name not in MIX or not weight.isdigit():
+            raise ValueError(f"وزن نامعتبر: {part}")
+        mix[name] = int(weight)
+    return mix
+
+
+def login_cookie(owner):
+    session = SessionStore()
+    session[SESSION_KEY] = str(owner.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = owner.get_session_auth_hash()
+    session.create()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+class Targets:
+    # A random sample of real rows to point the URLs at; dashboard requests
+    # log in as the owners of the sampled businesses.
+    def __init__(self, rng, businesses=200, items=5000, owners=20):
+        self.rng = rng
+        slugs = list(Business.objects.values_list("pk", "slug"))
+        if not slugs:
+            raise ValueError("هیچ کسب‌وکاری در پایگاه داده نیست؛ ابتدا seed_menus را اجرا کنید.")
+        sample = rng.sample(slugs, min(businesses, len(slugs)))
+        self.businesses = [slug for _pk, slug in sample]
+        self.items = list(
+            MenuItem.objects.filter(category__business__in=[pk for pk, _slug in sample], is_active=True)
+            .order_by()
+            .values_list("category__business__slug", "slug")[:items]
+        )
+        owners = Business.objects.filter(pk__in=[pk for pk, _slug in sample[:owners]]).select_related("owner")
+        self.sessions = [login_cookie(business.owner) for business in owners]
+
+    def url(self, name):
+        rng = self.rng
+        if name == "menu:item_detail" and self.items:
+            business_slug, item_slug = rng.choice(self.items)
+            return reverse(name, kwargs={"business_slug": business_slug, "item_slug": item_slug}), None
+        if name in ("menu:business_detail", "menu:item_detail"):
+            return reverse("menu:business_detail", kwargs={"slug": rng.choice(self.businesses)}), None
+        if name in ("menu:api_menu", "menu:api_menu_version"):
+            return reverse(name, kwargs={"slug": rng.choice(self.businesses)}), None
+        if name == "menu:search":
+            return f"{reverse(name)}?{urlencode({'q': rng.choice(WORDS)})}", None
+        if name.startswith("dashboard:"):
+            return reverse(name), rng.choice(self.sessions)
+        return reverse(name), None
+
+
+def wsgi_client(application, host="localhost"):
+    def request(url, cookie):
+        path = urlsplit(url)
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote_to_bytes(path.path).decode("iso-8859-1"),
+            "QUERY_STRING": path.query,
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": host,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(),
+            "wsgi.errors": BytesIO(),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        if cookie:
+            environ["HTTP_COOKIE"] = cookie
+        status = []
+        response = application(environ, lambda line, headers, exc_info=None: status.append(line))
+        try:
+            for _chunk in response:
+                pass
+        finally:
+            if hasattr(response, "close"):
+                response.close()
+        return int(status[0].split()[0])
+
+    return request
+
+
+def asgi_client(application, host="localhost"):
+    # The app runs on one event loop in a background thread; each worker of
+    # run() blocks on its own request there, so ``workers`` is the number of
+    # requests in flight on the loop, as with an ASGI server's connections.
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    async def handle(url, cookie):
+        path = urlsplit(url)
+        headers = [(b"host", host.encode("ascii"))]
+        if cookie:
+            headers.append((b"cookie", cookie.encode("latin-1")))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": unquote(path.path),
+            "raw_path": path.path.encode("ascii"),
+            "query_string": path.query.encode("ascii"),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": (host, 80),
+        }
+        body = [{"type": "http.request", "body": b"", "more_body": False}]
+        status = []
+
+        async def receive():
+            if body:
+                return body.pop()
+            # Django listens for a disconnect until the response is sent.
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await application(scope, receive, send)
+        return status[0]
+
+    def request(url, cookie):
+        return asyncio.run_coroutine_threadsafe(handle(url, cookie), loop).result()
+
+    return request
+
+
+def http_client(base_url):
+    # Against a running server (gunicorn, uwsgi) instead of the app in-process.
+    opener = urllib.request.build_opener(NoRedirect)
+
+    def request(url, cookie):
+        headers = {"Cookie": cookie} if cookie else {}
+        try:
+            with opener.open(urllib.request.Request(base_url.rstrip("/") + url, headers=headers)) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    return request
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def run(request, targets, mix, requests, workers, seed=1):
+    # Every worker thread draws from the same weighted mix until ``requests``
+    # have been sent; returns ({url name: [ms, ...]}, {url name: errors}, seconds).
+    names, weights = zip(*mix.items())
+    schedule = random.Random(seed).choices(names, weights=weights, k=requests)
+    plan = [(name, *targets.url(name)) for name in schedule]
+    latencies, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+
+    def send(entry):
+        name, url, cookie = entry
+        started = time.perf_counter()
+        try:
+            status = request(url, cookie)
+        except OSError:
+            status = 599
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies[name].append(elapsed)
+            if status >= 400:
+                errors[name] += 1
+
+    def worker(entries):
+        try:
+            for entry in entries:
+                send(entry)
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _result in pool.map(worker, [plan[index::workers] for index in range(workers)]):
+            pass
+    return latencies, errors, time.perf_counter() - started
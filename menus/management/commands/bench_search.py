@@ -0,0 +1,105 @@
+import random
+import sqlite3
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from menus.loadtest import percentile
+from menus.search import (
+    CREATE_TABLES,
+    ITEM_TABLE,
+    ITEM_TRIGRAM_TABLE,
+    ITEM_WEIGHTS,
+    exact_search_sql,
+    fuzzy_expression,
+    fuzzy_search_sql,
+    match_expression,
+    rank_fuzzy_candidates,
+    register_functions,
+)
+from menus.synthetic import WORDS
+from menus.text import normalize_text
+
+SYLLABLES = ["با", "ری", "سو", "تا", "نو", "کا", "مه", "دی", "گل", "شا", "پو", "زر", "فر", "لی", "جو"]
+# Spellings guests actually type: Arabic letters, Persian digits, spaces for half-spaces.
+ARABIC_VARIANTS = str.maketrans({"ی": "ي", "ک": "ك"})
+
+
+def typo(word, rng):
+    if len(word) < 4:
+        return word
+    index = rng.randrange(1, len(word) - 1)
+    return word[:index] + word[index + 1:]
+
+
+class Command(BaseCommand):
+    help = "بنچمارک جستجوی نرمال‌شده و فازی روی یک منوی مصنوعی در حافظه"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        # Real menu words plus a few thousand generated ones so postings are realistically sparse.
+        vocabulary = WORDS + sorted({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(5000)})
+        db = sqlite3.connect(":memory:")
+        register_functions(db)
+        for statement in CREATE_TABLES:
+            if ITEM_TABLE in statement or ITEM_TRIGRAM_TABLE in statement:
+                db.execute(statement)
+
+        started = time.perf_counter()
+        rows = []
+        for pk in range(1, options["items"] + 1):
+            name = " ".join(rng.sample(vocabulary, rng.randint(1, 3)))
+            description = " ".join(rng.sample(vocabulary, 6))
+            rows.append((pk, name, description, rng.choice(WORDS), rng.choice(WORDS), f"کافه {pk % 500}"))
+        db.executemany(
+            f"INSERT INTO {ITEM_TABLE} (rowid, name, description, tags, category, business) "
+            "VALUES (?, normalize_text(?), normalize_text(?), normalize_text(?), normalize_text(?), normalize_text(?))",
+            rows,
+        )
+        db.executemany(
+            f"INSERT INTO {ITEM_TRIGRAM_TABLE} (rowid, name) VALUES (?, normalize_text(?))",
+            [(row[0], row[1]) for row in rows],
+        )
+        db.commit()
+        self.stdout.write(f"corpus: {options['items']} items indexed in {time.perf_counter() - started:.1f}s")
+
+        words = [rng.choice(vocabulary) for _ in range(options["queries"])]
+        keystrokes = [word[:length] for word in words for length in range(2, len(word) + 1)]
+        variants = [word.translate(ARABIC_VARIANTS).replace("\u200c", " ") for word in words]
+        typos = [typo(word, rng) for word in words]
+
+        exact_sql = exact_search_sql(ITEM_TABLE, ITEM_WEIGHTS).replace("%s", "?") + " LIMIT 50"
+        fuzzy_sql = fuzzy_search_sql(ITEM_TRIGRAM_TABLE).replace("%s", "?")
+
+        def exact(query):
+            return db.execute(exact_sql, [match_expression(query)]).fetchall()
+
+        def fuzzy(query):
+            expression = fuzzy_expression(query)
+            if expression is None:
+                return []
+            return rank_fuzzy_candidates(query, db.execute(fuzzy_sql, [expression]).fetchall())
+
+        self.report("normalize_text", [lambda query=query: normalize_text(query) for query in keystrokes])
+        self.report("prefix (per keystroke)", [lambda query=query: exact(query) for query in keystrokes])
+        self.report("arabic/half-space", [lambda query=query: exact(query) for query in variants])
+        self.report("trigram typo", [lambda query=query: fuzzy(query) for query in typos])
+        hits = sum(1 for query in typos if fuzzy(query))
+        self.stdout.write(f"typo recall: {hits}/{len(typos)} queries returned candidates")
+
+    def report(self, label, calls):
+        samples = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{label:<24} n={len(samples):<6} p50={statistics.median(samples):.3f}ms "
+            f"p95={percentile(samples, 0.95):.3f}ms p99={percentile(samples, 0.99):.3f}ms"
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from menus.images import IMAGE_FIELDS, generate_instance_derivatives
+
+
+class Command(BaseCommand):
+    help = "ساخت نسخه‌های thumb/card/full (WebP و JPEG) برای تصاویر موجود"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="ساخت دوباره حتی اگر نسخه‌ها موجود باشند")
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, fields in IMAGE_FIELDS.items():
+            generated = 0
+            for instance in model.objects.only("pk", *fields).iterator(chunk_size=200):
+                generated += generate_instance_derivatives(instance, force=options["force"])
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {generated}")
+            total += generated
+        self.stdout.write(self.style.SUCCESS(f"{total} تصویر پردازش شد."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from businesses.models import Business
+from menus.transfer import FORMATS, export_stream
+
+
+class Command(BaseCommand):
+    help = "برون‌بری آیتم‌های منو به CSV یا JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("business", help="اسلاگ کسب‌وکار")
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", help="مسیر فایل خروجی (پیش‌فرض: خروجی استاندارد)")
+
+    def handle(self, *args, **options):
+        business = Business.objects.filter(slug=options["business"]).first()
+        if business is None:
+            raise CommandError(f"کسب‌وکار {options['business']} پیدا نشد.")
+        chunks = export_stream(business, options["format"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from businesses.models import Business
+from menus.transfer import FORMATS, ImportFormatError, MenuImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = "درون‌ریزی آیتم‌های منو از فایل CSV یا JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("business", help="اسلاگ کسب‌وکار")
+        parser.add_argument("path", help="مسیر فایل")
+        parser.add_argument("--format", choices=FORMATS, help="قالب فایل (پیش‌فرض: از پسوند فایل)")
+        parser.add_argument("--dry-run", action="store_true", help="فقط بررسی، بدون ذخیره")
+
+    def handle(self, *args, **options):
+        business = Business.objects.filter(slug=options["business"]).first()
+        if business is None:
+            raise CommandError(f"کسب‌وکار {options['business']} پیدا نشد.")
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        try:
+            with path.open("rb") as stream:
+                report = MenuImporter(business).run(read_rows(stream, file_format), dry_run=options["dry_run"])
+        except (OSError, ImportFormatError) as error:
+            raise CommandError(str(error)) from error
+        for line, messages in report.errors:
+            self.stderr.write(f"ردیف {line}: {' | '.join(messages)}")
+        status = "بررسی شد" if options["dry_run"] else "ذخیره شد"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report.rows} ردیف خوانده شد؛ {report.created} محصول و {report.categories} دسته‌بندی {status}، "
+                f"{len(report.errors)} خطا."
+            )
+        )
@@ -0,0 +1,75 @@
+import random
+import statistics
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from menus.loadtest import MIX, Targets, asgi_client, http_client, parse_mix, percentile, run, wsgi_client
+
+
+class Command(BaseCommand):
+    help = "بازپخش ترکیبی وزن‌دار از آدرس‌های عمومی و داشبورد با چند کارگر هم‌زمان و گزارش تاخیر هر آدرس"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--warmup", type=int, default=200, help="درخواست‌های اولیه که در گزارش نمی‌آیند")
+        parser.add_argument("--mix", default="", help="وزن‌ها، مثلا menu:home=5,menu:search=1")
+        parser.add_argument("--base-url", default="", help="آدرس سرور در حال اجرا؛ پیش‌فرض: برنامه WSGI در همین پردازه")
+        parser.add_argument("--asgi", action="store_true", help="برنامه ASGI در همین پردازه به جای WSGI")
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="همان بار با همان تعداد کارگر یک بار روی WSGI و یک بار روی ASGI، با جدول مقایسه",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"]) or MIX
+            targets = Targets(random.Random(options["seed"]))
+        except ValueError as error:
+            raise CommandError(error)
+        if options["base_url"]:
+            clients = [(options["base_url"], http_client(options["base_url"]))]
+        else:
+            clients = []
+            if options["compare"] or not options["asgi"]:
+                clients.append(("wsgi", wsgi_client(get_wsgi_application())))
+            if options["compare"] or options["asgi"]:
+                clients.append(("asgi", asgi_client(get_asgi_application())))
+            if settings.DEBUG:
+                self.stderr.write("DEBUG=True: query logging slows every request; numbers are pessimistic.")
+
+        summary = []
+        for label, request in clients:
+            if options["warmup"]:
+                run(request, targets, mix, options["warmup"], options["workers"], seed=options["seed"] + 1)
+            latencies, errors, elapsed = run(
+                request, targets, mix, options["requests"], options["workers"], seed=options["seed"]
+            )
+            summary.append((label, latencies, errors, elapsed))
+            self.report(label, latencies, errors, elapsed, options["workers"])
+        if len(summary) > 1:
+            self.stdout.write(f"\n{'':<8} {'req/s':>7} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+            for label, latencies, errors, elapsed in summary:
+                samples = [sample for values in latencies.values() for sample in values]
+                self.stdout.write(
+                    f"{label:<8} {len(samples) / elapsed:>7.1f} {sum(errors.values()):>6} "
+                    f"{statistics.median(samples):>6.1f}ms {percentile(samples, 0.95):>6.1f}ms "
+                    f"{percentile(samples, 0.99):>6.1f}ms"
+                )
+
+    def report(self, label, latencies, errors, elapsed, workers):
+        total = sum(len(samples) for samples in latencies.values())
+        self.stdout.write(f"{label}: {total} requests, {workers} workers, {elapsed:.1f}s, {total / elapsed:.1f} req/s")
+        self.stdout.write(f"{'url name':<28} {'n':>6} {'errors':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for name in sorted(latencies, key=lambda name: -len(latencies[name])):
+            samples = latencies[name]
+            self.stdout.write(
+                f"{name:<28} {len(samples):>6} {errors[name]:>6} {len(samples) / elapsed:>7.1f} "
+                f"{statistics.median(samples):>6.1f}ms {percentile(samples, 0.95):>6.1f}ms "
+                f"{percentile(samples, 0.99):>6.1f}ms"
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from menus.cache import get_snapshot_stats, reset_snapshot_stats
+
+
+class Command(BaseCommand):
+    help = "نمایش آمار hit/miss کش منوی کسب‌وکارها"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="صفر کردن شمارنده‌ها بعد از نمایش")
+
+    def handle(self, *args, **options):
+        stats = get_snapshot_stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_ratio={stats['hit_ratio']:.2%}"
+        )
+        if options["reset"]:
+            reset_snapshot_stats()
+            self.stdout.write(self.style.SUCCESS("شمارنده‌ها صفر شدند."))
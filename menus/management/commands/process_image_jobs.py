@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from menus.jobs import claim_jobs, process_jobs, retry_failed
+
+
+class Command(BaseCommand):
+    help = "پردازش صف تصاویر آپلودشده (ساخت نسخه‌های thumb/card/full)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="خالی کردن صف و خروج به جای انتظار برای کار جدید")
+        parser.add_argument("--workers", type=int, default=0, help="تعداد پردازه‌های تغییر اندازه (۰ یعنی همین پردازه)")
+        parser.add_argument("--batch", type=int, default=20, help="تعداد کار در هر نوبت")
+        parser.add_argument("--sleep", type=float, default=2.0, help="ثانیه‌های انتظار وقتی صف خالی است")
+        parser.add_argument("--retry-failed", action="store_true", help="برگرداندن کارهای ناموفق به صف")
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            self.stdout.write(f"{retry_failed()} کار ناموفق دوباره در صف قرار گرفت.")
+        executor = ProcessPoolExecutor(options["workers"]) if options["workers"] > 0 else None
+        done = failed = 0
+        try:
+            while True:
+                jobs = claim_jobs(options["batch"])
+                if not jobs:
+                    if options["once"]:
+                        break
+                    time.sleep(options["sleep"])
+                    continue
+                batch_done, batch_failed = process_jobs(jobs, executor)
+                done += batch_done
+                failed += batch_failed
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"{done} تصویر پردازش شد، {failed} ناموفق."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from businesses.models import Business
+from menus.publish import publish_business, publish_root
+
+
+class Command(BaseCommand):
+    help = "رندر منوی کسب‌وکارها به فایل‌های HTML ایستا در پوشه انتشار"
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="اسلاگ کسب‌وکارها؛ خالی یعنی همه")
+
+    def handle(self, *args, **options):
+        slugs = options["slugs"] or list(Business.objects.values_list("slug", flat=True))
+        missing = set(slugs) - set(Business.objects.filter(slug__in=slugs).values_list("slug", flat=True))
+        if missing:
+            raise CommandError(f"کسب‌وکار پیدا نشد: {', '.join(sorted(missing))}")
+        for slug in slugs:
+            pages = publish_business(slug)
+            self.stdout.write(f"{slug}: {pages} صفحه")
+        self.stdout.write(self.style.SUCCESS(f"منوها در {publish_root()} منتشر شدند."))
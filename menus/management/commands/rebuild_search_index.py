@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from menus.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "بازسازی کامل ایندکس جستجوی FTS5 محصولات و کسب‌وکارها"
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("ایندکس FTS5 فقط روی SQLite پشتیبانی می‌شود؛ جستجو از icontains استفاده می‌کند.")
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("ایندکس جستجو بازسازی شد."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from businesses.models import Business
+from menus.counters import recount
+
+
+class Command(BaseCommand):
+    help = "محاسبه دوباره شمارنده‌های داشبورد (دسته‌بندی‌ها و محصولات) از روی جدول‌ها"
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="اسلاگ کسب‌وکارها (پیش‌فرض: همه)")
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.all()
+        if options["slugs"]:
+            businesses = businesses.filter(slug__in=options["slugs"])
+        updated = recount(businesses)
+        self.stdout.write(self.style.SUCCESS(f"شمارنده‌های {updated} کسب‌وکار به‌روزرسانی شد."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from menus.analytics import rollup_views
+
+
+class Command(BaseCommand):
+    help = "انتقال بازدیدهای ساعتی منو به جمع روزانه و ماهانه"
+
+    def handle(self, *args, **options):
+        moved = rollup_views()
+        self.stdout.write(self.style.SUCCESS(f"{moved} ردیف ساعتی تجمیع شد."))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from menus.synthetic import PASSWORD, Generator
+
+
+class Command(BaseCommand):
+    help = "ساخت انبوه کسب‌وکار و منوی مصنوعی برای آزمایش کارایی در مقیاس واقعی"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--businesses", type=int, default=100)
+        parser.add_argument("--categories", type=int, default=10, help="دسته‌بندی برای هر کسب‌وکار")
+        parser.add_argument("--items", type=int, default=50, help="محصول برای هر دسته‌بندی")
+        parser.add_argument("--gallery", type=int, default=1, help="تصویر گالری برای هر محصول")
+        parser.add_argument("--scheduled", type=float, default=0.2, help="سهم محصولات زمان‌بندی‌شده (۰ تا ۱)")
+        parser.add_argument("--featured", type=float, default=0.05, help="سهم محصولات ویژه (۰ تا ۱)")
+        parser.add_argument("--batch", type=int, default=20, help="کسب‌وکار در هر تراکنش")
+        parser.add_argument("--prefix", default="synthetic")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        generator = Generator(
+            categories=options["categories"],
+            items=options["items"],
+            gallery=options["gallery"],
+            scheduled=options["scheduled"],
+            featured=options["featured"],
+            prefix=options["prefix"],
+            seed=options["seed"],
+        )
+        per_business = options["categories"] * options["items"]
+        started = time.perf_counter()
+
+        def progress(created):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{created} businesses, {created * per_business} items, {elapsed:.1f}s")
+
+        created = generator.generate(options["businesses"], batch=options["batch"], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{created} کسب‌وکار و {created * per_business} محصول در {elapsed:.1f} ثانیه ساخته شد "
+                f"({created * per_business / max(elapsed, 0.001):.0f} محصول در ثانیه)."
+            )
+        )
+        self.stdout.write(f"Credentials -> username: {options['prefix']}-owner-N | password: {PASSWORD}")
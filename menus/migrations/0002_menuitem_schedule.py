@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+from menus.schedule import compile_schedule
+
+
+def compile_existing_schedules(apps, schema_editor):
+    MenuItem = apps.get_model('menus', 'MenuItem')
+    items = list(MenuItem.objects.all())
+    for item in items:
+        item.schedule_days, item.schedule_start, item.schedule_end = compile_schedule(
+            item.is_full_time, item.available_days, item.available_from, item.available_to
+        )
+    MenuItem.objects.bulk_update(items, ['schedule_days', 'schedule_start', 'schedule_end'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='schedule_days',
+            field=models.PositiveSmallIntegerField(default=127, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='schedule_end',
+            field=models.PositiveIntegerField(default=86399, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='schedule_start',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compile_existing_schedules, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['is_active', 'schedule_start', 'schedule_end'], name='menuitem_schedule_idx'),
+        ),
+    ]
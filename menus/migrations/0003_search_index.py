@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:20
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS menus_item_fts USING fts5("
+            "name, description, tags, category, business, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS menus_business_fts USING fts5("
+            "name, tagline, city, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5: views fall back to icontains search.
+        return
+    schema_editor.execute(
+        "INSERT INTO menus_item_fts (rowid, name, description, tags, category, business) "
+        "SELECT item.id, item.name, item.description, item.tags, category.title, business.name "
+        "FROM menus_menuitem AS item "
+        "JOIN menus_menucategory AS category ON category.id = item.category_id "
+        "JOIN businesses_business AS business ON business.id = category.business_id"
+    )
+    schema_editor.execute(
+        "INSERT INTO menus_business_fts (rowid, name, tagline, city, description) "
+        "SELECT id, name, tagline, city, description FROM businesses_business"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS menus_item_fts")
+    schema_editor.execute("DROP TABLE IF EXISTS menus_business_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0002_business_show_hours_businesshour_is_visible'),
+        ('menus', '0002_menuitem_schedule'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
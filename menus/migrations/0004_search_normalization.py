@@ -0,0 +1,105 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:05
+
+import re
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# A frozen copy of menus.text.normalize_text as of this migration, so later
+# changes to the live search code cannot change what it builds.
+TRANSLATION = str.maketrans(
+    {
+        "ي": "ی",
+        "ى": "ی",
+        "ك": "ک",
+        "ة": "ه",
+        "ۀ": "ه",
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ٱ": "ا",
+        "ؤ": "و",
+        "\u200c": " ",
+        "\u200d": None,
+        "ـ": None,
+        **{digit: str(value) for value, digit in enumerate("۰۱۲۳۴۵۶۷۸۹")},
+        **{digit: str(value) for value, digit in enumerate("٠١٢٣٤٥٦٧٨٩")},
+    }
+)
+DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_text(value):
+    if not value:
+        return ""
+    value = DIACRITICS.sub("", value.translate(TRANSLATION))
+    return SPACES.sub(" ", value).strip().lower()
+
+
+TABLES = ['menus_item_fts', 'menus_business_fts', 'menus_item_trigram', 'menus_business_trigram']
+CREATE_TABLES = [
+    "CREATE VIRTUAL TABLE menus_item_fts USING fts5("
+    "name, description, tags, category, business, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE menus_business_fts USING fts5("
+    "name, tagline, city, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE menus_item_trigram USING fts5(name, tokenize='trigram')",
+    "CREATE VIRTUAL TABLE menus_business_trigram USING fts5(name, tokenize='trigram')",
+]
+ITEMS_SOURCE = (
+    "FROM menus_menuitem AS item "
+    "JOIN menus_menucategory AS category ON category.id = item.category_id "
+    "JOIN businesses_business AS business ON business.id = category.business_id"
+)
+FILL_TABLES = [
+    "INSERT INTO menus_item_fts (rowid, name, description, tags, category, business) "
+    "SELECT item.id, normalize_text(item.name), normalize_text(item.description), "
+    "normalize_text(item.tags), normalize_text(category.title), normalize_text(business.name) " + ITEMS_SOURCE,
+    "INSERT INTO menus_item_trigram (rowid, name) SELECT item.id, normalize_text(item.name) " + ITEMS_SOURCE,
+    "INSERT INTO menus_business_fts (rowid, name, tagline, city, description) "
+    "SELECT id, normalize_text(name), normalize_text(tagline), normalize_text(city), normalize_text(description) "
+    "FROM businesses_business",
+    "INSERT INTO menus_business_trigram (rowid, name) SELECT id, normalize_text(name) FROM businesses_business",
+]
+
+
+def drop_tables(cursor):
+    for table in TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def rebuild_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    connection.ensure_connection()
+    connection.connection.create_function("normalize_text", 1, normalize_text, deterministic=True)
+    with connection.cursor() as cursor:
+        drop_tables(cursor)
+        try:
+            for statement in CREATE_TABLES:
+                cursor.execute(statement)
+        except OperationalError:
+            # No FTS5/trigram tokenizer in this SQLite build: search keeps using icontains.
+            drop_tables(cursor)
+            return
+        for statement in FILL_TABLES:
+            cursor.execute(statement)
+
+
+def drop_trigram_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS menus_item_trigram")
+    schema_editor.execute("DROP TABLE IF EXISTS menus_business_trigram")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, drop_trigram_tables),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0003_business_menu_updated_at'),
+        ('menus', '0004_search_normalization'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field_name', models.CharField(max_length=50)),
+                ('file_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'در صف'), ('processing', 'در حال پردازش'), ('failed', 'ناموفق')], default='pending', max_length=20)),
+                ('claim', models.CharField(blank=True, max_length=32)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='businesses.business')),
+            ],
+            options={
+                'verbose_name': 'پردازش تصویر',
+                'verbose_name_plural': 'صف پردازش تصاویر',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='imagejob_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model_label', 'object_id', 'field_name', 'file_name'), name='imagejob_unique_file')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0003_business_menu_updated_at'),
+        ('menus', '0005_image_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuViewDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('menu_views', models.PositiveIntegerField(default=0)),
+                ('item_views', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_days', to='businesses.business')),
+            ],
+            options={
+                'verbose_name': 'بازدید روزانه',
+                'verbose_name_plural': 'بازدیدهای روزانه',
+                'constraints': [models.UniqueConstraint(fields=('business', 'day'), name='menuviewday_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuViewHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('menu_views', models.PositiveIntegerField(default=0)),
+                ('item_views', models.PositiveIntegerField(default=0)),
+                ('hour', models.DateTimeField()),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_hours', to='businesses.business')),
+            ],
+            options={
+                'verbose_name': 'بازدید ساعتی',
+                'verbose_name_plural': 'بازدیدهای ساعتی',
+                'constraints': [models.UniqueConstraint(fields=('business', 'hour'), name='menuviewhour_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuViewMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('menu_views', models.PositiveIntegerField(default=0)),
+                ('item_views', models.PositiveIntegerField(default=0)),
+                ('month', models.DateField(help_text='روز اول ماه')),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_months', to='businesses.business')),
+            ],
+            options={
+                'verbose_name': 'بازدید ماهانه',
+                'verbose_name_plural': 'بازدیدهای ماهانه',
+                'constraints': [models.UniqueConstraint(fields=('business', 'month'), name='menuviewmonth_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0006_menu_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuestNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('guest', models.CharField(max_length=32)),
+                ('note', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guest_notes', to='menus.menuitem')),
+            ],
+            options={
+                'verbose_name': 'یادداشت مهمان',
+                'verbose_name_plural': 'یادداشت\u200cهای مهمان',
+                'ordering': ['-updated_at'],
+                'constraints': [models.UniqueConstraint(fields=('guest', 'item'), name='guestnote_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0004_business_counters'),
+        ('menus', '0007_guest_notes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menucategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['business', 'order', 'title'], name='menucategory_menu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'sort_order', 'name'], name='menuitem_menu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_featured', True)), fields=['-updated_at'], name='menuitem_featured_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0008_read_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menucategory',
+            name='content_updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menus', '0009_menucategory_content_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='menuitem',
+            name='menuitem_schedule_idx',
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['schedule_start', 'schedule_end'], name='menuitem_schedule_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_business(apps, schema_editor):
+    MenuCategory = apps.get_model('menus', 'MenuCategory')
+    MenuItem = apps.get_model('menus', 'MenuItem')
+    MenuItem.objects.update(
+        business_id=Subquery(MenuCategory.objects.filter(pk=OuterRef('category_id')).values('business_id'))
+    )
+    # Slugs were only unique per category before; later duplicates get their pk.
+    seen = set()
+    renamed = []
+    for item in MenuItem.objects.exclude(slug='').order_by('pk').only('pk', 'business_id', 'slug'):
+        if (item.business_id, item.slug) in seen:
+            item.slug = f"{item.slug}-{item.pk}"
+            renamed.append(item)
+        seen.add((item.business_id, item.slug))
+    MenuItem.objects.bulk_update(renamed, ['slug'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0001_initial'),
+        ('menus', '0010_menuitem_schedule_partial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='business',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='menu_items', to='businesses.business'),
+        ),
+        migrations.RunPython(copy_business, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='menuitem',
+            name='business',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='menu_items', to='businesses.business'),
+        ),
+        migrations.AddConstraint(
+            model_name='menuitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('slug', ''), _negated=True), fields=('business', 'slug'), name='menuitem_unique_slug'),
+        ),
+    ]
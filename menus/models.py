@@ -3,12 +3,21 @@ from datetime import datetime
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
-from django.utils.text import slugify
 
 from businesses.models import Business
+from businesses.slugs import UniqueSlugMixin
+from .schedule import (
+    ALL_DAYS,
+    DAY_END,
+    DAY_START,
+    compile_schedule,
+    is_scheduled,
+    next_visibility_change,
+    seconds_of_day,
+)
 
 
-class MenuCategory(models.Model):
+class MenuCategory(UniqueSlugMixin, models.Model):
     business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='categories')
     title = models.CharField(max_length=150)
     slug = models.SlugField(max_length=160)
@@ -16,32 +25,48 @@ class MenuCategory(models.Model):
     cover_image = models.ImageField(upload_to='menus/categories/', blank=True, null=True)
     order = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    # Bumped by menus.fragments whenever an item shown in this category changes.
+    content_updated_at = models.DateTimeField(auto_now=True)
+
+    slug_source = "title"
 
     class Meta:
         unique_together = ('business', 'slug')
         ordering = ['order', 'title']
+        indexes = [
+            models.Index(
+                fields=['business', 'order', 'title'], condition=models.Q(is_active=True), name='menucategory_menu_idx'
+            ),
+        ]
         verbose_name = "دسته‌بندی"
         verbose_name_plural = "دسته‌بندی‌ها"
 
     def __str__(self):
         return f"{self.title} ({self.business.name})"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title, allow_unicode=True)
-            slug = base_slug
-            counter = 1
-            while MenuCategory.objects.filter(business=self.business, slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+    def slug_scope(self):
+        return MenuCategory.objects.filter(business_id=self.business_id)
 
     def get_absolute_url(self):
         return reverse('menu:business_detail', kwargs={'slug': self.business.slug}) + f"#category-{self.slug}"
 
 
-class MenuItem(models.Model):
+class MenuItemQuerySet(models.QuerySet):
+    def visible(self, current_time=None):
+        now = current_time or timezone.localtime()
+        today = now.date()
+        day_bit = 1 << now.weekday()
+        seconds = seconds_of_day(now)
+        return (
+            self.filter(is_active=True, schedule_start__lte=seconds, schedule_end__gte=seconds)
+            .filter(models.Q(display_start__isnull=True) | models.Q(display_start__lte=today))
+            .filter(models.Q(display_end__isnull=True) | models.Q(display_end__gte=today))
+            .alias(scheduled_today=models.F("schedule_days").bitand(day_bit))
+            .filter(scheduled_today=day_bit)
+        )
+
+
+class MenuItem(UniqueSlugMixin, models.Model):
     DAYS_OF_WEEK = [
         ('sat', 'شنبه'),
         ('sun', 'یکشنبه'),
@@ -53,6 +78,8 @@ class MenuItem(models.Model):
     ]
 
     category = models.ForeignKey(MenuCategory, on_delete=models.CASCADE, related_name='items')
+    # Copied from the category so slugs can be unique per business.
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='menu_items', editable=False)
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=220, blank=True)
     description = models.TextField(blank=True)
@@ -73,11 +100,35 @@ class MenuItem(models.Model):
     display_start = models.DateField(blank=True, null=True)
     display_end = models.DateField(blank=True, null=True)
     sort_order = models.PositiveIntegerField(default=100)
+    schedule_days = models.PositiveSmallIntegerField(default=ALL_DAYS, editable=False)
+    schedule_start = models.PositiveIntegerField(default=DAY_START, editable=False)
+    schedule_end = models.PositiveIntegerField(default=DAY_END, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MenuItemQuerySet.as_manager()
+
     class Meta:
         ordering = ['sort_order', 'name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business', 'slug'], condition=~models.Q(slug=''), name='menuitem_unique_slug'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['schedule_start', 'schedule_end'], condition=models.Q(is_active=True), name='menuitem_schedule_idx'
+            ),
+            # Items of a category in menu order, and the home page's featured feed.
+            # Partial, because filter(is_active=True) reaches SQLite as a bare
+            # `"is_active"` term that only a matching index condition can use.
+            models.Index(
+                fields=['category', 'sort_order', 'name'], condition=models.Q(is_active=True), name='menuitem_menu_idx'
+            ),
+            models.Index(
+                fields=['-updated_at'], condition=models.Q(is_active=True, is_featured=True), name='menuitem_featured_idx'
+            ),
+        ]
         verbose_name = "آیتم منو"
         verbose_name_plural = "آیتم‌های منو"
 
@@ -85,19 +136,42 @@ class MenuItem(models.Model):
         return f"{self.name} ({self.category.business.name})"
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name, allow_unicode=True)
-            slug = base_slug
-            counter = 1
-            while MenuItem.objects.filter(category__business=self.category.business, slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
+        self.compile_schedule()
+        self.business_id = self.category_business_id()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "schedule_days", "schedule_start", "schedule_end"}
+            if "category" in update_fields:
+                kwargs["update_fields"].add("business")
         super().save(*args, **kwargs)
 
+    def category_business_id(self):
+        if MenuItem.category.is_cached(self):
+            return self.category.business_id
+        if self.business_id is None:
+            return MenuCategory.objects.values_list("business_id", flat=True).get(pk=self.category_id)
+        return self.business_id
+
+    def slug_scope(self):
+        # menuitem_unique_slug rejects a slug a concurrent save took first.
+        return MenuItem.objects.filter(business_id=self.business_id)
+
+    def compile_schedule(self):
+        self.schedule_days, self.schedule_start, self.schedule_end = compile_schedule(
+            self.is_full_time, self.available_days, self.available_from, self.available_to
+        )
+
     def get_absolute_url(self):
         return reverse('menu:item_detail', kwargs={'business_slug': self.category.business.slug, 'item_slug': self.slug})
 
+    @property
+    def effective_price(self):
+        if self.special_price:
+            return self.special_price
+        if self.discount_percent:
+            return self.price * (100 - min(self.discount_percent, 100)) // 100
+        return self.price
+
     def get_available_days_display(self):
         if self.is_full_time:
             return "همه روزها"
@@ -107,27 +181,10 @@ class MenuItem(models.Model):
     def is_visible(self, current_time=None):
         if not self.is_active:
             return False
+        return is_scheduled(self, current_time or timezone.localtime())
 
-        now = current_time or timezone.localtime()
-
-        if self.display_start and now.date() < self.display_start:
-            return False
-        if self.display_end and now.date() > self.display_end:
-            return False
-
-        if self.is_full_time:
-            return True
-
-        day_code = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun'][now.weekday()]
-        allowed_days = [day.strip() for day in self.available_days.split(',') if day.strip()]
-        if allowed_days and day_code not in allowed_days:
-            return False
-
-        if self.available_from and self.available_to:
-            current_time_value = now.time()
-            return self.available_from <= current_time_value <= self.available_to
-
-        return True
+    def next_visibility_change(self, after=None):
+        return next_visibility_change(self, after or timezone.localtime())
 
 
 class MenuItemImage(models.Model):
@@ -143,3 +200,106 @@ class MenuItemImage(models.Model):
 
     def __str__(self):
         return f"تصویر {self.menu_item.name}"
+
+
+class ImageJob(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'در صف'),
+        (PROCESSING, 'در حال پردازش'),
+        (FAILED, 'ناموفق'),
+    ]
+
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='image_jobs')
+    model_label = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    field_name = models.CharField(max_length=50)
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    claim = models.CharField(max_length=32, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model_label', 'object_id', 'field_name', 'file_name'], name='imagejob_unique_file'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='imagejob_status_idx'),
+        ]
+        verbose_name = "پردازش تصویر"
+        verbose_name_plural = "صف پردازش تصاویر"
+
+    def __str__(self):
+        return f"{self.file_name} ({self.get_status_display()})"
+
+
+class MenuViewCounts(models.Model):
+    menu_views = models.PositiveIntegerField(default=0)
+    item_views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class MenuViewHour(MenuViewCounts):
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='view_hours')
+    hour = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['business', 'hour'], name='menuviewhour_unique'),
+        ]
+        verbose_name = "بازدید ساعتی"
+        verbose_name_plural = "بازدیدهای ساعتی"
+
+
+class MenuViewDay(MenuViewCounts):
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='view_days')
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['business', 'day'], name='menuviewday_unique'),
+        ]
+        verbose_name = "بازدید روزانه"
+        verbose_name_plural = "بازدیدهای روزانه"
+
+
+class MenuViewMonth(MenuViewCounts):
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='view_months')
+    month = models.DateField(help_text="روز اول ماه")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['business', 'month'], name='menuviewmonth_unique'),
+        ]
+        verbose_name = "بازدید ماهانه"
+        verbose_name_plural = "بازدیدهای ماهانه"
+
+
+class GuestNote(models.Model):
+    # One row per (anonymous guest, item); the guest is identified by the
+    # random token in the signed `menu_guest` cookie, see menus.notes.
+    guest = models.CharField(max_length=32)
+    item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='guest_notes')
+    note = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['guest', 'item'], name='guestnote_unique'),
+        ]
+        verbose_name = "یادداشت مهمان"
+        verbose_name_plural = "یادداشت‌های مهمان"
+
+    def __str__(self):
+        return f"{self.item_id}: {self.note[:30]}"
@@ -0,0 +1,168 @@
+import secrets
+
+from django.db import transaction
+
+from .models import GuestNote, MenuItem
+
+# Guests are identified by a random token in a signed cookie; their notes live
+# in GuestNote, one row per item, so browsing never writes a session.
+COOKIE_NAME = "menu_guest"
+COOKIE_SALT = "menus.notes"
+COOKIE_AGE = 60 * 60 * 24 * 365
+
+# Batches from notes.js: "add" and "update" both store the note (an empty
+# note removes it), "remove" deletes it.
+OPERATIONS = ("add", "update", "remove")
+MAX_OPERATIONS = 200
+# Notes are written with a single INSERT .. ON CONFLICT DO UPDATE.
+UPSERT = {"update_conflicts": True, "unique_fields": ["guest", "item"], "update_fields": ["note", "updated_at"]}
+
+
+class NoteBatchError(ValueError):
+    pass
+
+
+def guest_token(request):
+    if not hasattr(request, "_guest_token"):
+        request._guest_token = request.get_signed_cookie(COOKIE_NAME, default=None, salt=COOKIE_SALT)
+    return request._guest_token
+
+
+def ensure_guest_token(request):
+    if not guest_token(request):
+        request._guest_token = secrets.token_hex(16)
+    return request._guest_token
+
+
+def remember_guest(request, response):
+    # Called on every note write, so the cookie's expiry slides with use.
+    token = guest_token(request)
+    if token:
+        response.set_signed_cookie(
+            COOKIE_NAME, token, salt=COOKIE_SALT, max_age=COOKIE_AGE, httponly=True, samesite="Lax"
+        )
+    return response
+
+
+def guest_notes(request):
+    # {item id: note}; guests without the cookie cost no query.
+    if not hasattr(request, "_guest_notes"):
+        token = guest_token(request)
+        request._guest_notes = dict(_note_pairs(token)) if token else {}
+    return request._guest_notes
+
+
+async def aguest_notes(request):
+    if not hasattr(request, "_guest_notes"):
+        token = guest_token(request)
+        request._guest_notes = {item_id: note async for item_id, note in _note_pairs(token)} if token else {}
+    return request._guest_notes
+
+
+def _note_pairs(token):
+    return GuestNote.objects.filter(guest=token).order_by().values_list("item_id", "note")
+
+
+def guest_note_entries(request):
+    token = guest_token(request)
+    if not token:
+        return []
+    return list(_note_entries(token))
+
+
+async def aguest_note_entries(request):
+    token = guest_token(request)
+    if not token:
+        return []
+    return [note async for note in _note_entries(token)]
+
+
+def _note_entries(token):
+    return GuestNote.objects.filter(guest=token).select_related("item__category__business")
+
+
+def _note_rows(token, notes):
+    return [GuestNote(guest=token, item_id=item_id, note=note) for item_id, note in notes.items()]
+
+
+def save_note(token, item_id, note):
+    GuestNote.objects.bulk_create(_note_rows(token, {item_id: note}), **UPSERT)
+
+
+async def asave_note(token, item_id, note):
+    await GuestNote.objects.abulk_create(_note_rows(token, {item_id: note}), **UPSERT)
+
+
+def _token_notes(token, item_ids=None):
+    notes = GuestNote.objects.filter(guest=token)
+    if item_ids is not None:
+        notes = notes.filter(item_id__in=item_ids)
+    return notes
+
+
+def delete_notes(token, item_ids=None):
+    deleted, _by_model = _token_notes(token, item_ids).delete()
+    return deleted
+
+
+async def adelete_notes(token, item_ids=None):
+    deleted, _by_model = await _token_notes(token, item_ids).adelete()
+    return deleted
+
+
+def note_count(token):
+    return _token_notes(token).count() if token else 0
+
+
+async def anote_count(token):
+    return await _token_notes(token).acount() if token else 0
+
+
+def parse_operations(data):
+    if not isinstance(data, dict) or not isinstance(data.get("operations"), list):
+        raise NoteBatchError("درخواست نامعتبر است.")
+    operations = data["operations"]
+    if len(operations) > MAX_OPERATIONS:
+        raise NoteBatchError(f"حداکثر {MAX_OPERATIONS} عملیات در هر درخواست مجاز است.")
+    return operations
+
+
+def _parse_operation(operation):
+    if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+        return None, None, "عملیات نامعتبر است."
+    try:
+        item_id = int(operation.get("item"))
+    except (TypeError, ValueError):
+        return None, None, "شناسه نامعتبر است."
+    note = operation.get("note") if operation["op"] != "remove" else ""
+    if not isinstance(note, str):
+        return item_id, None, "متن یادداشت نامعتبر است."
+    return item_id, note.strip(), None
+
+
+def apply_operations(request, operations):
+    # All item ids are checked with one query; the final state of every item
+    # is then written with one upsert and one DELETE. When an item appears
+    # more than once the last operation wins.
+    parsed = [_parse_operation(operation) for operation in operations]
+    ids = {item_id for item_id, _note, error in parsed if error is None}
+    existing = set(MenuItem.objects.filter(pk__in=ids).order_by().values_list("pk", flat=True)) if ids else set()
+    results, final = [], {}
+    for index, (item_id, note, error) in enumerate(parsed):
+        if error is None and item_id not in existing:
+            error = "محصول پیدا نشد."
+        if error:
+            results.append({"index": index, "item": item_id, "ok": False, "error": error})
+            continue
+        final[item_id] = note
+        results.append({"index": index, "item": item_id, "ok": True, "has_note": bool(note), "note": note})
+    stored = {item_id: note for item_id, note in final.items() if note}
+    removed = [item_id for item_id, note in final.items() if not note]
+    token = ensure_guest_token(request) if stored else guest_token(request)
+    if token and final:
+        with transaction.atomic():
+            if stored:
+                GuestNote.objects.bulk_create(_note_rows(token, stored), **UPSERT)
+            if removed:
+                delete_notes(token, removed)
+    return results, note_count(token)
@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models import Q
+
+from . import search
+from .models import MenuCategory, MenuItem
+from .signals import notify_menu_changed
+
+
+class OrderError(ValueError):
+    pass
+
+
+def parse_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise OrderError("شناسه نامعتبر است.") from None
+
+
+def parse_order(data, key):
+    # Either the full list under ``key`` or {"move": {"id": .., "position": ..}}.
+    if not isinstance(data, dict):
+        raise OrderError("درخواست نامعتبر است.")
+    move = data.get("move")
+    if move is not None:
+        if not isinstance(move, dict):
+            raise OrderError("درخواست نامعتبر است.")
+        position = parse_pk(move.get("position"))
+        if position < 0:
+            raise OrderError("جایگاه نامعتبر است.")
+        return [parse_pk(move.get("id"))], position
+    values = data.get(key)
+    if not isinstance(values, list):
+        raise OrderError("درخواست نامعتبر است.")
+    ids = [parse_pk(value) for value in values]
+    if len(set(ids)) != len(ids):
+        raise OrderError("شناسه تکراری است.")
+    return ids, None
+
+
+def _sequence(current, ids, position):
+    # Posted rows first (or the moved row at ``position``); everything else
+    # keeps its relative order, so only rows whose index shifts are written.
+    posted = set(ids)
+    rest = [pk for pk in current if pk not in posted]
+    if position is None:
+        return ids + rest
+    rest.insert(min(position, len(rest)), ids[0])
+    return rest
+
+
+def reorder_categories(business, ids, position=None):
+    with transaction.atomic():
+        rows = list(
+            MenuCategory.objects.select_for_update()
+            .filter(business=business)
+            .order_by("order", "title", "pk")
+            .values_list("pk", "order")
+        )
+        orders = dict(rows)
+        if not set(ids) <= orders.keys():
+            raise OrderError("دسته‌بندی یافت نشد.")
+        sequence = _sequence([pk for pk, _order in rows], ids, position)
+        changed = {pk: index for index, pk in enumerate(sequence) if orders[pk] != index}
+        MenuCategory.objects.bulk_update(
+            [MenuCategory(pk=pk, order=order) for pk, order in changed.items()], ["order"]
+        )
+    if changed:
+        notify_menu_changed(MenuCategory, business.slug)
+    return [{"id": pk, "order": order} for pk, order in changed.items()]
+
+
+def reorder_items(business, category_id, ids, position=None):
+    # One read fetches the target category's items together with any posted
+    # item dragged in from another category, all scoped to ``business``.
+    with transaction.atomic():
+        if not MenuCategory.objects.filter(business=business, pk=category_id).exists():
+            raise OrderError("دسته‌بندی یافت نشد.")
+        rows = list(
+            MenuItem.objects.select_for_update()
+            .filter(Q(category_id=category_id) | Q(pk__in=ids), category__business=business)
+            .order_by("sort_order", "name", "pk")
+            .values_list("pk", "category_id", "sort_order")
+        )
+        current = {pk: (category, order) for pk, category, order in rows}
+        if not set(ids) <= current.keys():
+            raise OrderError("محصول یافت نشد.")
+        sequence = _sequence([pk for pk, _category, _order in rows], ids, position)
+        changed = {pk: index for index, pk in enumerate(sequence) if current[pk] != (category_id, index)}
+        moved = [pk for pk in changed if current[pk][0] != category_id]
+        MenuItem.objects.bulk_update(
+            [MenuItem(pk=pk, category_id=category_id, sort_order=order) for pk, order in changed.items()],
+            ["category", "sort_order"] if moved else ["sort_order"],
+        )
+        for pk in moved:
+            search.reindex_items("item", pk)
+    if changed:
+        notify_menu_changed(MenuItem, business.slug)
+    return [
+        {"id": pk, "sort_order": order, **({"category_id": category_id} if pk in moved else {})}
+        for pk, order in changed.items()
+    ]
@@ -0,0 +1,124 @@
+import base64
+import binascii
+import json
+
+from django.db.models import F, Q
+
+# What each cursor field holds: the business name and pk, an item's sort order
+# and pk, or a position in ranked search results.
+CURSOR_FIELDS = {"n": str, "b": int, "s": int, "i": int, "r": int}
+
+
+def encode_cursor(key):
+    raw = json.dumps(key, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value, keys=("n", "b")):
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        key = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(key, dict) or not set(keys) <= key.keys():
+        return None
+    for name in key.keys() & CURSOR_FIELDS.keys():
+        value = key[name]
+        if not isinstance(value, CURSOR_FIELDS[name]) or isinstance(value, bool):
+            return None
+    return key
+
+
+def with_business_keys(items):
+    return items.annotate(
+        business_name=F("category__business__name"),
+        business_pk=F("category__business_id"),
+    ).order_by("business_name", "business_pk", "sort_order", "pk")
+
+
+def item_key(item):
+    return {"n": item.business_name, "b": item.business_pk, "s": item.sort_order, "i": item.pk}
+
+
+def business_end_key(item):
+    return {"n": item.business_name, "b": item.business_pk}
+
+
+def keyset_after(key):
+    if key is None:
+        return Q()
+    name, business = key["n"], key["b"]
+    after = Q(business_name__gt=name) | Q(business_name=name, business_pk__gt=business)
+    if "s" in key and "i" in key:
+        after |= Q(business_name=name, business_pk=business, sort_order__gt=key["s"])
+        after |= Q(business_name=name, business_pk=business, sort_order=key["s"], pk__gt=key["i"])
+    return after
+
+
+def paginate_by_business(items, cursor, page_size, per_business, chunk_size=100):
+    # Walks ``items`` in keyset order a chunk at a time. Once a cafe reaches
+    # ``per_business`` rows the rest of it is skipped with a fresh keyset query,
+    # so memory and work stay bounded by the page, not by the number of matches.
+    items = with_business_keys(items)
+    groups = []
+    count = 0
+    after = cursor
+    while True:
+        chunk = list(items.filter(keyset_after(after))[:chunk_size])
+        skipped = False
+        for item in chunk:
+            business = item.category.business
+            if groups and groups[-1]["business"].pk == business.pk:
+                group = groups[-1]
+            else:
+                if count >= page_size:
+                    return groups, after
+                group = {"business": business, "items": [], "has_more": False}
+                groups.append(group)
+            if per_business is not None and len(group["items"]) >= per_business:
+                group["has_more"] = True
+                after = business_end_key(item)
+                skipped = True
+                break
+            if count >= page_size:
+                return groups, after
+            group["items"].append(item)
+            count += 1
+            after = item_key(item)
+        if not skipped and len(chunk) < chunk_size:
+            return groups, None
+
+
+def paginate_businesses(businesses, cursor, page_size):
+    # Keyset pages over (name, pk); one extra row tells whether more follow.
+    return _business_page(list(_businesses_after(businesses, cursor, page_size)), page_size)
+
+
+async def apaginate_businesses(businesses, cursor, page_size):
+    page = [business async for business in _businesses_after(businesses, cursor, page_size)]
+    return _business_page(page, page_size)
+
+
+def _businesses_after(businesses, cursor, page_size):
+    if cursor is not None:
+        businesses = businesses.filter(Q(name__gt=cursor["n"]) | Q(name=cursor["n"], pk__gt=cursor["b"]))
+    return businesses.order_by("name", "pk")[: page_size + 1]
+
+
+def _business_page(page, page_size):
+    if len(page) <= page_size:
+        return page, None
+    last = page[page_size - 1]
+    return page[:page_size], {"n": last.name, "b": last.pk}
+
+
+def paginate_ranked(businesses, ranked_ids, cursor, page_size):
+    # Search results keep their rank order, so the cursor is a position in it.
+    start = max(cursor["r"], 0) if cursor is not None else 0
+    page_ids = ranked_ids[start : start + page_size]
+    position = {pk: index for index, pk in enumerate(page_ids)}
+    page = sorted(businesses.filter(pk__in=page_ids), key=lambda business: position[business.pk])
+    more = start + page_size < len(ranked_ids)
+    return page, {"r": start + page_size} if more else None
@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from importlib import import_module
+from pathlib import Path
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.urls import resolve, reverse
+
+from businesses.models import Business
+from .models import MenuCategory, MenuItem
+from .signals import menu_changed
+
+# Each business is published as <root>/<slug> -> <root>/.builds/<slug>-XXXX.
+# A finished build replaces the symlink in one rename, so the web server
+# never sees a half-written menu or a mix of old and new item pages.
+BUILDS_DIR = ".builds"
+
+_local = threading.local()
+
+
+def publish_root():
+    return Path(getattr(settings, "MENU_PUBLISH_ROOT", settings.BASE_DIR / "publish"))
+
+
+def render_page(view, url, **kwargs):
+    path = unquote(url)
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {"SERVER_NAME": "localhost", "SERVER_PORT": "80"}
+    request.user = AnonymousUser()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request.resolver_match = resolve(path)
+    response = view.as_view(extra_context={"published": True})(request, **kwargs)
+    if response.status_code != 200:
+        return None
+    response.render()
+    return response.content
+
+
+def render_business(business, categories=None):
+    # ``categories`` limits the item pages to those categories' items.
+    from .views import BusinessDetailView, ItemDetailView
+
+    pages = {"index.html": render_page(BusinessDetailView, business.get_absolute_url(), slug=business.slug)}
+    item_slugs = (
+        MenuItem.objects.filter(category__business=business, is_active=True)
+        .exclude(slug="")
+        .values_list("slug", flat=True)
+    )
+    if categories is not None:
+        item_slugs = item_slugs.filter(category__in=categories)
+    for item_slug in item_slugs:
+        path = reverse("menu:item_detail", kwargs={"business_slug": business.slug, "item_slug": item_slug})
+        pages[f"item/{item_slug}/index.html"] = render_page(
+            ItemDetailView, path, business_slug=business.slug, item_slug=item_slug
+        )
+    return {name: content for name, content in pages.items() if content is not None}
+
+
+def publish_business(slug, items_only=False):
+    # With ``items_only`` the previous build is copied and only the menu page
+    # and the item pages of categories changed since it was rendered are
+    # rendered again; a build's mtime records when its rendering started.
+    business = Business.objects.filter(slug=slug).first()
+    if business is None:
+        unpublish_business(slug)
+        return 0
+    root = publish_root()
+    builds = root / BUILDS_DIR
+    builds.mkdir(parents=True, exist_ok=True)
+    link = root / slug
+    previous = link.resolve() if link.is_symlink() else None
+    build = Path(tempfile.mkdtemp(prefix=f"{slug}-", dir=builds))
+    started = time.time()
+    try:
+        categories = None
+        if items_only and previous is not None and previous.is_dir():
+            since = datetime.fromtimestamp(previous.stat().st_mtime, tz=timezone.utc)
+            shutil.copytree(previous, build, dirs_exist_ok=True)
+            _drop_unlisted_items(build, business)
+            categories = MenuCategory.objects.filter(business=business, content_updated_at__gte=since)
+        pages = render_business(business, categories)
+        for name, content in pages.items():
+            target = build / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+        build.chmod(0o755)
+        os.utime(build, (started, started))
+        _swap(link, build)
+    except BaseException:
+        shutil.rmtree(build, ignore_errors=True)
+        raise
+    return len(pages)
+
+
+def _drop_unlisted_items(build, business):
+    items = build / "item"
+    if not items.is_dir():
+        return
+    listed = set(
+        MenuItem.objects.filter(category__business=business, is_active=True)
+        .exclude(slug="")
+        .values_list("slug", flat=True)
+    )
+    for page in items.iterdir():
+        if page.name not in listed:
+            shutil.rmtree(page, ignore_errors=True)
+
+
+def unpublish_business(slug):
+    link = publish_root() / slug
+    if link.is_symlink():
+        previous = link.resolve()
+        link.unlink()
+        shutil.rmtree(previous, ignore_errors=True)
+    elif link.exists():
+        shutil.rmtree(link)
+
+
+def _swap(link, build):
+    previous = link.resolve() if link.is_symlink() else None
+    if link.exists() and previous is None:
+        shutil.rmtree(link)
+    temporary = link.with_name(f".{link.name}.{os.getpid()}.{threading.get_ident()}")
+    os.symlink(os.path.relpath(build, link.parent), temporary)
+    os.replace(temporary, link)
+    if previous is not None and previous != build:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+class PublishBatch:
+    def __init__(self):
+        self.slugs = {}
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        for slug, items_only in self.slugs.items():
+            publish_business(slug, items_only)
+
+
+def _pending_batch(connection):
+    # A batch is reusable only while its callback is still queued on this
+    # connection; a rollback drops it together with the rest of the block.
+    batch = getattr(_local, "batch", None)
+    if batch is not None and not batch.done and any(entry[1] is batch for entry in connection.run_on_commit):
+        return batch
+    return None
+
+
+@receiver(menu_changed)
+def schedule_publish(sender, business_slug, items_only=False, **kwargs):
+    if not getattr(settings, "MENU_PUBLISH_ON_SAVE", False):
+        return
+    batch = _pending_batch(transaction.get_connection())
+    if batch is None:
+        batch = _local.batch = PublishBatch()
+        batch.slugs[business_slug] = items_only
+        # Outside a transaction this publishes right away; a failed render is
+        # logged instead of failing the edit that triggered it.
+        transaction.on_commit(batch, robust=True)
+    else:
+        batch.slugs[business_slug] = batch.slugs.get(business_slug, True) and items_only
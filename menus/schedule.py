@@ -0,0 +1,72 @@
+from datetime import datetime, time, timedelta
+
+# Bit ``n`` of a schedule mask is ``datetime.weekday() == n`` (Monday is 0).
+WEEKDAY_CODES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+ALL_DAYS = (1 << len(WEEKDAY_CODES)) - 1
+DAY_START = 0
+DAY_END = 24 * 60 * 60 - 1
+
+
+def seconds_of_day(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def compile_schedule(is_full_time, available_days, available_from, available_to):
+    if is_full_time:
+        return ALL_DAYS, DAY_START, DAY_END
+
+    codes = [day.strip() for day in (available_days or "").split(',') if day.strip()]
+    days_mask = ALL_DAYS
+    if codes:
+        days_mask = 0
+        for code in codes:
+            if code in WEEKDAY_CODES:
+                days_mask |= 1 << WEEKDAY_CODES.index(code)
+
+    if available_from and available_to:
+        start, end = seconds_of_day(available_from), seconds_of_day(available_to)
+        if start > end:
+            return 0, DAY_START, DAY_END
+        return days_mask, start, end
+    return days_mask, DAY_START, DAY_END
+
+
+def is_scheduled(item, moment):
+    if item.display_start and moment.date() < item.display_start:
+        return False
+    if item.display_end and moment.date() > item.display_end:
+        return False
+    if not item.schedule_days & (1 << moment.weekday()):
+        return False
+    return item.schedule_start <= seconds_of_day(moment) <= item.schedule_end
+
+
+def next_visibility_change(item, after):
+    if not item.is_active:
+        return None
+
+    tz = after.tzinfo
+    today = after.date()
+    days = {today + timedelta(days=offset) for offset in range(8)}
+    if item.display_start and item.display_start > today:
+        days.add(item.display_start)
+    if item.display_end and item.display_end >= today:
+        days.add(item.display_end + timedelta(days=1))
+
+    candidates = set()
+    for day in days:
+        midnight = datetime.combine(day, time(), tzinfo=tz)
+        candidates.add(midnight)
+        candidates.add(midnight + timedelta(seconds=item.schedule_start))
+        candidates.add(midnight + timedelta(seconds=item.schedule_end + 1))
+
+    current = is_scheduled(item, after)
+    for moment in sorted(candidate for candidate in candidates if candidate > after):
+        if is_scheduled(item, moment) != current:
+            return moment
+    return None
+
+
+def earliest_visibility_change(items, after):
+    changes = [change for change in (next_visibility_change(item, after) for item in items) if change]
+    return min(changes, default=None)
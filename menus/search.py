@@ -0,0 +1,294 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from businesses.models import Business
+from .models import MenuCategory, MenuItem
+from .signals import cascaded
+from .text import normalize_text, trigrams
+
+ITEM_TABLE = "menus_item_fts"
+BUSINESS_TABLE = "menus_business_fts"
+ITEM_TRIGRAM_TABLE = "menus_item_trigram"
+BUSINESS_TRIGRAM_TABLE = "menus_business_trigram"
+
+CREATE_TABLES = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {ITEM_TABLE} USING fts5("
+    "name, description, tags, category, business, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {BUSINESS_TABLE} USING fts5("
+    "name, tagline, city, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {ITEM_TRIGRAM_TABLE} USING fts5(name, tokenize='trigram')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {BUSINESS_TRIGRAM_TABLE} USING fts5(name, tokenize='trigram')",
+]
+DROP_TABLES = [
+    f"DROP TABLE IF EXISTS {table}"
+    for table in (ITEM_TABLE, BUSINESS_TABLE, ITEM_TRIGRAM_TABLE, BUSINESS_TRIGRAM_TABLE)
+]
+
+# Every indexed column goes through normalize_text(), registered on each SQLite
+# connection below, so stored text and queries share one spelling.
+ITEMS_SOURCE = """
+    FROM menus_menuitem AS item
+    JOIN menus_menucategory AS category ON category.id = item.category_id
+    JOIN businesses_business AS business ON business.id = category.business_id
+"""
+ITEM_INDEXES = {
+    ITEM_TABLE: f"""
+        INSERT INTO {ITEM_TABLE} (rowid, name, description, tags, category, business)
+        SELECT item.id, normalize_text(item.name), normalize_text(item.description),
+               normalize_text(item.tags), normalize_text(category.title), normalize_text(business.name)
+        {ITEMS_SOURCE}
+    """,
+    ITEM_TRIGRAM_TABLE: f"""
+        INSERT INTO {ITEM_TRIGRAM_TABLE} (rowid, name)
+        SELECT item.id, normalize_text(item.name)
+        {ITEMS_SOURCE}
+    """,
+}
+BUSINESS_INDEXES = {
+    BUSINESS_TABLE: f"""
+        INSERT INTO {BUSINESS_TABLE} (rowid, name, tagline, city, description)
+        SELECT business.id, normalize_text(business.name), normalize_text(business.tagline),
+               normalize_text(business.city), normalize_text(business.description)
+        FROM businesses_business AS business
+    """,
+    BUSINESS_TRIGRAM_TABLE: f"""
+        INSERT INTO {BUSINESS_TRIGRAM_TABLE} (rowid, name)
+        SELECT business.id, normalize_text(business.name)
+        FROM businesses_business AS business
+    """,
+}
+ITEMS_OF = {
+    "item": "item.id = %s",
+    "category": "item.category_id = %s",
+    "business": "category.business_id = %s",
+}
+
+# Column weights for bm25(); lower scores rank first.
+ITEM_WEIGHTS = "10.0, 2.0, 4.0, 3.0, 1.0"
+BUSINESS_WEIGHTS = "10.0, 4.0, 3.0, 1.0"
+
+# Share of the query's trigrams a name must contain to count as a typo match.
+FUZZY_THRESHOLD = 0.5
+FUZZY_CANDIDATES = 50
+
+_available = {}
+
+
+def register_functions(dbapi_connection):
+    dbapi_connection.create_function("normalize_text", 1, normalize_text, deterministic=True)
+
+
+@receiver(connection_created)
+def setup_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        register_functions(connection.connection)
+
+
+def create_index(cursor):
+    for statement in CREATE_TABLES:
+        cursor.execute(statement)
+
+
+def drop_index(cursor):
+    for statement in DROP_TABLES:
+        cursor.execute(statement)
+
+
+def fts_available():
+    if connection.vendor != "sqlite":
+        return False
+    if connection.alias not in _available:
+        tables = [ITEM_TABLE, BUSINESS_TABLE, ITEM_TRIGRAM_TABLE, BUSINESS_TRIGRAM_TABLE]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)", tables)
+            _available[connection.alias] = cursor.fetchone()[0] == len(tables)
+    return _available[connection.alias]
+
+
+def rebuild_index():
+    with connection.cursor() as cursor:
+        drop_index(cursor)
+        create_index(cursor)
+        for statement in [*ITEM_INDEXES.values(), *BUSINESS_INDEXES.values()]:
+            cursor.execute(statement)
+    _available[connection.alias] = True
+
+
+def reindex_items(scope, pk):
+    if not fts_available():
+        return
+    condition = ITEMS_OF[scope]
+    with connection.cursor() as cursor:
+        for table, statement in ITEM_INDEXES.items():
+            cursor.execute(
+                f"DELETE FROM {table} WHERE rowid IN (SELECT item.id {ITEMS_SOURCE} WHERE {condition})",
+                [pk],
+            )
+            cursor.execute(f"{statement} WHERE {condition}", [pk])
+
+
+def reindex_business(pk):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        for table, statement in BUSINESS_INDEXES.items():
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [pk])
+            cursor.execute(f"{statement} WHERE business.id = %s", [pk])
+
+
+def unindex_items(scope, pk):
+    if not fts_available():
+        return
+    condition = ITEMS_OF[scope]
+    with connection.cursor() as cursor:
+        for table in ITEM_INDEXES:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE rowid IN (SELECT item.id {ITEMS_SOURCE} WHERE {condition})",
+                [pk],
+            )
+
+
+def unindex(tables, pk):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [pk])
+
+
+def match_expression(query):
+    terms = re.findall(r"\w+", normalize_text(query))
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def fuzzy_expression(query):
+    grams = sorted(gram for gram in trigrams(normalize_text(query)) if '"' not in gram)
+    if not grams:
+        return None
+    return " OR ".join(f'"{gram}"' for gram in grams)
+
+
+def exact_search_sql(table, weights):
+    return f"SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY bm25({table}, {weights})"
+
+
+def fuzzy_search_sql(table):
+    return f"SELECT rowid, name FROM {table} WHERE {table} MATCH %s ORDER BY rank LIMIT {FUZZY_CANDIDATES}"
+
+
+def rank_fuzzy_candidates(query, rows):
+    wanted = trigrams(normalize_text(query))
+    scored = []
+    for position, (pk, name) in enumerate(rows):
+        score = len(wanted & trigrams(name)) / len(wanted)
+        if score >= FUZZY_THRESHOLD:
+            scored.append((-score, position, pk))
+    return [pk for _score, _position, pk in sorted(scored)]
+
+
+def _ranked_ids(table, trigram_table, weights, query, limit):
+    expression = match_expression(query)
+    if expression is None or not fts_available():
+        return None
+    sql = exact_search_sql(table, weights)
+    params = [expression]
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ids = [row[0] for row in cursor.fetchall()]
+        if ids:
+            return ids
+        expression = fuzzy_expression(query)
+        if expression is None:
+            return ids
+        cursor.execute(fuzzy_search_sql(trigram_table), [expression])
+        ids = rank_fuzzy_candidates(query, cursor.fetchall())
+    return ids[:limit] if limit else ids
+
+
+def ranked_item_ids(query, limit=None):
+    return _ranked_ids(ITEM_TABLE, ITEM_TRIGRAM_TABLE, ITEM_WEIGHTS, query, limit)
+
+
+def ranked_business_ids(query, limit=None):
+    return _ranked_ids(BUSINESS_TABLE, BUSINESS_TRIGRAM_TABLE, BUSINESS_WEIGHTS, query, limit)
+
+
+def _has_matches(table, expression):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {table} WHERE {table} MATCH %s LIMIT 1", [expression])
+        return cursor.fetchone() is not None
+
+
+def item_search_filter(query):
+    expression = match_expression(query)
+    if expression is None or not fts_available():
+        return None
+    if _has_matches(ITEM_TABLE, expression):
+        return Q(pk__in=RawSQL(f"SELECT rowid FROM {ITEM_TABLE} WHERE {ITEM_TABLE} MATCH %s", [expression]))
+    return Q(pk__in=ranked_item_ids(query))
+
+
+@receiver(post_save, sender=MenuItem)
+def index_item(sender, instance, **kwargs):
+    reindex_items("item", instance.pk)
+
+
+def _renamed(instance, field, update_fields):
+    # Item rows copy their category's title and business's name, so only a
+    # rename has to rewrite them.
+    if instance.pk is None or (update_fields is not None and field not in update_fields):
+        return False
+    stored = type(instance)._base_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+    return stored is not None and stored != getattr(instance, field)
+
+
+@receiver(pre_save, sender=MenuCategory)
+def remember_category_title(sender, instance, update_fields=None, **kwargs):
+    instance._reindex_items = _renamed(instance, "title", update_fields)
+
+
+@receiver(post_save, sender=MenuCategory)
+def index_category(sender, instance, **kwargs):
+    if getattr(instance, "_reindex_items", False):
+        reindex_items("category", instance.pk)
+
+
+@receiver(pre_save, sender=Business)
+def remember_business_name(sender, instance, update_fields=None, **kwargs):
+    instance._reindex_items = _renamed(instance, "name", update_fields)
+
+
+@receiver(post_save, sender=Business)
+def index_business(sender, instance, **kwargs):
+    reindex_business(instance.pk)
+    if getattr(instance, "_reindex_items", False):
+        reindex_items("business", instance.pk)
+
+
+@receiver(pre_delete, sender=MenuItem)
+def unindex_item(sender, instance, origin=None, **kwargs):
+    if not cascaded(origin, MenuItem):
+        unindex(ITEM_INDEXES, instance.pk)
+
+
+@receiver(pre_delete, sender=MenuCategory)
+def unindex_category(sender, instance, origin=None, **kwargs):
+    if not cascaded(origin, MenuCategory):
+        unindex_items("category", instance.pk)
+
+
+@receiver(pre_delete, sender=Business)
+def unindex_business(sender, instance, **kwargs):
+    unindex(BUSINESS_INDEXES, instance.pk)
+    unindex_items("business", instance.pk)
@@ -0,0 +1,102 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from businesses.models import Business, BusinessHour
+from .models import MenuCategory, MenuItem, MenuItemImage
+
+
+# Sent whenever anything rendered on a business's public menu changes.
+# Receivers get ``business_slug`` and should drop whatever they derived from it.
+# ``items_only`` is set when single item rows or their images changed; every
+# category listing them then has a fresh content_updated_at (menus/fragments.py).
+menu_changed = Signal()
+
+
+def notify_menu_changed(sender, *slugs, items_only=False):
+    for slug in dict.fromkeys(slugs):
+        if slug:
+            menu_changed.send(sender=sender, business_slug=slug, items_only=items_only)
+
+
+def cascaded(origin, model):
+    # True for ``model`` rows removed because a parent row is being deleted;
+    # receivers for the parent handle all of its children in one go.
+    if origin is None:
+        return False
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is not model
+
+
+@receiver(menu_changed)
+def touch_menu_updated_at(sender, business_slug, **kwargs):
+    Business.objects.filter(slug=business_slug).update(menu_updated_at=timezone.now())
+
+
+def _slug_for_business_id(business_id):
+    return Business.objects.filter(pk=business_id).values_list("slug", flat=True).first()
+
+
+def _slug_for_owned(instance):
+    if type(instance).business.is_cached(instance):
+        return instance.business.slug
+    return _slug_for_business_id(instance.business_id)
+
+
+def _slug_for_item(item):
+    if MenuItem.category.is_cached(item):
+        return _slug_for_owned(item.category)
+    return (
+        Business.objects.filter(categories__pk=item.category_id)
+        .values_list("slug", flat=True)
+        .first()
+    )
+
+
+def _slug_for_image(image):
+    if MenuItemImage.menu_item.is_cached(image):
+        return _slug_for_item(image.menu_item)
+    return (
+        Business.objects.filter(categories__items__pk=image.menu_item_id)
+        .values_list("slug", flat=True)
+        .first()
+    )
+
+
+@receiver(pre_save, sender=Business)
+def remember_previous_slug(sender, instance, **kwargs):
+    instance._previous_slug = _slug_for_business_id(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Business)
+def business_saved(sender, instance, **kwargs):
+    notify_menu_changed(sender, instance.slug, getattr(instance, "_previous_slug", None))
+
+
+@receiver(pre_delete, sender=Business)
+def business_deleted(sender, instance, **kwargs):
+    notify_menu_changed(sender, instance.slug)
+
+
+@receiver(post_save, sender=BusinessHour)
+@receiver(pre_delete, sender=BusinessHour)
+@receiver(post_save, sender=MenuCategory)
+@receiver(pre_delete, sender=MenuCategory)
+def business_child_changed(sender, instance, origin=None, **kwargs):
+    if not cascaded(origin, sender):
+        notify_menu_changed(sender, _slug_for_owned(instance))
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(pre_delete, sender=MenuItem)
+def item_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if not cascaded(origin, MenuItem):
+        notify_menu_changed(sender, _slug_for_item(instance), items_only=not raw)
+
+
+@receiver(post_save, sender=MenuItemImage)
+@receiver(pre_delete, sender=MenuItemImage)
+def item_image_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if not cascaded(origin, MenuItemImage):
+        notify_menu_changed(sender, _slug_for_image(instance), items_only=not raw)
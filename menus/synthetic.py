@@ -0,0 +1,162 @@
+import random
+from datetime import time, timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from businesses.models import Business, BusinessHour
+from . import featured, images, search
+from .counters import recount
+from .models import MenuCategory, MenuItem, MenuItemImage
+
+# Production-scale menus for local profiling: every row goes in through
+# bulk_create, and all rows share a small pool of tiny generated images.
+WORDS = [
+    "اسپرسو", "لاته", "کاپوچینو", "موکا", "آمریکانو", "ماکیاتو", "کارامل", "وانیل", "فندق", "شکلات",
+    "دارچین", "زعفران", "بستنی", "کیک", "چیزکیک", "تیرامیسو", "براونی", "کوکی", "وافل", "پنکیک",
+    "ساندویچ", "پیتزا", "پاستا", "سالاد", "سوپ", "برگر", "مرغ", "قارچ", "پنیر", "گوجه",
+    "چای", "ماسالا", "سبز", "دمنوش", "لیموناد", "موهیتو", "اسموتی", "شیک", "توت‌فرنگی", "انبه",
+    "سرد", "گرم", "ویژه", "بزرگ", "کوچک", "دبل", "خانگی", "فصلی", "رژیمی", "تند",
+]
+CITIES = ["تهران", "اصفهان", "شیراز", "مشهد", "تبریز", "رشت", "یزد", "کرج"]
+# The same week as scripts/seed_demo.py: Friday closed, late close on Thursday.
+HOURS = {
+    "sat": (time(8), time(23)),
+    "sun": (time(8), time(23)),
+    "mon": (time(8), time(23)),
+    "tue": (time(8), time(23)),
+    "wed": (time(8), time(23)),
+    "thu": (time(8), time(23, 59)),
+    "fri": (None, None),
+}
+SCHEDULE_DAYS = ["sat,sun,mon,tue,wed", "thu,fri", "sat,mon,wed"]
+SCHEDULE_HOURS = [(time(7), time(11)), (time(11), time(16)), (time(17), time(23)), (time(22), time(2))]
+POOL_SIZE = 8
+PASSWORD = "demo1234"
+
+
+def tiny_image(color, size=(48, 32)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def image_pool(folder, rng, size=POOL_SIZE):
+    # Stored once with their derivatives, so pages render like production.
+    names = []
+    for index in range(size):
+        name = f"synthetic/{folder}/{index}.jpg"
+        if not default_storage.exists(name):
+            data = tiny_image(tuple(rng.randrange(40, 220) for _channel in range(3)))
+            name = default_storage.save(name, ContentFile(data))
+            images.store_derivatives(default_storage, name, images.render_derivatives(name, data))
+        names.append(name)
+    return names
+
+
+class Generator:
+    def __init__(self, categories=10, items=50, gallery=1, scheduled=0.2, featured=0.05, prefix="synthetic", seed=1):
+        self.categories = categories
+        self.items = items
+        self.gallery = gallery
+        self.scheduled = scheduled
+        self.featured = featured
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.password = make_password(PASSWORD)
+        self.pools = {folder: image_pool(folder, self.rng) for folder in ("logos", "covers", "items", "gallery")}
+        self.now = timezone.now()
+
+    def phrase(self, words):
+        return " ".join(self.rng.sample(WORDS, words))
+
+    def generate(self, count, batch=20, progress=None):
+        start = Business.objects.filter(slug__startswith=f"{self.prefix}-").count()
+        created = 0
+        while created < count:
+            size = min(batch, count - created)
+            with transaction.atomic():
+                self.create_batch(range(start + created, start + created + size))
+            created += size
+            if progress:
+                progress(created)
+        featured.schedule_refresh()
+        return created
+
+    def create_batch(self, numbers):
+        owners = get_user_model().objects.bulk_create(
+            [get_user_model()(username=f"{self.prefix}-owner-{n}", password=self.password) for n in numbers]
+        )
+        businesses = Business.objects.bulk_create(
+            [self.business(n, owner) for n, owner in zip(numbers, owners)]
+        )
+        BusinessHour.objects.bulk_create(
+            [
+                BusinessHour(business=business, day_of_week=day, opens_at=opens, closes_at=closes, is_closed=opens is None)
+                for business in businesses
+                for day, (opens, closes) in HOURS.items()
+            ]
+        )
+        categories = MenuCategory.objects.bulk_create(
+            [
+                MenuCategory(business=business, title=f"{self.phrase(1)} {c + 1}", slug=f"category-{c + 1}", order=c + 1)
+                for business in businesses
+                for c in range(self.categories)
+            ]
+        )
+        items = MenuItem.objects.bulk_create(
+            [self.item(category, i) for category in categories for i in range(self.items)], batch_size=2000
+        )
+        MenuItemImage.objects.bulk_create(
+            [
+                MenuItemImage(menu_item=item, image=self.rng.choice(self.pools["gallery"]), order=n)
+                for item in items
+                for n in range(self.gallery)
+            ],
+            batch_size=2000,
+        )
+        recount(Business.objects.filter(pk__in=[business.pk for business in businesses]))
+        for business in businesses:
+            search.reindex_business(business.pk)
+            search.reindex_items("business", business.pk)
+
+    def business(self, n, owner):
+        return Business(
+            owner=owner,
+            name=f"کافه {self.phrase(2)} {n}",
+            slug=f"{self.prefix}-{n}",
+            tagline=self.phrase(3),
+            description=self.phrase(12),
+            city=self.rng.choice(CITIES),
+            logo=self.rng.choice(self.pools["logos"]),
+            cover_image=self.rng.choice(self.pools["covers"]),
+            menu_updated_at=self.now,
+        )
+
+    def item(self, category, i):
+        item = MenuItem(
+            category=category,
+            business_id=category.business_id,
+            name=f"{self.phrase(self.rng.randint(1, 3))} {i + 1}",
+            slug=f"item-{category.order}-{i + 1}",
+            description=self.phrase(10),
+            price=self.rng.randrange(40, 400) * 1000,
+            tags=",".join(self.rng.sample(WORDS, 2)),
+            primary_image=self.rng.choice(self.pools["items"]),
+            is_featured=self.rng.random() < self.featured,
+            sort_order=i + 1,
+        )
+        if self.rng.random() < self.scheduled:
+            item.is_full_time = False
+            item.available_days = self.rng.choice(SCHEDULE_DAYS)
+            item.available_from, item.available_to = self.rng.choice(SCHEDULE_HOURS)
+            if self.rng.random() < 0.25:
+                item.display_end = (self.now + timedelta(days=self.rng.randint(1, 60))).date()
+        item.compile_schedule()
+        return item
@@ -1,4 +1,7 @@
 from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..images import derivative_url, has_derivatives, srcset
 
 
 register = template.Library()
@@ -19,13 +22,48 @@ def get_item(dictionary, key):
 
 @register.filter
 def note_text(dictionary, key):
-    entry = get_item(dictionary, key)
-    if isinstance(entry, dict):
-        return entry.get("note", "")
-    return ""
+    # ``dictionary`` is menus.notes.guest_notes(): item id -> note text.
+    return get_item(dictionary, key) or ""
 
 
 @register.filter
 def has_note(dictionary, key):
     return bool(get_item(dictionary, key))
 
+
+DEFAULT_SIZES = {
+    "thumb": "160px",
+    "card": "(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw",
+    "full": "100vw",
+}
+
+
+@register.filter
+def image_url(field_file, size="full"):
+    if not field_file:
+        return ""
+    if has_derivatives(field_file):
+        return derivative_url(field_file, size)
+    return field_file.url
+
+
+@register.simple_tag
+def responsive_image(field_file, size="card", sizes=None, **attrs):
+    if not field_file:
+        return ""
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    extra = format_html_join(" ", '{}="{}"', attrs.items())
+    if not has_derivatives(field_file):
+        return format_html('<img src="{}" {}>', field_file.url, extra)
+    sizes = sizes or DEFAULT_SIZES[size]
+    return format_html(
+        '<picture class="contents"><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" {}></picture>',
+        srcset(field_file, "webp"),
+        sizes,
+        derivative_url(field_file, size),
+        srcset(field_file),
+        sizes,
+        extra,
+    )
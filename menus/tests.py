@@ -1,3 +1,1726 @@
-from django.test import TestCase
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import timeit
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.asgi import get_asgi_application
+from django.core.signals import request_finished
+from django.core.wsgi import get_wsgi_application
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import close_old_connections, connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from businesses import slugs
+from businesses.models import Business, BusinessHour
+from businesses.slugs import assign_slugs
+from . import (
+    analytics,
+    async_views,
+    counters,
+    featured,
+    fragments,
+    images,
+    instrumentation,
+    jobs,
+    loadtest,
+    notes,
+    publish,
+    search,
+    transfer,
+    views,
+)
+from .cache import STATS_KEY, build_menu_snapshot, get_snapshot_stats, reset_snapshot_stats
+from .models import GuestNote, ImageJob, MenuCategory, MenuItem, MenuItemImage, MenuViewDay, MenuViewHour, MenuViewMonth
+from .pagination import encode_cursor
+
+
+class MenuTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Tests clear the cache freely; keep them off the site's cache directory.
+        location = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, location, ignore_errors=True)
+        cache_override = override_settings(CACHES={"default": {**settings.CACHES["default"], "LOCATION": location}})
+        cache_override.enable()
+        cls.addClassCleanup(cache_override.disable)
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        analytics._take_buffer()
+        reset_snapshot_stats()
+        self.owner = get_user_model().objects.create_user(username="owner", password="pass1234")
+        self.business = Business.objects.create(owner=self.owner, name="کافه تست", slug="test-cafe")
+        self.category = MenuCategory.objects.create(business=self.business, title="نوشیدنی‌ها", slug="drinks")
+        self.item = MenuItem.objects.create(category=self.category, name="اسپرسو", slug="espresso", price=80000)
+
+    def tearDown(self):
+        cache.clear()
+
+
+class MenuSnapshotTests(MenuTestCase):
+    def get_menu(self, slug="test-cafe"):
+        return self.client.get(reverse("menu:business_detail", kwargs={"slug": slug}))
+
+    def test_second_request_is_served_from_snapshot(self):
+        self.get_menu()
+        with self.assertNumQueries(0):
+            response = self.get_menu()
+        self.assertContains(response, "اسپرسو")
+        stats = get_snapshot_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+
+    def test_snapshot_hits_are_counted_in_memory(self):
+        self.get_menu()
+        self.get_menu()
+        self.assertIsNone(cache.get(STATS_KEY.format(kind="hits")))
+        self.assertEqual(get_snapshot_stats()["hits"], 2)
+        self.assertEqual(cache.get(STATS_KEY.format(kind="hits")), 2)
+        with override_settings(MENU_SNAPSHOT_STATS_FLUSH_SECONDS=0):
+            self.get_menu()
+        self.assertEqual(cache.get(STATS_KEY.format(kind="hits")), 3)
+
+    def test_item_change_invalidates_snapshot(self):
+        self.get_menu()
+        self.item.name = "لاته"
+        self.item.save()
+        self.assertContains(self.get_menu(), "لاته")
+
+    def test_related_rows_invalidate_snapshot(self):
+        self.get_menu()
+        BusinessHour.objects.create(business=self.business, day_of_week="sat")
+        self.assertEqual(get_snapshot_stats()["misses"], 1)
+        self.get_menu()
+        self.assertEqual(get_snapshot_stats()["misses"], 2)
+        self.category.delete()
+        self.assertNotContains(self.get_menu(), "اسپرسو")
+
+    def test_slug_change_drops_old_snapshot(self):
+        self.get_menu()
+        self.business.slug = "renamed-cafe"
+        self.business.save()
+        self.assertEqual(self.get_menu().status_code, 404)
+        self.assertEqual(self.get_menu("renamed-cafe").status_code, 200)
+
+
+class MenuItemScheduleTests(MenuTestCase):
+    def local(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    def make_item(self, **kwargs):
+        return MenuItem.objects.create(category=self.category, name="لاته", price=90000, **kwargs)
+
+    def assert_visible_matches_queryset(self, moment):
+        expected = {item.pk for item in MenuItem.objects.all() if item.is_visible(moment)}
+        self.assertEqual(set(MenuItem.objects.visible(moment).values_list("pk", flat=True)), expected)
+
+    def test_sql_filter_matches_is_visible(self):
+        self.make_item(is_full_time=False, available_days="sat,sun", available_from=time(10), available_to=time(22))
+        self.make_item(is_full_time=False, available_days="", available_from=time(8), available_to=time(9))
+        self.make_item(display_start=date(2025, 1, 10), display_end=date(2025, 1, 20))
+        self.make_item(is_active=False)
+        # 2025-01-11 is a Saturday.
+        for moment in [
+            self.local(2025, 1, 11, 9, 30),
+            self.local(2025, 1, 11, 10, 0),
+            self.local(2025, 1, 11, 22, 0, 1),
+            self.local(2025, 1, 13, 8, 30),
+            self.local(2025, 1, 13, 12, 0),
+            self.local(2025, 1, 25, 12, 0),
+        ]:
+            self.assert_visible_matches_queryset(moment)
+
+    def test_schedule_is_recompiled_on_save(self):
+        item = self.make_item(is_full_time=False, available_days="mon", available_from=time(10), available_to=time(12))
+        monday_morning = self.local(2025, 1, 13, 11, 0)
+        self.assertTrue(item.is_visible(monday_morning))
+        item.available_days = "tue"
+        item.save()
+        self.assertFalse(MenuItem.objects.get(pk=item.pk).is_visible(monday_morning))
+
+    def test_next_visibility_change(self):
+        item = self.make_item(is_full_time=False, available_days="mon", available_from=time(10), available_to=time(12))
+        self.assertEqual(item.next_visibility_change(self.local(2025, 1, 13, 9, 0)), self.local(2025, 1, 13, 10, 0))
+        self.assertEqual(item.next_visibility_change(self.local(2025, 1, 13, 11, 0)), self.local(2025, 1, 13, 12, 0, 1))
+        self.assertEqual(item.next_visibility_change(self.local(2025, 1, 13, 13, 0)), self.local(2025, 1, 20, 10, 0))
+        self.assertIsNone(self.item.next_visibility_change(self.local(2025, 1, 13, 13, 0)))
+
+
+class MenuAssemblyQueryTests(MenuTestCase):
+    def grow_menu(self, categories, items_per_category=3):
+        for index in range(categories):
+            category = MenuCategory.objects.create(business=self.business, title=f"دسته {index}", order=index)
+            for position in range(items_per_category):
+                item = MenuItem.objects.create(
+                    category=category, name=f"اسپرسو {index}-{position}", price=1000, sort_order=position
+                )
+                MenuItemImage.objects.create(menu_item=item, image="menus/items/gallery/sample.jpg")
+
+    def count_queries(self, path):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_menu_size(self):
+        url = reverse("menu:business_detail", kwargs={"slug": self.business.slug})
+        small = (self.count_queries(url), self.count_queries(url + "?q=اسپرسو"))
+        self.grow_menu(40)
+        large = (self.count_queries(url), self.count_queries(url + "?q=اسپرسو"))
+        self.assertEqual(small, large)
+        # A cold search also warms the menu snapshot its ETag is derived from.
+        self.assertLessEqual(large[0], 5)
+        self.assertLessEqual(large[1], 10)
+
+
+class FullTextSearchTests(MenuTestCase):
+    def search(self, query):
+        response = self.client.get(reverse("menu:search"), {"q": query})
+        return [item.name for _business, items, _more in response.context["grouped_results"] for item in items]
+
+    def test_index_follows_item_category_and_business_changes(self):
+        self.assertTrue(search.fts_available())
+        self.assertEqual(self.search("اسپر"), ["اسپرسو"])
+        self.category.title = "قهوه‌های دمی"
+        self.category.save()
+        self.assertEqual(self.search("دمی"), ["اسپرسو"])
+        self.business.name = "کافه نارنج"
+        self.business.save()
+        self.assertEqual(self.search("نارنج"), ["اسپرسو"])
+        self.item.delete()
+        self.assertEqual(self.search("اسپر"), [])
+
+    def test_items_are_reindexed_only_on_rename(self):
+        with mock.patch.object(search, "reindex_items") as reindex_items:
+            self.category.order = 5
+            self.category.save()
+            self.business.tagline = "قهوه تازه"
+            self.business.save()
+            self.assertFalse(reindex_items.called)
+            self.business.name = "کافه نارنج"
+            self.business.save(update_fields=["name"])
+            reindex_items.assert_called_once_with("business", self.business.pk)
+
+    def test_matches_in_other_columns_are_found(self):
+        MenuItem.objects.create(category=self.category, name="کیک", description="با طعم اسپرسو", price=1000, sort_order=1)
+        self.assertEqual(self.search("اسپرسو"), ["کیک", "اسپرسو"])
+
+    def test_home_view_searches_businesses_through_index(self):
+        Business.objects.create(owner=self.owner, name="قنادی شیرین", city="شیراز", slug="sweets")
+        response = self.client.get(reverse("menu:home"), {"q": "شیراز"})
+        self.assertEqual([business.slug for business in response.context["businesses"]], ["sweets"])
+
+    def test_arabic_letters_digits_and_half_spaces_match(self):
+        MenuItem.objects.create(category=self.category, name="کیک‌شکلاتی ۲ نفره", price=1000)
+        self.assertEqual(self.search("كيك شكلاتي"), ["کیک‌شکلاتی ۲ نفره"])
+        self.assertEqual(self.search("كيك 2"), ["کیک‌شکلاتی ۲ نفره"])
+
+    def test_typos_fall_back_to_trigram_matches(self):
+        MenuItem.objects.create(category=self.category, name="کاپوچینو", price=1000)
+        self.assertEqual(self.search("کاپوچنو"), ["کاپوچینو"])
+        self.assertEqual(self.search("پیتزا"), [])
+
+    def test_falls_back_to_icontains_without_index(self):
+        with mock.patch.object(search, "fts_available", return_value=False):
+            self.assertEqual(self.search("سپرس"), ["اسپرسو"])
+
+
+class SearchPaginationTests(MenuTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            business = Business.objects.create(owner=self.owner, name=f"کافه {index}", slug=f"cafe-{index}")
+            category = MenuCategory.objects.create(business=business, title="قهوه")
+            for position in range(10):
+                MenuItem.objects.create(category=category, name=f"قهوه {index}-{position}", price=1000, sort_order=position)
+
+    def walk(self, params):
+        pages = []
+        url = reverse("menu:search") + "?" + params
+        while url:
+            response = self.client.get(url)
+            pages.append(response.context["grouped_results"])
+            next_url = response.context["next_url"]
+            url = reverse("menu:search") + next_url if next_url else None
+        return pages
+
+    def test_results_are_capped_per_business(self):
+        with mock.patch("menus.views.SearchView.page_size", 6), mock.patch("menus.views.SearchView.per_business", 3):
+            pages = self.walk("q=قهوه")
+        groups = [group for page in pages for group in page]
+        self.assertEqual([business.slug for business, _items, _more in groups], ["cafe-0", "cafe-1", "cafe-2"])
+        self.assertTrue(all(more and len(items) == 3 for _business, items, more in groups))
+        self.assertEqual([item.sort_order for item in groups[0][1]], [0, 1, 2])
+        self.assertEqual(len(pages), 2)
+
+    def test_cursor_walks_a_single_business_without_gaps(self):
+        with mock.patch("menus.views.SearchView.page_size", 4):
+            pages = self.walk("q=قهوه&business=cafe-1")
+        names = [item.name for page in pages for _business, items, _more in page for item in items]
+        self.assertEqual(names, [f"قهوه 1-{position}" for position in range(10)])
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        response = self.client.get(reverse("menu:search"), {"q": "قهوه", "cursor": "not-a-cursor"})
+        self.assertEqual(response.context["grouped_results"][0][0].slug, "cafe-0")
+
+    def test_mistyped_cursor_starts_from_first_page(self):
+        for key in (
+            {"n": "a", "b": {"x": 1}},
+            {"n": 1, "b": 1},
+            {"n": "a", "b": True},
+            {"n": "a", "b": 1, "s": "1", "i": 1},
+        ):
+            with self.subTest(key=key):
+                response = self.client.get(reverse("menu:search"), {"q": "قهوه", "cursor": encode_cursor(key)})
+                self.assertEqual(response.context["grouped_results"][0][0].slug, "cafe-0")
+
+
+class ConditionalGetTests(MenuTestCase):
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def menu_tables_queried(self, context):
+        return [query["sql"] for query in context.captured_queries if "menus_" in query["sql"]]
+
+    def test_unchanged_menu_is_answered_with_304(self):
+        url = reverse("menu:business_detail", kwargs={"slug": "test-cafe"})
+        response = self.client.get(url)
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        with CaptureQueriesContext(connection) as context:
+            revalidated = self.revalidate(url, response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(self.menu_tables_queried(context), [])
+
+    def test_menu_change_produces_new_etag(self):
+        url = reverse("menu:business_detail", kwargs={"slug": "test-cafe"})
+        etag = self.client.get(url)["ETag"]
+        self.item.price = 90000
+        self.item.save()
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_item_page_follows_business_version(self):
+        url = self.item.get_absolute_url()
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        BusinessHour.objects.create(business=self.business, day_of_week="sat")
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_home_page_changes_when_a_business_is_added(self):
+        url = reverse("menu:home")
+        etag = self.client.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.assertEqual(self.menu_tables_queried(context), [])
+        Business.objects.create(owner=self.owner, name="کافه دوم", slug="second-cafe")
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_notes_are_part_of_the_validator(self):
+        url = reverse("menu:business_detail", kwargs={"slug": "test-cafe"})
+        add_url = reverse("menu:add_note", kwargs={"business_slug": "test-cafe", "item_id": self.item.pk})
+        self.client.post(add_url, {"note": "بدون شکر"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        response = self.client.get(url)
+        self.assertFalse(response.has_header("Last-Modified"))
+        etag = response["ETag"]
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.client.post(add_url, {"note": "با شکر"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+
+class MenuApiTests(MenuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.item.discount_percent = 25
+        self.item.tags = "قهوه, گرم"
+        self.item.save()
+        BusinessHour.objects.create(business=self.business, day_of_week="sat", opens_at=time(8), closes_at=time(22))
+        self.url = reverse("menu:api_menu", kwargs={"slug": "test-cafe"})
+        self.version_url = reverse("menu:api_menu_version", kwargs={"slug": "test-cafe"})
+
+    def test_payload_contains_visible_menu(self):
+        hidden = MenuItem.objects.create(category=self.category, name="شب", price=1000, display_start=date(2999, 1, 1))
+        response = self.client.get(self.url)
+        data = response.json()
+        self.assertEqual(data["schema"], 1)
+        self.assertEqual(data["business"]["slug"], "test-cafe")
+        self.assertEqual(data["hours"], [{"day": "sat", "opens": "08:00", "closes": "22:00"}])
+        items = data["categories"][0]["items"]
+        self.assertNotIn(hidden.pk, [item["id"] for item in items])
+        self.assertEqual(items[0]["effective_price"], 60000)
+        self.assertEqual(items[0]["tags"], ["قهوه", "گرم"])
+        self.assertNotIn("calories", items[0])
+
+    def test_strong_etag_is_revalidated_from_cache(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_version_probe_tracks_payload(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            probe = self.client.get(self.version_url)
+        self.assertEqual(f'"{probe.json()["version"]}"', etag)
+        self.item.price = 90000
+        self.item.save()
+        self.assertNotEqual(f'"{self.client.get(self.version_url).json()["version"]}"', etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unknown_business_is_404(self):
+        response = self.client.get(reverse("menu:api_menu_version", kwargs={"slug": "missing"}))
+        self.assertEqual(response.status_code, 404)
+
+
+class PublishTests(MenuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Business.objects.create(owner=self.owner, name="کافه دیگر", slug="other-cafe")
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(MENU_PUBLISH_ROOT=self.root, MENU_PUBLISH_ON_SAVE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def page(self, *parts):
+        return (self.root.joinpath("test-cafe", *parts) / "index.html").read_text(encoding="utf-8")
+
+    def test_command_renders_menu_and_item_pages(self):
+        call_command("publish_menus", "test-cafe", stdout=mock.MagicMock())
+        menu = self.page()
+        self.assertIn("اسپرسو", menu)
+        self.assertIn('data-notes-state-url="/notes/state/"', menu)
+        item = self.page("item", "espresso")
+        self.assertIn("اسپرسو", item)
+        self.assertNotIn('name="csrfmiddlewaretoken"', item)
+        self.assertTrue((self.root / "test-cafe").is_symlink())
+
+    def test_save_republishes_only_affected_business_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.item.name = "لاته"
+            self.item.save()
+            self.category.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertIn("لاته", self.page())
+        self.assertFalse((self.root / self.other.slug).exists())
+        builds = list((self.root / ".builds").iterdir())
+        self.assertEqual(len(builds), 1)
+
+    def test_item_edit_renders_only_its_category_again(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = MenuCategory.objects.create(business=self.business, title="کیک‌ها", slug="cakes")
+            MenuItem.objects.create(category=other, name="چیزکیک", slug="cheesecake", price=1000)
+            MenuItem.objects.create(category=self.category, name="لاته", slug="latte", price=1000)
+        self.assertTrue((self.root / "test-cafe" / "item" / "cheesecake").exists())
+        with mock.patch.object(publish, "render_page", wraps=publish.render_page) as render_page:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.item.price = 90000
+                self.item.save()
+        rendered = [call.args[1] for call in render_page.call_args_list]
+        self.assertEqual(rendered[0], self.business.get_absolute_url())
+        self.assertEqual(sorted(rendered[1:]), sorted([self.item.get_absolute_url(), "/test-cafe/item/latte/"]))
+        self.assertIn("چیزکیک", self.page("item", "cheesecake"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.is_active = False
+            self.item.save()
+        self.assertFalse((self.root / "test-cafe" / "item" / "espresso").exists())
+        self.assertTrue((self.root / "test-cafe" / "item" / "cheesecake").exists())
+        self.assertEqual(len(list((self.root / ".builds").iterdir())), 1)
+
+    def test_removed_items_and_businesses_are_unpublished(self):
+        call_command("publish_menus", "test-cafe", stdout=mock.MagicMock())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.delete()
+        self.assertFalse((self.root / "test-cafe" / "item" / "espresso").exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business.delete()
+        self.assertFalse((self.root / "test-cafe").exists())
+        self.assertEqual(list((self.root / ".builds").iterdir()), [])
+
+    def test_note_state_endpoint_sets_csrf_cookie(self):
+        add_url = reverse("menu:add_note", kwargs={"business_slug": "test-cafe", "item_id": self.item.pk})
+        self.client.post(add_url, {"note": "بدون شکر"})
+        response = self.client.get(reverse("menu:notes_state"))
+        self.assertEqual(response.json(), {"notes": {str(self.item.pk): "بدون شکر"}, "note_count": 1})
+        self.assertIn("csrftoken", response.cookies)
+
+
+class ImageDerivativeTests(MenuTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        images._known.clear()
+
+    def upload(self, size=(2400, 1800), mode="RGB"):
+        buffer = BytesIO()
+        Image.new(mode, size, "orange").save(buffer, "PNG")
+        return SimpleUploadedFile("photo.png", buffer.getvalue(), content_type="image/png")
+
+    def work(self):
+        call_command("process_image_jobs", "--once", stdout=mock.MagicMock())
+
+    def test_upload_builds_every_size_and_format(self):
+        self.item.primary_image = self.upload(mode="RGBA")
+        self.item.save()
+        self.assertFalse(images.has_derivatives(self.item.primary_image))
+        self.work()
+        field = self.item.primary_image
+        self.assertTrue(images.has_derivatives(field))
+        for size, edge in images.SIZES.items():
+            for extension in images.FORMATS:
+                with field.storage.open(images.derivative_name(field.name, size, extension)) as stored:
+                    self.assertEqual(max(Image.open(stored).size), edge)
+
+    def test_missing_derivatives_are_looked_up_once_until_a_worker_stores_them(self):
+        self.item.primary_image = self.upload()
+        self.item.save()
+        field = self.item.primary_image
+        with mock.patch.object(FileSystemStorage, "exists", autospec=True, side_effect=FileSystemStorage.exists) as exists:
+            self.assertFalse(images.has_derivatives(field))
+            self.assertFalse(images.has_derivatives(field))
+            self.assertEqual(exists.call_count, 0)
+            cache.delete(images.missing_key(field.name))
+            self.assertFalse(images.has_derivatives(field))
+            self.assertFalse(images.has_derivatives(field))
+            self.assertEqual(exists.call_count, 1)
+        # The worker stores them; this process has not seen them yet.
+        self.work()
+        images._known.clear()
+        self.assertTrue(images.has_derivatives(field))
+
+    def test_templates_use_srcset_with_fallback_to_original(self):
+        MenuItem.objects.create(category=self.category, name="لاته", slug="latte", price=1000, primary_image="missing.jpg")
+        self.item.primary_image = self.upload()
+        self.item.save()
+        self.work()
+        content = self.client.get(reverse("menu:business_detail", kwargs={"slug": "test-cafe"})).content.decode()
+        self.assertIn('type="image/webp"', content)
+        self.assertIn(images.derivative_url(self.item.primary_image, "card"), content)
+        self.assertIn('src="/media/missing.jpg"', content)
+
+    def test_backfill_command_skips_existing_and_missing_files(self):
+        MenuItem.objects.create(category=self.category, name="لاته", slug="latte", price=1000, primary_image="missing.jpg")
+        self.item.primary_image = self.upload()
+        self.item.save()
+        self.work()
+        images._known.clear()
+        with mock.patch.object(images, "render_derivatives", wraps=images.render_derivatives) as render:
+            call_command("build_image_derivatives", stdout=mock.MagicMock())
+            self.assertEqual(render.call_count, 0)
+            call_command("build_image_derivatives", "--force", stdout=mock.MagicMock())
+            self.assertEqual(render.call_count, 1)
+
+    def test_gallery_upload_is_one_insert_and_queues_jobs(self):
+        MenuItemImage.objects.create(menu_item=self.item, image="old.jpg", order=4)
+        ImageJob.objects.all().delete()
+        self.client.force_login(self.owner)
+        data = {
+            "category": self.category.pk,
+            "name": self.item.name,
+            "price": 1000,
+            "is_active": "on",
+            "is_full_time": "on",
+            "gallery-TOTAL_FORMS": 1,
+            "gallery-INITIAL_FORMS": 1,
+            "gallery-MIN_NUM_FORMS": 0,
+            "gallery-MAX_NUM_FORMS": 1000,
+            "gallery-0-id": self.item.gallery.get().pk,
+            "gallery-0-menu_item": self.item.pk,
+            "gallery-0-order": 4,
+            "gallery_images": [self.upload(), self.upload()],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("dashboard:item_edit", kwargs={"pk": self.item.pk}), data)
+        self.assertEqual(response.status_code, 302)
+        sql = [query["sql"] for query in queries.captured_queries]
+        self.assertFalse([statement for statement in sql if statement.startswith("SELECT COUNT")])
+        inserts = [statement for statement in sql if statement.startswith('INSERT INTO "menus_menuitemimage"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(list(self.item.gallery.values_list("order", flat=True)), [4, 5, 6])
+        status_url = reverse("dashboard:image_status")
+        self.assertEqual(self.client.get(status_url).json()["pending"], 2)
+        self.work()
+        status = self.client.get(status_url).json()
+        self.assertEqual((status["pending"], status["processing"], status["failed"]), (0, 0, 0))
+        for image in self.item.gallery.exclude(image="old.jpg"):
+            self.assertTrue(images.has_derivatives(image.image))
+
+    def test_broken_and_missing_originals_fail_without_stopping_the_queue(self):
+        self.item.primary_image = SimpleUploadedFile("broken.png", b"not an image", content_type="image/png")
+        self.item.save()
+        MenuItem.objects.create(category=self.category, name="لاته", slug="latte", price=1000, primary_image="missing.jpg")
+        MenuItemImage.objects.create(menu_item=self.item, image=self.upload(), order=0)
+        self.work()
+        failed = ImageJob.objects.filter(status=ImageJob.FAILED)
+        self.assertEqual(sorted(failed.values_list("field_name", flat=True)), ["primary_image", "primary_image"])
+        self.assertEqual(ImageJob.objects.count(), 2)
+        self.assertTrue(all(job.error for job in failed))
+        with mock.patch.object(jobs, "render_derivatives", wraps=images.render_derivatives) as render:
+            call_command("process_image_jobs", "--once", "--retry-failed", stdout=mock.MagicMock())
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(ImageJob.objects.filter(status=ImageJob.FAILED).count(), 2)
+
+    def test_stale_claims_are_picked_up_again(self):
+        self.item.primary_image = self.upload()
+        self.item.save()
+        self.assertEqual(len(jobs.claim_jobs(10)), 1)
+        self.assertEqual(jobs.claim_jobs(10), [])
+        ImageJob.objects.update(updated_at=timezone.now() - jobs.STALE_AFTER * 2)
+        (job,) = jobs.claim_jobs(10)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(jobs.process_jobs([job]), (1, 0))
+        self.assertFalse(ImageJob.objects.exists())
+
+
+class ReorderTests(MenuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.owner)
+        self.categories = [self.category] + [
+            MenuCategory.objects.create(business=self.business, title=title, slug=slug, order=index)
+            for index, (title, slug) in enumerate([("کیک‌ها", "cakes"), ("صبحانه", "breakfast")], start=1)
+        ]
+        self.items = [self.item] + [
+            MenuItem.objects.create(category=self.category, name=name, slug=slug, price=1000, sort_order=index)
+            for index, (name, slug) in enumerate([("لاته", "latte"), ("موکا", "mocha"), ("چای", "tea")], start=1)
+        ]
+        MenuItem.objects.filter(pk=self.item.pk).update(sort_order=0)
+
+    def post(self, name, payload):
+        return self.client.post(reverse(f"dashboard:{name}"), json.dumps(payload), content_type="application/json")
+
+    def orders(self, model, field):
+        return list(model.objects.filter(pk__in=self.pks(model)).order_by(field, "pk").values_list("pk", flat=True))
+
+    def pks(self, model):
+        return [row.pk for row in (self.categories if model is MenuCategory else self.items)]
+
+    def test_full_list_is_one_read_and_one_update(self):
+        ids = [self.categories[2].pk, self.categories[0].pk, self.categories[1].pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post("update_category_order", {"categories": ids})
+        sql = [query["sql"] for query in queries.captured_queries]
+        self.assertEqual(len([statement for statement in sql if 'FROM "menus_menucategory"' in statement]), 1)
+        self.assertEqual(len([statement for statement in sql if statement.startswith('UPDATE "menus_menucategory"')]), 1)
+        self.assertEqual(
+            response.json()["changed"], [{"id": ids[0], "order": 0}, {"id": ids[1], "order": 1}, {"id": ids[2], "order": 2}]
+        )
+        self.assertEqual(self.orders(MenuCategory, "order"), ids)
+
+    def test_single_move_only_writes_shifted_rows(self):
+        item_ids = [item.pk for item in self.items]
+        response = self.post(
+            "update_item_order", {"category_id": self.category.pk, "move": {"id": item_ids[3], "position": 1}}
+        )
+        self.assertEqual(
+            response.json()["changed"],
+            [{"id": item_ids[3], "sort_order": 1}, {"id": item_ids[1], "sort_order": 2}, {"id": item_ids[2], "sort_order": 3}],
+        )
+        self.assertEqual(self.orders(MenuItem, "sort_order"), [item_ids[0], item_ids[3], item_ids[1], item_ids[2]])
+        self.assertEqual(self.post("update_item_order", {"category_id": self.category.pk, "items": [item_ids[0]]}).json()["changed"], [])
+
+    def test_items_dragged_into_another_category_move_with_it(self):
+        target = self.categories[1]
+        response = self.post("update_item_order", {"category_id": target.pk, "items": [self.items[2].pk]})
+        self.assertEqual(response.json()["changed"], [{"id": self.items[2].pk, "sort_order": 0, "category_id": target.pk}])
+        self.assertEqual(list(target.items.values_list("pk", flat=True)), [self.items[2].pk])
+        results = self.client.get(reverse("menu:search"), {"q": target.title}).content.decode()
+        self.assertIn("موکا", results)
+
+    def test_foreign_rows_are_rejected_without_writing(self):
+        other = Business.objects.create(owner=get_user_model().objects.create_user(username="other"), name="دیگری", slug="other")
+        foreign = MenuCategory.objects.create(business=other, title="خارجی", slug="foreign")
+        ids = [self.categories[1].pk, foreign.pk]
+        self.assertEqual(self.post("update_category_order", {"categories": ids}).status_code, 400)
+        self.assertEqual(self.post("update_category_order", {"categories": [1, 1]}).status_code, 400)
+        self.assertEqual(self.post("update_item_order", {"category_id": foreign.pk, "items": []}).status_code, 400)
+        self.assertEqual(self.orders(MenuCategory, "order"), self.pks(MenuCategory))
+
+
+class SlugAllocationTests(MenuTestCase):
+    def test_collisions_cost_one_lookup(self):
+        for _ in range(5):
+            MenuItem.objects.create(category=self.category, name="اسپرسو", price=1000)
+        item = MenuItem(category=self.category, name="اسپرسو", price=1000)
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        lookups = [query["sql"] for query in queries.captured_queries if query["sql"].startswith('SELECT "menus_menuitem"."slug"')]
+        self.assertEqual(len(lookups), 1)
+        self.assertNotIn("LIKE", lookups[0])
+        self.assertEqual(item.slug, "اسپرسو-5")
+        self.assertFalse([query for query in queries.captured_queries if query["sql"].startswith('SELECT "businesses_')])
+
+    def test_lookups_move_past_a_full_window_of_suffixes(self):
+        names = ["لاته"] + [f"لاته-{number}" for number in range(1, slugs.CANDIDATES + 3)] + ["لاته-ماکیاتو"]
+        MenuItem.objects.bulk_create(
+            [MenuItem(category=self.category, business=self.business, name=name, slug=name, price=1000) for name in names]
+        )
+        item = MenuItem.objects.create(category=self.category, name="لاته", price=1000)
+        self.assertEqual(item.slug, f"لاته-{slugs.CANDIDATES + 3}")
+        items = [MenuItem(category=self.category, name="لاته", price=1000) for _ in range(2)]
+        assign_slugs(items, MenuItem.objects.filter(category__business=self.business))
+        self.assertEqual([item.slug for item in items], [f"لاته-{slugs.CANDIDATES + 4}", f"لاته-{slugs.CANDIDATES + 5}"])
+
+    def test_item_slugs_are_unique_across_the_business(self):
+        other = MenuCategory.objects.create(business=self.business, title="سرد", slug="cold")
+        first = MenuItem.objects.create(category=self.category, name="لاته", price=1000)
+        second = MenuItem.objects.create(category=other, name="لاته", price=1000)
+        elsewhere = Business.objects.create(owner=self.owner, name="کافه دیگر")
+        third = MenuItem.objects.create(
+            category=MenuCategory.objects.create(business=elsewhere, title="نوشیدنی‌ها"), name="لاته", price=1000
+        )
+        self.assertEqual([first.slug, second.slug, third.slug], ["لاته", "لاته-1", "لاته"])
+
+    def test_batch_mode_assigns_distinct_slugs_in_one_query(self):
+        MenuItem.objects.create(category=self.category, name="لاته", price=1000)
+        items = [MenuItem(category=self.category, name=name, price=1000) for name in ["لاته", "لاته", "موکا", "Espresso"]]
+        with self.assertNumQueries(1):
+            assign_slugs(items, MenuItem.objects.filter(category__business=self.business))
+        self.assertEqual([item.slug for item in items], ["لاته-1", "لاته-2", "موکا", "espresso-1"])
+
+    def test_concurrent_insert_is_retried_with_the_next_suffix(self):
+        MenuCategory.objects.create(business=self.business, title="کیک")
+        real = slugs.taken_slugs
+        calls = []
+
+        def stale_then_real(scope, bases):
+            calls.append(bases)
+            return set() if len(calls) == 1 else real(scope, bases)
+
+        with mock.patch.object(slugs, "taken_slugs", side_effect=stale_then_real):
+            category = MenuCategory.objects.create(business=self.business, title="کیک")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(category.slug, "کیک-1")
+
+    def test_concurrent_item_insert_is_retried_with_the_next_suffix(self):
+        other = MenuCategory.objects.create(business=self.business, title="سرد", slug="cold")
+        MenuItem.objects.create(category=self.category, name="لاته", price=1000)
+        real = slugs.taken_slugs
+        calls = []
+
+        def stale_then_real(scope, bases):
+            calls.append(bases)
+            return set() if len(calls) == 1 else real(scope, bases)
+
+        with mock.patch.object(slugs, "taken_slugs", side_effect=stale_then_real):
+            item = MenuItem.objects.create(category=other, name="لاته", price=1000)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(item.slug, "لاته-1")
+        self.assertEqual(item.business_id, self.business.pk)
+
+    def test_items_follow_their_category_to_another_business(self):
+        elsewhere = Business.objects.create(owner=self.owner, name="کافه دیگر")
+        self.category.business = elsewhere
+        self.category.save()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.business_id, elsewhere.pk)
+        self.assertEqual(Business.objects.create(owner=self.owner, name="!!!").slug, "business")
+
+
+class MenuTransferTests(MenuTestCase):
+    CSV = (
+        "category,name,price,is_full_time,available_days,available_from,available_to,slug\n"
+        "کیک‌ها,چیزکیک,120000,,sat,10:00,18:00,\n"
+        "کیک‌ها,براونی,abc,1,,,,\n"
+        "نوشیدنی‌ها,لاته,90000,0,,,,\n"
+        ",موکا,95000,1,,,,\n"
+        "نوشیدنی‌ها,اسپرسو دوبل,100000,1,,,,espresso\n"
+    )
+
+    def import_file(self, content, name="menu.csv", *args):
+        with tempfile.NamedTemporaryFile("w", suffix=name, encoding="utf-8", delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(Path(handle.name).unlink)
+        out, err = StringIO(), StringIO()
+        call_command("import_menu", "test-cafe", handle.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_rows_are_validated_like_the_item_form(self):
+        out, err = self.import_file(self.CSV)
+        self.assertIn("5 ردیف", out)
+        self.assertIn("ردیف 3: price:", err)
+        self.assertIn("ردیف 4: available_days_list:", err)
+        self.assertIn("ردیف 5: category:", err)
+        self.assertNotIn("ردیف 2", err)
+        cake = MenuItem.objects.get(name="چیزکیک")
+        self.assertEqual((cake.available_days, cake.category.title, cake.slug), ("sat", "کیک‌ها", "چیزکیک"))
+        self.assertFalse(cake.is_visible(timezone.make_aware(datetime(2025, 1, 6, 12, 0))))
+        self.assertEqual(MenuItem.objects.get(name="اسپرسو دوبل").slug, "اسپرسو-دوبل")
+        self.assertEqual(MenuCategory.objects.filter(business=self.business).count(), 2)
+        results = self.client.get(reverse("menu:search"), {"q": "چیزکیک"}).content.decode()
+        self.assertIn("چیزکیک", results)
+
+    def test_dry_run_reports_without_saving(self):
+        out, _err = self.import_file(self.CSV, "menu.csv", "--dry-run")
+        self.assertIn("بررسی شد", out)
+        self.assertFalse(MenuItem.objects.filter(name="چیزکیک").exists())
+
+    def test_export_round_trips_through_import(self):
+        self.import_file(self.CSV)
+        MenuItem.objects.filter(name="چیزکیک").update(display_start=date(2025, 1, 1), calories=300, is_featured=True)
+        for file_format in transfer.FORMATS:
+            with self.subTest(file_format=file_format):
+                target = Business.objects.create(owner=self.owner, name=f"کافه {file_format}")
+                exported = "".join(transfer.export_stream(self.business, file_format))
+                rows = transfer.read_rows(BytesIO(exported.encode("utf-8")), file_format)
+                report = transfer.MenuImporter(target, chunk_size=2).run(rows)
+                self.assertEqual((report.created, report.errors), (3, []))
+                self.assertEqual(
+                    list(transfer.export_rows(target)), list(transfer.export_rows(self.business))
+                )
+
+    def test_json_reader_streams_arrays_and_lines(self):
+        for text in ['[{"name": "الف"}, {"name": "ب"}]', '{"name": "الف"}\n{"name": "ب"}\n']:
+            rows = transfer.read_json(BytesIO(text.encode("utf-8")), buffer_size=5)
+            self.assertEqual([row["name"] for _line, row in rows], ["الف", "ب"])
+        with self.assertRaises(transfer.ImportFormatError):
+            list(transfer.read_json(BytesIO(b'[{"name": '), buffer_size=5))
+
+    def test_dashboard_import_and_streaming_export(self):
+        self.client.force_login(self.owner)
+        upload = SimpleUploadedFile("menu.csv", self.CSV.encode("utf-8"), content_type="text/csv")
+        response = self.client.post(reverse("dashboard:menu_transfer"), {"file": upload})
+        self.assertContains(response, "ردیف 3: price:")
+        self.assertEqual(response.context["report"].created, 2)
+        response = self.client.get(reverse("dashboard:menu_export"), {"format": "csv"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0], ",".join(transfer.COLUMNS))
+        self.assertEqual(len(lines), 4)
+
+
+class MenuViewCounterTests(MenuTestCase):
+    def visit(self, times=1, **headers):
+        for _ in range(times):
+            response = self.client.get(reverse("menu:business_detail", kwargs={"slug": "test-cafe"}), **headers)
+        return response
+
+    def test_views_are_buffered_and_flushed_as_one_upsert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.visit(2)
+            self.visit(headers={"if-none-match": response["ETag"]})
+            self.client.get(reverse("menu:item_detail", kwargs={"business_slug": "test-cafe", "item_slug": "espresso"}))
+        self.assertFalse([query for query in queries.captured_queries if "menus_menuviewhour" in query["sql"]])
+        self.assertEqual(analytics.flush_views(), 4)
+        analytics.record_view("test-cafe", "menu_views")
+        analytics.record_view("gone", "menu_views")
+        analytics.flush_views()
+        hour = MenuViewHour.objects.get()
+        self.assertEqual((hour.business_id, hour.menu_views, hour.item_views), (self.business.pk, 4, 1))
+        self.assertEqual(hour.hour, analytics.current_hour())
+
+    def test_flush_happens_after_the_response_once_due(self):
+        with override_settings(MENU_VIEWS_FLUSH_SIZE=2):
+            self.visit()
+            self.assertFalse(MenuViewHour.objects.exists())
+            self.visit()
+        self.assertEqual(MenuViewHour.objects.get().menu_views, 2)
+
+    def test_published_pages_are_not_counted(self):
+        publish.render_business(self.business)
+        self.assertEqual(analytics.flush_views(), 0)
+
+    def test_rollup_compacts_hours_into_days_and_months(self):
+        now = timezone.localtime()
+        yesterday = now - timedelta(days=1)
+        for moment, counts in [(now, (3, 1)), (yesterday, (2, 0)), (yesterday - timedelta(hours=2), (1, 1))]:
+            analytics.increment(MenuViewHour, "hour", {(self.business.pk, analytics.current_hour(moment)): list(counts)})
+        self.assertEqual(analytics.rollup_views(), 3)
+        self.assertFalse(MenuViewHour.objects.exists())
+        self.assertEqual(analytics.rollup_views(), 0)
+        days = dict(MenuViewDay.objects.values_list("day", "menu_views"))
+        self.assertEqual(days[now.date()], 3)
+        self.assertEqual(sum(days.values()), 6)
+        self.assertEqual(sum(MenuViewMonth.objects.values_list("item_views", flat=True)), 2)
+        with self.assertNumQueries(1):
+            series = analytics.view_series(self.business)
+        self.assertEqual([bar["views"] for bar in series["days"]][-1], 4)
+        self.assertEqual(series["days"][-1]["percent"], 100)
+        self.assertEqual(len(series["days"]), 7)
+        self.assertEqual(sum(bar["views"] for bar in series["months"]), 8)
+        self.assertEqual(series["months"][-1]["period"], now.date().replace(day=1))
+
+
+    def test_views_flushed_during_a_rollup_wait_for_the_next_one(self):
+        hour = analytics.current_hour()
+        analytics.increment(MenuViewHour, "hour", {(self.business.pk, hour): [2, 0]})
+        take_hours = analytics.take_hours
+
+        def take_then_flush():
+            hours = take_hours()
+            analytics.increment(MenuViewHour, "hour", {(self.business.pk, hour): [5, 0]})
+            return hours
+
+        with mock.patch.object(analytics, "take_hours", side_effect=take_then_flush):
+            self.assertEqual(analytics.rollup_views(), 1)
+        self.assertEqual(MenuViewHour.objects.get().menu_views, 5)
+        self.assertEqual(MenuViewDay.objects.get().menu_views, 2)
+        analytics.rollup_views()
+        self.assertEqual(MenuViewDay.objects.get().menu_views, 7)
+    def test_dashboard_shows_the_chart(self):
+        MenuViewDay.objects.create(business=self.business, day=timezone.localdate(), menu_views=5, item_views=2)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("dashboard:home"))
+        self.assertContains(response, "بازدید ۷ روز گذشته")
+        self.assertContains(response, 'title="7 بازدید"')
+
+
+class DashboardCounterTests(MenuTestCase):
+    def counts(self):
+        business = Business.objects.get(pk=self.business.pk)
+        return (
+            business.categories_count,
+            business.items_count,
+            business.active_items_count,
+            business.featured_items_count,
+        )
+
+    def test_counters_follow_creates_updates_and_deletes(self):
+        self.assertEqual(self.counts(), (1, 1, 1, 0))
+        cakes = MenuCategory.objects.create(business=self.business, title="کیک‌ها")
+        cake = MenuItem.objects.create(category=cakes, name="چیزکیک", price=1000, is_featured=True)
+        MenuItem.objects.create(category=cakes, name="براونی", price=1000, is_active=False)
+        self.assertEqual(self.counts(), (2, 3, 2, 1))
+        cake.is_active, cake.is_featured = False, False
+        cake.save()
+        self.assertEqual(self.counts(), (2, 3, 1, 0))
+        self.item.delete()
+        self.assertEqual(self.counts(), (2, 2, 0, 0))
+        with CaptureQueriesContext(connection) as queries:
+            cakes.delete()
+        updates = [
+            query for query in queries.captured_queries if query["sql"].startswith("UPDATE") and "_count" in query["sql"]
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.counts(), (1, 0, 0, 0))
+
+    def test_moving_an_item_between_businesses_moves_its_counts(self):
+        other = Business.objects.create(owner=self.owner, name="کافه دیگر")
+        elsewhere = MenuCategory.objects.create(business=other, title="نوشیدنی‌ها")
+        self.item.category = elsewhere
+        self.item.save()
+        self.assertEqual(self.counts(), (1, 0, 0, 0))
+        other.refresh_from_db()
+        self.assertEqual((other.categories_count, other.items_count, other.active_items_count), (1, 1, 1))
+
+    def test_stale_business_copy_does_not_overwrite_counters(self):
+        stale = Business.objects.get(pk=self.business.pk)
+        MenuItem.objects.create(category=self.category, name="لاته", price=1000)
+        stale.tagline = "تازه"
+        stale.save()
+        self.assertEqual(self.counts(), (1, 2, 2, 0))
+        self.assertEqual(Business.objects.get(pk=self.business.pk).tagline, "تازه")
+
+    def test_recount_repairs_drift_in_one_update(self):
+        Business.objects.filter(pk=self.business.pk).update(items_count=40, categories_count=0)
+        MenuItem.objects.filter(pk=self.item.pk).update(is_featured=True)
+        with self.assertNumQueries(1):
+            counters.recount()
+        self.assertEqual(self.counts(), (1, 1, 1, 1))
+        call_command("recount_menus", "test-cafe", stdout=StringIO())
+
+    def test_dashboard_reads_the_stored_counters(self):
+        self.client.force_login(self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("dashboard:home"))
+        self.assertEqual(response.context["items_count"], 1)
+        self.assertFalse([query for query in queries.captured_queries if "COUNT(" in query["sql"]])
+
+    def test_import_updates_counters(self):
+        rows = [(2, {"category": "کیک‌ها", "name": "چیزکیک", "price": "1000", "is_featured": "1"})]
+        transfer.MenuImporter(self.business).run(rows)
+        self.assertEqual(self.counts(), (2, 2, 2, 1))
+
+
+class GuestNoteTests(MenuTestCase):
+    def add_url(self, item=None):
+        return reverse("menu:add_note", kwargs={"business_slug": "test-cafe", "item_id": (item or self.item).pk})
+
+    def add(self, note, client=None):
+        return (client or self.client).post(self.add_url(), {"note": note}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def test_notes_are_stored_per_item_without_touching_the_session(self):
+        response = self.add("بدون شکر")
+        self.assertEqual(response.json()["note_count"], 1)
+        self.assertIn(notes.COOKIE_NAME, response.cookies)
+        self.assertNotIn("sessionid", response.cookies)
+        with self.assertNumQueries(3):
+            self.add("با شکر")
+        note = GuestNote.objects.get()
+        self.assertEqual((note.item, note.note), (self.item, "با شکر"))
+        self.assertEqual(self.add("").json()["note_count"], 0)
+        self.assertFalse(GuestNote.objects.exists())
+
+    def test_pages_read_only_the_visitors_own_notes(self):
+        self.add("بدون شکر")
+        other = Client()
+        self.add("داغ", client=other)
+        menu = self.client.get(reverse("menu:business_detail", kwargs={"slug": "test-cafe"}))
+        self.assertEqual(menu.context["notes"], {self.item.pk: "بدون شکر"})
+        listing = self.client.get(reverse("menu:notes"))
+        self.assertEqual([entry.note for entry in listing.context["note_items"]], ["بدون شکر"])
+        self.client.post(reverse("menu:notes_clear"))
+        self.assertEqual(list(GuestNote.objects.values_list("note", flat=True)), ["داغ"])
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies[notes.COOKIE_NAME] = "forged-token"
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("menu:notes_state"))
+        self.assertEqual(response.json(), {"notes": {}, "note_count": 0})
+
+    def test_deleting_an_item_deletes_its_notes(self):
+        self.add("بدون شکر")
+        self.item.delete()
+        self.assertFalse(GuestNote.objects.exists())
+
+    def batch(self, operations):
+        return self.client.post(
+            reverse("menu:notes_batch"),
+            json.dumps({"operations": operations}),
+            content_type="application/json",
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+    def test_batch_applies_operations_with_one_lookup_and_one_write(self):
+        latte = MenuItem.objects.create(category=self.category, name="لاته", price=1000)
+        mocha = MenuItem.objects.create(category=self.category, name="موکا", price=1000)
+        self.add("بدون شکر")
+        operations = [
+            {"op": "add", "item": latte.pk, "note": "داغ"},
+            {"op": "add", "item": mocha.pk, "note": "سرد"},
+            {"op": "update", "item": mocha.pk, "note": "  با یخ  "},
+            {"op": "remove", "item": self.item.pk},
+            {"op": "add", "item": 999999, "note": "?"},
+            {"op": "rename", "item": latte.pk},
+        ]
+        # Lookup, upsert, delete and count, plus the transaction's savepoint.
+        with self.assertNumQueries(6):
+            response = self.batch(operations)
+        data = response.json()
+        self.assertFalse(data["success"])
+        self.assertEqual(data["note_count"], 2)
+        self.assertEqual([result["ok"] for result in data["results"]], [True, True, True, True, False, False])
+        self.assertEqual(data["results"][2]["note"], "با یخ")
+        self.assertEqual(dict(GuestNote.objects.values_list("item_id", "note")), {latte.pk: "داغ", mocha.pk: "با یخ"})
+
+    def test_batch_issues_a_guest_cookie_and_rejects_malformed_payloads(self):
+        response = self.batch([{"op": "add", "item": self.item.pk, "note": "بدون شکر"}])
+        self.assertTrue(response.json()["success"])
+        self.assertIn(notes.COOKIE_NAME, response.cookies)
+        self.assertEqual(self.client.get(reverse("menu:notes_state")).json()["note_count"], 1)
+        invalid = self.client.post(reverse("menu:notes_batch"), {"operations": "x"})
+        self.assertEqual(invalid.status_code, 400)
+        too_many = self.batch([{"op": "remove", "item": self.item.pk}] * (notes.MAX_OPERATIONS + 1))
+        self.assertEqual(too_many.status_code, 400)
+
+
+class FragmentCacheTests(MenuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cakes = MenuCategory.objects.create(business=self.business, title="کیک‌ها", slug="cakes", order=2)
+        self.cake = MenuItem.objects.create(category=self.cakes, name="چیزکیک", slug="cheesecake", price=1000)
+
+    def page(self, client=None):
+        return (client or self.client).get(reverse("menu:business_detail", kwargs={"slug": "test-cafe"})).content.decode()
+
+    def block_key(self, category):
+        category.refresh_from_db()
+        listed = fragments.listed(category.items.order_by("sort_order", "id"))
+        return make_template_fragment_key("menu_block", [category.pk, category.content_updated_at, listed, "test-cafe"])
+
+    def test_blocks_are_reused_until_an_item_changes(self):
+        self.page()
+        cache.set(self.block_key(self.category), "<p>stale-drinks</p>")
+        cache.set(self.block_key(self.cakes), "<p>stale-cakes</p>")
+        page = self.page()
+        self.assertIn("stale-drinks", page)
+        self.assertIn("stale-cakes", page)
+
+        self.item.name = "دبل اسپرسو"
+        self.item.save()
+        page = self.page()
+        self.assertNotIn("stale-drinks", page)
+        self.assertIn("دبل اسپرسو", page)
+        self.assertIn("stale-cakes", page)
+
+    def test_large_menu_stays_under_the_cull_threshold(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        for index in range(30):
+            MenuItem.objects.create(category=self.cakes, name=f"کیک {index}", price=1000)
+        backend = {
+            "BACKEND": "menus.instrumentation.InstrumentedFileBasedCache",
+            "LOCATION": location,
+            "OPTIONS": {"MAX_ENTRIES": 10},
+        }
+        with override_settings(CACHES={"default": backend}):
+            self.page()
+            self.assertLess(len(list(Path(location).glob("*.djcache"))), 10)
+            with self.assertNumQueries(0):
+                self.assertIn("کیک 29", self.page())
+
+    def test_moving_an_item_bumps_both_categories(self):
+        before = {category.pk: self.block_key(category) for category in (self.category, self.cakes)}
+        self.cake.category = self.category
+        self.cake.save()
+        self.assertNotEqual(self.block_key(self.category), before[self.category.pk])
+        self.assertNotEqual(self.block_key(self.cakes), before[self.cakes.pk])
+
+    def test_gallery_changes_bump_the_category_but_not_the_item(self):
+        block, other = self.block_key(self.category), self.block_key(self.cakes)
+        image = MenuItemImage.objects.create(menu_item=self.item, image="gallery/a.jpg")
+        self.assertNotEqual(self.block_key(self.category), block)
+        self.assertEqual(self.block_key(self.cakes), other)
+        block = self.block_key(self.category)
+        updated_at = MenuItem.objects.get(pk=self.item.pk).updated_at
+        with self.assertNumQueries(1):
+            fragments.touch(images=[image.pk])
+        self.assertNotEqual(self.block_key(self.category), block)
+        self.assertEqual(MenuItem.objects.get(pk=self.item.pk).updated_at, updated_at)
+
+    def test_notes_are_injected_outside_the_cached_fragments(self):
+        self.client.post(
+            reverse("menu:add_note", kwargs={"business_slug": "test-cafe", "item_id": self.item.pk}),
+            {"note": "بدون شکر"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        mine, theirs = self.page(), self.page(Client())
+        state = re.search(r'<script id="guest-notes" type="application/json">(.*?)</script>', mine).group(1)
+        self.assertEqual(json.loads(state), {str(self.item.pk): "بدون شکر"})
+        self.assertNotIn('data-has-note="true"', mine)
+        menu = re.compile(r'<div id="category-.*?<!-- Floating Notes Button -->', re.S)
+        self.assertEqual(menu.search(mine).group(0), menu.search(theirs).group(0))
+
+
+class AsyncViewTests(MenuTestCase):
+    # self.async_client goes through the ASGI handler, where the public pages
+    # and note endpoints resolve to menus/async_views.py.
+    CSRF = re.compile(r'(csrfmiddlewaretoken" value=|csrf-token" content=)"[^"]+"')
+
+    def setUp(self):
+        super().setUp()
+        MenuItem.objects.create(category=self.category, name="لاته", slug="latte", price=90000, is_featured=True)
+        search.rebuild_index()
+
+    def note_url(self, name):
+        return reverse(f"menu:{name}", kwargs={"business_slug": "test-cafe", "item_id": self.item.pk})
+
+    async def test_pages_match_the_sync_views(self):
+        urls = [
+            reverse("menu:home"),
+            reverse("menu:home") + "?q=کافه",
+            reverse("menu:search") + "?q=اسپرسو",
+            reverse("menu:business_detail", kwargs={"slug": "test-cafe"}),
+            reverse("menu:business_detail", kwargs={"slug": "test-cafe"}) + "?q=لاته",
+            reverse("menu:item_detail", kwargs={"business_slug": "test-cafe", "item_slug": "espresso"}),
+            reverse("menu:notes"),
+            reverse("menu:notes_state"),
+            reverse("menu:business_detail", kwargs={"slug": "missing"}),
+            reverse("menu:item_detail", kwargs={"business_slug": "test-cafe", "item_slug": "missing"}),
+        ]
+        queries = re.compile(r'desc="(\d+) queries"')
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                expected = await sync_to_async(self.client.get)(url)
+                cache.clear()
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(self.CSRF.sub("", response.content.decode()), self.CSRF.sub("", expected.content.decode()))
+                self.assertEqual(
+                    queries.search(response["Server-Timing"]).group(1), queries.search(expected["Server-Timing"]).group(1)
+                )
+                if response.status_code == 200:
+                    self.assertEqual(response.resolver_match.func.view_class.__module__, async_views.__name__)
+
+    async def test_mistyped_home_cursor_starts_from_first_page(self):
+        for cursor in ({"s": [1]}, {"n": [1], "b": 1}, {"n": "کافه", "b": {"x": 1}}):
+            with self.subTest(cursor=cursor):
+                response = await self.async_client.get(reverse("menu:home"), {"cursor": encode_cursor(cursor)})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([business.slug for business in response.context["businesses"]], ["test-cafe"])
+
+    async def test_conditional_get_and_view_counting(self):
+        url = reverse("menu:business_detail", kwargs={"slug": "test-cafe"})
+        first = await self.async_client.get(url)
+        self.assertIn("db;dur=", first["Server-Timing"])
+        again = await self.async_client.get(url, headers={"if-none-match": first["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+        counts = analytics._take_buffer()
+        self.assertEqual([views[0] for views in counts.values()], [2])
+
+        await self.async_client.post(self.note_url("add_note"), {"note": "داغ"})
+        changed = await self.async_client.get(url, headers={"if-none-match": first["ETag"]})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.context["notes"], {self.item.pk: "داغ"})
+
+    async def test_note_endpoints(self):
+        ajax = {"x-requested-with": "XMLHttpRequest"}
+        added = await self.async_client.post(self.note_url("add_note"), {"note": " بدون شکر "}, headers=ajax)
+        self.assertEqual(added.json()["note_count"], 1)
+        self.assertIn(notes.COOKIE_NAME, added.cookies)
+        state = await self.async_client.get(reverse("menu:notes_state"))
+        self.assertEqual(state.json(), {"notes": {str(self.item.pk): "بدون شکر"}, "note_count": 1})
+
+        batch = await self.async_client.post(
+            reverse("menu:notes_batch"),
+            {"operations": [{"op": "update", "item": self.item.pk, "note": "داغ"}, {"op": "add", "item": 0}]},
+            content_type="application/json",
+        )
+        self.assertEqual([result["ok"] for result in batch.json()["results"]], [True, False])
+        self.assertEqual([note async for note in GuestNote.objects.values_list("note", flat=True)], ["داغ"])
+
+        removed = await self.async_client.post(self.note_url("remove_note"), headers=ajax)
+        self.assertEqual(removed.json()["note_count"], 0)
+        await self.async_client.post(self.note_url("add_note"), {"note": "سرد"})
+        cleared = await self.async_client.post(reverse("menu:notes_clear"))
+        self.assertRedirects(cleared, reverse("menu:notes"), fetch_redirect_response=False)
+        self.assertFalse(await GuestNote.objects.aexists())
+        missing = reverse("menu:add_note", kwargs={"business_slug": "other", "item_id": self.item.pk})
+        self.assertEqual((await self.async_client.post(missing, {"note": "x"})).status_code, 404)
+
+    def test_wsgi_keeps_the_sync_views(self):
+        response = self.client.get(reverse("menu:business_detail", kwargs={"slug": "test-cafe"}))
+        self.assertIs(response.resolver_match.func.view_class, views.BusinessDetailView)
+        request = loadtest.asgi_client(get_asgi_application())
+        self.assertEqual(request(reverse("menu:notes_state"), None), 200)
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are checked on SQLite")
+class QueryPlanTests(MenuTestCase):
+    def explain(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[3] for row in cursor.fetchall()]
+
+    def explain_queryset(self, queryset):
+        return self.explain(*queryset.query.sql_with_params())
+
+    def table_scans(self, *urls):
+        # A bare "SCAN <table>" reads every row; index scans and searches are fine.
+        with CaptureQueriesContext(connection) as context:
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        scans = set()
+        for query in context.captured_queries:
+            if query["sql"].startswith("SELECT"):
+                scans.update(step for step in self.explain(query["sql"]) if re.fullmatch(r"SCAN \S+", step))
+        return scans
+
+    def test_menu_and_dashboard_pages_do_not_scan_tables(self):
+        self.client.post(
+            reverse("menu:add_note", kwargs={"business_slug": "test-cafe", "item_id": self.item.pk}), {"note": "داغ"}
+        )
+        public = self.table_scans(
+            reverse("menu:business_detail", kwargs={"slug": "test-cafe"}),
+            reverse("menu:business_detail", kwargs={"slug": "test-cafe"}) + "?q=اسپرسو",
+            self.item.get_absolute_url(),
+            reverse("menu:notes"),
+            reverse("menu:api_menu", kwargs={"slug": "test-cafe"}),
+        )
+        self.assertEqual(public, set())
+        self.client.force_login(self.owner)
+        dashboard = self.table_scans(
+            reverse("dashboard:home"),
+            reverse("dashboard:item_list"),
+            reverse("dashboard:category_list"),
+            reverse("dashboard:menu_order"),
+        )
+        self.assertEqual(dashboard, set())
+
+    def test_home_page_scans_only_the_business_list(self):
+        self.assertEqual(self.table_scans(reverse("menu:home")), {"SCAN businesses_business"})
+
+    def test_hot_queries_use_the_read_path_indexes(self):
+        featured = MenuItem.objects.filter(is_active=True, is_featured=True).order_by("-updated_at")[:6]
+        related = MenuItem.objects.filter(category=self.category, is_active=True).order_by("sort_order", "name")[:4]
+        categories = MenuCategory.objects.filter(business=self.business, is_active=True)
+        for queryset, index in (
+            (featured, "menuitem_featured_idx"),
+            (related, "menuitem_menu_idx"),
+            (categories, "menucategory_menu_idx"),
+        ):
+            plan = self.explain_queryset(queryset)
+            self.assertIn(index, plan[0])
+            self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_visible_items_use_the_schedule_index(self):
+        plan = self.explain_queryset(MenuItem.objects.visible())
+        self.assertIn("menuitem_schedule_idx", plan[0])
+
+
+class HomePageTests(MenuTestCase):
+    def home(self, **params):
+        return self.client.get(reverse("menu:home"), params)
+
+    def test_businesses_are_listed_in_keyset_pages(self):
+        for index in range(14):
+            Business.objects.create(owner=self.owner, name=f"کافه {index:02d}", slug=f"cafe-{index}")
+        first = self.home()
+        next_url = first.context["next_url"]
+        self.assertEqual(len(first.context["businesses"]), 12)
+        second = self.client.get(reverse("menu:home") + next_url)
+        self.assertIsNone(second.context["next_url"])
+        names = [business.name for response in (first, second) for business in response.context["businesses"]]
+        self.assertEqual(names, sorted(Business.objects.values_list("name", flat=True)))
+        self.assertIn('id="business-more"', first.content.decode())
+
+    def test_mistyped_cursor_starts_from_first_page(self):
+        Business.objects.create(owner=self.owner, name="کافه دوم", slug="second-cafe")
+        first = [business.slug for business in self.home().context["businesses"]]
+        for params in (
+            {"cursor": encode_cursor({"s": [1]})},
+            {"cursor": encode_cursor({"n": [1], "b": 1})},
+            {"cursor": encode_cursor({"n": "کافه", "b": "1"})},
+            {"q": "کافه", "cursor": encode_cursor({"r": "1"})},
+        ):
+            with self.subTest(params=params):
+                response = self.home(**params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([business.slug for business in response.context["businesses"]], first)
+
+    def test_first_page_and_featured_feed_come_from_the_cache(self):
+        self.home()
+        with CaptureQueriesContext(connection) as context:
+            response = self.home()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn("MAX(", context.captured_queries[0]["sql"])
+        Business.objects.create(owner=self.owner, name="کافه دوم", slug="second-cafe")
+        self.assertEqual(len(self.home().context["businesses"]), 2)
+
+    def test_featured_feed_is_rebuilt_when_featured_items_change(self):
+        self.assertEqual(featured.get_featured_feed(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.is_featured = True
+            self.item.save()
+        self.assertEqual(cache.get(featured.FEED_KEY), [self.item])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.title = "قهوه"
+            self.category.save()
+        self.assertEqual(cache.get(featured.FEED_KEY)[0].category.title, "قهوه")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            MenuItem.objects.create(category=self.category, name="چای", price=1000)
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.is_active = False
+            self.item.save()
+        self.assertEqual(cache.get(featured.FEED_KEY), [])
+
+    def test_imported_featured_items_refresh_the_feed(self):
+        featured.get_featured_feed()
+        rows = [(2, {"category": "کیک‌ها", "name": "چیزکیک", "price": "1000", "is_featured": "1"})]
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer.MenuImporter(self.business).run(rows)
+        self.assertEqual([item.name for item in cache.get(featured.FEED_KEY)], ["چیزکیک"])
+
+
+class RequestMetricsTests(MenuTestCase):
+    def timings(self, response):
+        timings = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            timings[name] = dict(param.split("=", 1) for param in params)
+        return timings
+
+    def test_server_timing_reports_queries_templates_and_cache(self):
+        url = reverse("menu:business_detail", kwargs={"slug": "test-cafe"})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        timings = self.timings(response)
+        self.assertEqual(timings["db"]["desc"], f'"{len(context.captured_queries)} queries"')
+        self.assertGreater(float(timings["tpl"]["dur"]), 0)
+        self.assertIn("misses", timings["cache"]["desc"])
+        self.client.get(reverse("menu:home"))
+        cached = self.timings(self.client.get(reverse("menu:home")))
+        self.assertRegex(cached["cache"]["desc"], r'"[1-9]\d* hits 0 misses"')
+
+    def test_cache_counts_only_outside_lookups(self):
+        metrics = instrumentation.RequestMetrics()
+        token = instrumentation._current.set(metrics)
+        self.addCleanup(instrumentation._current.reset, token)
+        cache.set("counter", 1)
+        cache.incr("counter")
+        cache.decr("counter")
+        async_to_sync(cache.aincr)("counter")
+        cache.get_or_set("value", 1)
+        cache.get_or_set("value", 2)
+        async_to_sync(cache.aget_or_set)("other", 3)
+        self.assertEqual(cache.get("counter"), 2)
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 2))
+
+    def test_requests_are_logged_under_their_url_name(self):
+        with self.assertLogs("menus.requests", "INFO") as logs:
+            self.client.get(reverse("menu:business_detail", kwargs={"slug": "test-cafe"}))
+        record = logs.records[0].metrics
+        self.assertEqual(record["url_name"], "menu:business_detail")
+        self.assertEqual(record["status"], 200)
+        self.assertIn("url_name=menu:business_detail ", logs.output[0])
+
+    def test_repeated_query_shapes_are_flagged(self):
+        def view(request):
+            for pk in range(1, 6):
+                list(MenuItem.objects.filter(pk__in=range(pk)))
+            return HttpResponse("ok")
+
+        request = RequestFactory().get("/")
+        request.resolver_match = None
+        with self.assertLogs("menus.requests", "INFO") as logs:
+            instrumentation.RequestMetricsMiddleware(view)(request)
+        warnings = [record for record in logs.records if record.levelname == "WARNING"]
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual(warnings[0].metrics["count"], 5)
+        self.assertIn("IN (...)", warnings[0].metrics["query"])
+
+
+class SyntheticDataTests(MenuTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def seed(self, businesses=3):
+        call_command(
+            "seed_menus",
+            *("--businesses", businesses, "--categories", 2, "--items", 4, "--gallery", 2, "--batch", 2),
+            stdout=StringIO(),
+        )
+
+    def test_generator_builds_complete_menus(self):
+        self.seed()
+        self.seed(businesses=1)
+        businesses = Business.objects.filter(slug__startswith="synthetic-").order_by("pk")
+        self.assertEqual([business.slug for business in businesses], [f"synthetic-{n}" for n in range(4)])
+        self.assertEqual(MenuItem.objects.filter(category__business__in=businesses).count(), 32)
+        self.assertEqual(MenuItemImage.objects.filter(menu_item__category__business__in=businesses).count(), 64)
+        self.assertEqual(BusinessHour.objects.filter(business__in=businesses).count(), 28)
+        business = businesses.first()
+        self.assertEqual((business.categories_count, business.items_count), (2, 8))
+        item = MenuItem.objects.filter(category__business=business).first()
+        self.assertIn(item, MenuItem.objects.filter(search.item_search_filter(item.name)))
+        self.assertEqual(self.client.get(item.get_absolute_url()).status_code, 200)
+
+    def test_load_harness_requests_every_url_in_the_mix(self):
+        self.seed()
+        # The WSGI handler would close the test's connection after each request.
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        targets = loadtest.Targets(random.Random(1))
+        request = loadtest.wsgi_client(get_wsgi_application())
+        for name in loadtest.MIX:
+            with self.subTest(url_name=name):
+                self.assertEqual(request(*targets.url(name)), 200)
+
+    def test_mix_option(self):
+        self.assertEqual(loadtest.parse_mix("menu:home=5, menu:search=1"), {"menu:home": 5, "menu:search": 1})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix("menu:missing=1")
+
+
+class QueryBudgetTests(MenuTestCase):
+    # Queries per request for every URL name, with a cold cache, on a small and
+    # a large menu. The same budget has to hold for both, so a view whose cost
+    # grows with the menu (an N+1) fails here.
+    SIZES = {"small": (2, 4, 1), "large": (6, 10, 3)}  # categories, items each, gallery images
+    GET_BUDGETS = {
+        "menu:home": 6,
+        "menu:search": 5,
+        "menu:api_menu": 5,
+        "menu:api_menu_version": 5,
+        "menu:notes": 3,
+        "menu:notes_state": 1,
+        "menu:item_detail": 11,
+        "menu:business_detail": 8,
+        "dashboard:home": 4,
+        "dashboard:business_edit": 4,
+        "dashboard:menu_order": 5,
+        "dashboard:category_list": 4,
+        "dashboard:category_create": 3,
+        "dashboard:category_edit": 4,
+        "dashboard:item_list": 5,
+        "dashboard:item_create": 5,
+        "dashboard:item_edit": 6,
+        "dashboard:menu_transfer": 3,
+        "dashboard:menu_export": 4,
+        "dashboard:image_status": 5,
+    }
+    POST_BUDGETS = {
+        "menu:add_note": 2,
+        "menu:remove_note": 2,
+        "menu:notes_batch": 6,
+        "menu:notes_clear": 1,
+        "dashboard:update_category_order": 8,
+        "dashboard:update_item_order": 9,
+        "dashboard:category_create": 9,
+        "dashboard:category_edit": 13,
+        "dashboard:item_delete": 14,
+        "dashboard:category_delete": 16,
+    }
+    # (small, large) with MENU_PUBLISH_ON_SAVE, at about five queries per
+    # rendered page: menu-wide changes render every item page again, item
+    # changes only those of the item's category. Hence off by default.
+    PUBLISH_POST_BUDGETS = {
+        "menu:add_note": (2, 2),
+        "menu:remove_note": (2, 2),
+        "menu:notes_batch": (6, 6),
+        "menu:notes_clear": (1, 1),
+        "dashboard:update_category_order": (58, 318),
+        "dashboard:update_item_order": (59, 319),
+        "dashboard:category_create": (59, 319),
+        "dashboard:category_edit": (63, 323),
+        "dashboard:item_delete": (37, 67),
+        "dashboard:category_delete": (46, 276),
+    }
+
+    def seed(self, categories, items, images):
+        other = get_user_model().objects.create_user(username="other", password="pass1234")
+        Business.objects.bulk_create(
+            [Business(owner=other, name=f"کافه {n}", slug=f"cafe-{n}") for n in range(categories * 3)]
+        )
+        for c in range(categories):
+            category = MenuCategory.objects.create(business=self.business, title=f"دسته {c}", order=c + 1)
+            for i in range(items):
+                item = MenuItem.objects.create(category=category, name=f"آیتم {c}-{i}", price=1000, is_featured=i == 0)
+                MenuItemImage.objects.bulk_create(
+                    [MenuItemImage(menu_item=item, image=f"gallery/{c}-{i}-{n}.jpg", order=n) for n in range(images)]
+                )
+        self.seeded = MenuCategory.objects.filter(business=self.business).exclude(pk=self.category.pk).first()
+        self.seeded_items = list(self.seeded.items.values_list("pk", flat=True))
+        token = notes.ensure_guest_token(RequestFactory().get("/"))
+        GuestNote.objects.bulk_create(
+            [GuestNote(guest=token, item_id=pk, note="بدون شکر") for pk in MenuItem.objects.values_list("pk", flat=True)]
+        )
+        self.client.cookies[notes.COOKIE_NAME] = signing.get_cookie_signer(
+            salt=notes.COOKIE_NAME + notes.COOKIE_SALT
+        ).sign(token)
+        self.client.force_login(self.owner)
+
+    def get_urls(self):
+        item, category = self.item, self.category
+        return {
+            "menu:home": reverse("menu:home"),
+            "menu:search": reverse("menu:search") + "?q=آیتم",
+            "menu:api_menu": reverse("menu:api_menu", kwargs={"slug": "test-cafe"}),
+            "menu:api_menu_version": reverse("menu:api_menu_version", kwargs={"slug": "test-cafe"}),
+            "menu:notes": reverse("menu:notes"),
+            "menu:notes_state": reverse("menu:notes_state"),
+            "menu:item_detail": item.get_absolute_url(),
+            "menu:business_detail": reverse("menu:business_detail", kwargs={"slug": "test-cafe"}),
+            "dashboard:home": reverse("dashboard:home"),
+            "dashboard:business_edit": reverse("dashboard:business_edit"),
+            "dashboard:menu_order": reverse("dashboard:menu_order"),
+            "dashboard:category_list": reverse("dashboard:category_list"),
+            "dashboard:category_create": reverse("dashboard:category_create"),
+            "dashboard:category_edit": reverse("dashboard:category_edit", kwargs={"pk": category.pk}),
+            "dashboard:item_list": reverse("dashboard:item_list"),
+            "dashboard:item_create": reverse("dashboard:item_create"),
+            "dashboard:item_edit": reverse("dashboard:item_edit", kwargs={"pk": item.pk}),
+            "dashboard:menu_transfer": reverse("dashboard:menu_transfer"),
+            "dashboard:menu_export": reverse("dashboard:menu_export"),
+            "dashboard:image_status": reverse("dashboard:image_status"),
+        }
+
+    def post_requests(self):
+        # (url, data); str data is sent as JSON. Deletes come last.
+        note_kwargs = {"business_slug": "test-cafe", "item_id": self.item.pk}
+        categories = list(MenuCategory.objects.filter(business=self.business).values_list("pk", flat=True))
+        operations = [{"op": "add", "item": pk, "note": "داغ"} for pk in self.seeded_items[1:]]
+        operations.append({"op": "remove", "item": self.seeded_items[0]})
+        return {
+            "menu:add_note": (reverse("menu:add_note", kwargs=note_kwargs), {"note": "بدون شکر"}),
+            "menu:remove_note": (reverse("menu:remove_note", kwargs=note_kwargs), {}),
+            "menu:notes_batch": (reverse("menu:notes_batch"), json.dumps({"operations": operations})),
+            "dashboard:update_category_order": (
+                reverse("dashboard:update_category_order"),
+                json.dumps({"categories": categories[::-1]}),
+            ),
+            "dashboard:update_item_order": (
+                reverse("dashboard:update_item_order"),
+                json.dumps({"items": self.seeded_items[::-1], "category_id": self.seeded.pk}),
+            ),
+            "dashboard:category_create": (
+                reverse("dashboard:category_create"),
+                {"title": "دسرها", "description": "", "is_active": "on"},
+            ),
+            "dashboard:category_edit": (
+                reverse("dashboard:category_edit", kwargs={"pk": self.category.pk}),
+                {"title": "نوشیدنی گرم", "description": "", "is_active": "on"},
+            ),
+            "menu:notes_clear": (reverse("menu:notes_clear"), {}),
+            "dashboard:item_delete": (reverse("dashboard:item_delete", kwargs={"pk": self.seeded_items[0]}), {}),
+            "dashboard:category_delete": (reverse("dashboard:category_delete", kwargs={"pk": self.seeded.pk}), {}),
+        }
+
+    def assert_budgets(self, size):
+        self.seed(*self.SIZES[size])
+        for name, url in self.get_urls().items():
+            cache.clear()
+            with self.subTest(size=size, method="GET", url_name=name), self.assertNumQueries(self.GET_BUDGETS[name]):
+                response = self.client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+        self.assert_post_budgets(size, self.POST_BUDGETS)
+
+    def assert_post_budgets(self, size, budgets):
+        for name, (url, data) in self.post_requests().items():
+            # on_commit work (feed refresh, publishing) is part of the cost.
+            with (
+                self.subTest(size=size, method="POST", url_name=name),
+                self.assertNumQueries(budgets[name]),
+                self.captureOnCommitCallbacks(execute=True),
+            ):
+                if isinstance(data, str):
+                    response = self.client.post(url, data, content_type="application/json")
+                else:
+                    response = self.client.post(url, data)
+                self.assertLess(response.status_code, 400)
+
+    def test_small_menu(self):
+        self.assert_budgets("small")
+
+    def test_large_menu(self):
+        self.assert_budgets("large")
+
+    def assert_publishing_budgets(self, size):
+        self.seed(*self.SIZES[size])
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        column = list(self.SIZES).index(size)
+        budgets = {name: budgets[column] for name, budgets in self.PUBLISH_POST_BUDGETS.items()}
+        with override_settings(MENU_PUBLISH_ROOT=root, MENU_PUBLISH_ON_SAVE=True):
+            call_command("publish_menus", "test-cafe", stdout=StringIO())
+            self.assert_post_budgets(size, budgets)
+
+    def test_small_menu_publishing_on_save(self):
+        self.assert_publishing_budgets("small")
+
+    def test_large_menu_publishing_on_save(self):
+        self.assert_publishing_budgets("large")
+
+    def test_every_url_has_a_budget(self):
+        from businesses.urls import urlpatterns as dashboard_urls
+        from .urls import urlpatterns as menu_urls
+
+        names = {f"menu:{pattern.name}" for pattern in menu_urls}
+        names |= {f"dashboard:{pattern.name}" for pattern in dashboard_urls}
+        self.assertEqual(names - self.GET_BUDGETS.keys() - self.POST_BUDGETS.keys(), set())
+
+
+BENCHMARKS = os.environ.get("MENU_BENCHMARKS", "")
+BENCHMARK_FILE = Path(__file__).with_name("benchmarks.json")
+
+
+@skipUnless(BENCHMARKS, "set MENU_BENCHMARKS=1 to run, or MENU_BENCHMARKS=record to store new baselines")
+class BenchmarkTests(MenuTestCase):
+    # Best-of-seven timings of the hot paths against menus/benchmarks.json.
+    # Baselines are per machine; record them again on new hardware.
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stored = json.loads(BENCHMARK_FILE.read_text()) if BENCHMARK_FILE.exists() else {}
+        cls.results = {}
+        cls.calibrations = []
+
+    @classmethod
+    def tearDownClass(cls):
+        if BENCHMARKS == "record" and cls.results:
+            stored = {
+                "tolerance_percent": cls.stored.get("tolerance_percent", 50),
+                "calibration_ms": round(min(cls.calibrations), 4),
+                "baselines_ms": {},
+            }
+            stored["baselines_ms"].update(cls.stored.get("baselines_ms", {}), **cls.results)
+            BENCHMARK_FILE.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        for c in range(10):
+            category = MenuCategory.objects.create(business=self.business, title=f"دسته {c}", order=c + 1)
+            MenuItem.objects.bulk_create(
+                [
+                    MenuItem(
+                        category=category,
+                        business=self.business,
+                        name=f"آیتم {c}-{i}",
+                        slug=f"item-{c}-{i}",
+                        price=1000 + i,
+                        is_full_time=i % 3 != 0,
+                        available_days="sat,sun,mon",
+                        available_from=time(8),
+                        available_to=time(22),
+                    )
+                    for i in range(30)
+                ]
+            )
+        search.rebuild_index()
+
+    @staticmethod
+    def time(function, number):
+        return min(timeit.repeat(function, number=number, repeat=7)) / number * 1000
+
+    def benchmark(self, name, function, number):
+        calibration = self.time(lambda: sorted(str(n) for n in range(2000)), 50)
+        self.calibrations.append(calibration)
+        elapsed = self.time(function, number)
+        self.results[name] = round(elapsed, 4)
+        baseline = self.stored.get("baselines_ms", {}).get(name)
+        if BENCHMARKS == "record" or baseline is None:
+            return
+        # A fixed pure-Python loop timed in the same run scales the baseline to
+        # how fast this machine is right now.
+        baseline *= calibration / self.stored.get("calibration_ms", calibration)
+        limit = baseline * (1 + self.stored.get("tolerance_percent", 50) / 100)
+        self.assertLessEqual(elapsed, limit, f"{name}: {elapsed:.4f}ms, baseline {baseline:.4f}ms")
+
+    def test_is_visible(self):
+        items = list(MenuItem.objects.all())
+        moment = timezone.make_aware(datetime(2025, 1, 4, 12))
+        self.benchmark("is_visible", lambda: [item.is_visible(moment) for item in items], 200)
+
+    def test_menu_assembly(self):
+        self.benchmark("menu_assembly", lambda: build_menu_snapshot("test-cafe"), 5)
+
+    def test_menu_page(self):
+        url = reverse("menu:business_detail", kwargs={"slug": "test-cafe"})
+        self.client.get(url)
+        self.benchmark("menu_page", lambda: self.client.get(url), 20)
+        with override_settings(MENU_FRAGMENT_TIMEOUT=0):
+            self.benchmark("menu_page_uncached_fragments", lambda: self.client.get(url), 20)
+
+    def test_search(self):
+        self.assertTrue(search.ranked_item_ids("آیتمم"))
+        self.benchmark("search", lambda: search.ranked_item_ids("آیتم"), 200)
+        self.benchmark("search_fuzzy", lambda: search.ranked_item_ids("آیتمم"), 100)
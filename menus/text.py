@@ -0,0 +1,37 @@
+import re
+
+PERSIAN_DIGITS = "۰۱۲۳۴۵۶۷۸۹"
+ARABIC_DIGITS = "٠١٢٣٤٥٦٧٨٩"
+
+_TRANSLATION = str.maketrans(
+    {
+        "ي": "ی",
+        "ى": "ی",
+        "ك": "ک",
+        "ة": "ه",
+        "ۀ": "ه",
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ٱ": "ا",
+        "ؤ": "و",
+        "\u200c": " ",  # ZWNJ (half-space) is typed as a plain space just as often
+        "\u200d": None,
+        "ـ": None,  # tatweel
+        **{digit: str(value) for value, digit in enumerate(PERSIAN_DIGITS)},
+        **{digit: str(value) for value, digit in enumerate(ARABIC_DIGITS)},
+    }
+)
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(value):
+    if not value:
+        return ""
+    value = _DIACRITICS.sub("", value.translate(_TRANSLATION))
+    return _SPACES.sub(" ", value).strip().lower()
+
+
+def trigrams(value):
+    return {value[index:index + 3] for index in range(len(value) - 2)}
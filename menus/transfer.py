@@ -0,0 +1,276 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils.text import slugify
+
+from businesses.models import Business
+from businesses.slugs import assign_slugs
+from . import counters, featured, search
+from .forms import MenuItemForm
+from .models import MenuCategory, MenuItem
+from .signals import notify_menu_changed
+
+# One row per item; the category is referenced by title and created on demand.
+COLUMNS = [
+    "category",
+    "name",
+    "slug",
+    "description",
+    "price",
+    "discount_percent",
+    "special_price",
+    "badge",
+    "tags",
+    "ingredients",
+    "calories",
+    "is_active",
+    "is_featured",
+    "is_full_time",
+    "available_days",
+    "available_from",
+    "available_to",
+    "display_start",
+    "display_end",
+    "sort_order",
+]
+BOOLEAN_COLUMNS = {"is_active", "is_featured", "is_full_time"}
+FALSE_VALUES = {"", "0", "false", "no", "n", "off", "خیر"}
+FORMATS = ("csv", "json")
+CHUNK_SIZE = 500
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    categories: int = 0
+    featured: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, messages):
+        self.errors.append((line, messages))
+
+
+def read_csv(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    try:
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as error:
+        raise ImportFormatError(f"CSV نامعتبر در ردیف {reader.line_num}: {error}") from None
+
+
+def read_json(stream, buffer_size=64 * 1024):
+    # Accepts a top-level array or one object per line and decodes objects as
+    # they arrive, so the file is never held in memory as a whole.
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    decoder = json.JSONDecoder()
+    buffer, position, index, eof = "", 0, 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = text.read(buffer_size), 0
+            eof = not buffer
+            continue
+        try:
+            row, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ImportFormatError(f"JSON نامعتبر نزدیک ردیف {index + 1}") from None
+            chunk = text.read(buffer_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        index += 1
+        if not isinstance(row, dict):
+            raise ImportFormatError(f"ردیف {index} باید یک شیء JSON باشد.")
+        yield index, row
+        position = end
+
+
+def read_rows(stream, file_format):
+    if file_format not in FORMATS:
+        raise ImportFormatError(f"قالب {file_format} پشتیبانی نمی‌شود.")
+    return read_csv(stream) if file_format == "csv" else read_json(stream)
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def _form_data(row):
+    data = {name: _text(row.get(name)) for name in COLUMNS if name not in BOOLEAN_COLUMNS}
+    for name in BOOLEAN_COLUMNS:
+        value = row.get(name)
+        if value is None and name in ("is_active", "is_full_time"):
+            data[name] = True
+        else:
+            data[name] = value if isinstance(value, bool) else _text(value).lower() not in FALSE_VALUES
+    data["available_days_list"] = [day.strip() for day in data.pop("available_days").split(",") if day.strip()]
+    return data
+
+
+class RowValidator:
+    # The same MenuItemForm the dashboard uses, minus the category lookup.
+    def bound_form(self, data):
+        form = MenuItemForm(data=data, instance=MenuItem())
+        del form.fields["category"]
+        return form
+
+    def build_item(self, row):
+        data = _form_data(row)
+        form = self.bound_form(data)
+        errors = {}
+        if not data["category"]:
+            errors["category"] = ["دسته‌بندی الزامی است."]
+        sort_order = data["sort_order"] or "100"
+        if not sort_order.isdigit():
+            errors["sort_order"] = ["ترتیب باید عدد صحیح باشد."]
+        if not form.is_valid():
+            errors.update(form.errors)
+        if errors:
+            return None, errors
+        item = form.save(commit=False)
+        item.slug = slugify(data["slug"], allow_unicode=True)
+        item.sort_order = int(sort_order)
+        item.compile_schedule()
+        return (data["category"], item), None
+
+
+class MenuImporter:
+    def __init__(self, business, chunk_size=CHUNK_SIZE):
+        self.business = business
+        self.chunk_size = chunk_size
+        self.categories = dict(business.categories.values_list("title", "pk"))
+        self.next_order = (business.categories.aggregate(order=Max("order"))["order"] or 0) + 1
+        self.items = MenuItem.objects.filter(business=business)
+        self.validator = RowValidator()
+
+    def run(self, rows, dry_run=False):
+        report = ImportReport()
+        with transaction.atomic():
+            # Serializes imports into this business where the backend has row locks.
+            list(Business.objects.select_for_update().filter(pk=self.business.pk).values_list("pk"))
+            rows = iter(rows)
+            while chunk := list(islice(rows, self.chunk_size)):
+                self._import_chunk(chunk, report)
+            if dry_run:
+                transaction.set_rollback(True)
+        if report.created and not dry_run:
+            search.reindex_items("business", self.business.pk)
+            notify_menu_changed(MenuItem, self.business.slug)
+            if report.featured:
+                featured.schedule_refresh()
+        return report
+
+    def _import_chunk(self, chunk, report):
+        valid = []
+        for line, row in chunk:
+            report.rows += 1
+            built, errors = self.validator.build_item(row)
+            if errors:
+                report.add_error(line, [f"{name}: {' '.join(messages)}" for name, messages in errors.items()])
+            else:
+                valid.append(built)
+        report.categories += self._create_categories({title for title, _item in valid})
+        items = []
+        for title, item in valid:
+            item.category_id, item.business_id = self.categories[title], self.business.pk
+            items.append(item)
+        self._release_taken_slugs(items)
+        assign_slugs(items, self.items)
+        MenuItem.objects.bulk_create(items, batch_size=self.chunk_size)
+        counters.adjust(
+            Business.objects.filter(pk=self.business.pk),
+            items_count=len(items),
+            active_items_count=sum(item.is_active for item in items),
+            featured_items_count=sum(item.is_featured for item in items),
+        )
+        report.created += len(items)
+        report.featured += sum(item.is_active and item.is_featured for item in items)
+
+    def _create_categories(self, titles):
+        missing = sorted(titles - self.categories.keys())
+        if not missing:
+            return 0
+        categories = []
+        for title in missing:
+            categories.append(MenuCategory(business=self.business, title=title, order=self.next_order))
+            self.next_order += 1
+        assign_slugs(categories, self.business.categories.all())
+        for category in MenuCategory.objects.bulk_create(categories):
+            self.categories[category.title] = category.pk
+        counters.adjust(Business.objects.filter(pk=self.business.pk), categories_count=len(categories))
+        return len(categories)
+
+    def _release_taken_slugs(self, items):
+        # A slug from the file is kept only while nobody in the business has it.
+        wanted = [item.slug for item in items if item.slug]
+        taken = set(self.items.filter(slug__in=wanted).values_list("slug", flat=True)) if wanted else set()
+        for item in items:
+            if item.slug in taken:
+                item.slug = ""
+            elif item.slug:
+                taken.add(item.slug)
+
+
+def export_rows(business):
+    rows = (
+        MenuItem.objects.filter(category__business=business)
+        .order_by("category__order", "category__title", "category__pk", "sort_order", "name", "pk")
+        .values_list("category__title", *COLUMNS[1:])
+    )
+    for values in rows.iterator(chunk_size=1000):
+        yield dict(zip(COLUMNS, values))
+
+
+def _export_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    return value.isoformat()
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow([_export_value(row[name]) for name in COLUMNS])
+
+
+def export_json(rows):
+    separator = "[\n"
+    for row in rows:
+        data = {name: _json_value(value) for name, value in row.items() if value not in (None, "")}
+        yield separator + json.dumps(data, ensure_ascii=False)
+        separator = ",\n"
+    yield "[]\n" if separator == "[\n" else "\n]\n"
+
+
+def export_stream(business, file_format):
+    rows = export_rows(business)
+    return export_csv(rows) if file_format == "csv" else export_json(rows)
@@ -6,7 +6,11 @@ from .views import (
     ClearNotesView,
     HomeView,
     ItemDetailView,
+    MenuApiView,
+    MenuVersionView,
+    NoteBatchView,
     NoteListView,
+    NoteStateView,
     RemoveNoteView,
     SearchView,
 )
@@ -30,8 +34,12 @@ app_name = "menu"
 urlpatterns = [
     path("", HomeView.as_view(), name="home"),
     path("search/", SearchView.as_view(), name="search"),
+    path("api/v1/menus/<uslug:slug>/", MenuApiView.as_view(), name="api_menu"),
+    path("api/v1/menus/<uslug:slug>/version/", MenuVersionView.as_view(), name="api_menu_version"),
     path("notes/", NoteListView.as_view(), name="notes"),
     path("notes/clear/", ClearNotesView.as_view(), name="notes_clear"),
+    path("notes/state/", NoteStateView.as_view(), name="notes_state"),
+    path("notes/batch/", NoteBatchView.as_view(), name="notes_batch"),
     path("<uslug:business_slug>/note/<int:item_id>/add/", AddNoteView.as_view(), name="add_note"),
     path("<uslug:business_slug>/note/<int:item_id>/remove/", RemoveNoteView.as_view(), name="remove_note"),
     path("<uslug:business_slug>/item/<uslug:item_slug>/", ItemDetailView.as_view(), name="item_detail"),
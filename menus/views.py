@@ -1,113 +1,214 @@
 import json
-from collections import defaultdict
 
 from django.contrib import messages
-from django.db.models import Prefetch, Q
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition
 from django.views.generic import DetailView, TemplateView
 
-from businesses.models import Business, BusinessHour
-from .models import MenuCategory, MenuItem
-
-
+from businesses.models import Business
+from . import conditional, fragments
+from .assembly import assemble_menu, load_business, menu_items, search_menu_items
+from .analytics import record_view
+from .api import SCHEMA_VERSION, get_menu_probe
+from .cache import get_menu_snapshot
+from .featured import get_featured_feed
+from .models import MenuItem
+from .notes import (
+    NoteBatchError,
+    apply_operations,
+    delete_notes,
+    ensure_guest_token,
+    guest_note_entries,
+    guest_notes,
+    guest_token,
+    note_count,
+    parse_operations,
+    remember_guest,
+    save_note,
+)
+from .pagination import decode_cursor, encode_cursor, paginate_by_business, paginate_businesses, paginate_ranked
+from .search import item_search_filter, ranked_business_ids
+
+
+# Public pages are revalidated on every load and answered with 304 while the
+# menu version and the visitor's own notes are unchanged.
+revalidate = cache_control(private=True, no_cache=True)
+
+HOME_PAGE_KEY = "home_page:{version}"
+HOME_PAGE_TIMEOUT = 60 * 60
+
+# The public views are subclassed in menus/async_views.py for ASGI. Those load
+# their data asynchronously and pass it to get_context_data() through the
+# keyword arguments that default to None here.
+
+
+class CountViewMixin:
+    view_kind = "menu_views"
+    business_slug_kwarg = "slug"
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._acount_view(request, response, kwargs)
+        self._count_view(request, response, kwargs)
+        return response
+
+    async def _acount_view(self, request, response, kwargs):
+        response = await response
+        self._count_view(request, response, kwargs)
+        return response
+
+    def _count_view(self, request, response, kwargs):
+        # A 304 is still a visit; pages rendered for static publishing are not.
+        published = (self.extra_context or {}).get("published")
+        if request.method == "GET" and response.status_code in (200, 304) and not published:
+            record_view(kwargs[self.business_slug_kwarg], self.view_kind)
+
+
+@method_decorator(revalidate, name="get")
+@method_decorator(
+    condition(etag_func=conditional.home_etag, last_modified_func=conditional.home_last_modified), name="get"
+)
 class HomeView(TemplateView):
     template_name = "menus/home.html"
+    page_size = 12
 
-    def get_context_data(self, **kwargs):
+    def get_context_data(self, page=None, featured_items=None, **kwargs):
         context = super().get_context_data(**kwargs)
         query = self.request.GET.get("q", "").strip()
-        businesses = Business.objects.order_by("name")
-        if query:
-            businesses = businesses.filter(
-                Q(name__icontains=query)
-                | Q(tagline__icontains=query)
-                | Q(city__icontains=query)
-                | Q(description__icontains=query)
-            )
-        featured_items = (
-            MenuItem.objects.filter(is_active=True, is_featured=True)
-            .select_related("category", "category__business")
-            .order_by("-updated_at")[:6]
-        )
+        cursor = self.request.GET.get("cursor")
+        if page is None:
+            if query:
+                page = self._search(query, cursor)
+            elif cursor:
+                page = paginate_businesses(Business.objects.all(), decode_cursor(cursor), self.page_size)
+            else:
+                page = self._first_page()
+        if featured_items is None:
+            featured_items = get_featured_feed()
+        businesses, next_cursor = page
+        next_url = None
+        if next_cursor is not None:
+            params = self.request.GET.copy()
+            params["cursor"] = encode_cursor(next_cursor)
+            next_url = f"?{params.urlencode()}"
         context.update(
             {
                 "businesses": businesses,
                 "featured_items": featured_items,
                 "query": query,
+                "next_url": next_url,
             }
         )
         return context
 
+    def _first_page(self):
+        # The landing page itself is cached per site version; any business or
+        # menu change moves the version and so the key.
+        version = conditional.site_version(self.request)["etag"]
+        return cache.get_or_set(
+            HOME_PAGE_KEY.format(version=version),
+            lambda: paginate_businesses(Business.objects.all(), None, self.page_size),
+            HOME_PAGE_TIMEOUT,
+        )
 
-class BusinessDetailView(TemplateView):
+    def _search(self, query, cursor):
+        ranked_ids = ranked_business_ids(query)
+        if ranked_ids is not None:
+            cursor = decode_cursor(cursor, keys=("r",))
+            return paginate_ranked(Business.objects.all(), ranked_ids, cursor, self.page_size)
+        businesses = Business.objects.filter(
+            Q(name__icontains=query)
+            | Q(tagline__icontains=query)
+            | Q(city__icontains=query)
+            | Q(description__icontains=query)
+        )
+        return paginate_businesses(businesses, decode_cursor(cursor), self.page_size)
+
+
+@method_decorator(revalidate, name="get")
+@method_decorator(
+    condition(
+        etag_func=conditional.business_detail_etag,
+        last_modified_func=conditional.business_detail_last_modified,
+    ),
+    name="get",
+)
+class BusinessDetailView(CountViewMixin, TemplateView):
     template_name = "menus/business_detail.html"
 
-    def get_context_data(self, **kwargs):
+    def get_context_data(self, menu=None, notes=None, **kwargs):
         context = super().get_context_data(**kwargs)
         slug = kwargs.get("slug")
-        business = get_object_or_404(
-            Business.objects.prefetch_related(
-                Prefetch(
-                    "categories",
-                    queryset=MenuCategory.objects.filter(is_active=True).prefetch_related("items"),
-                ),
-                Prefetch(
-                    "hours",
-                    queryset=BusinessHour.objects.filter(is_visible=True),
-                ),
-            ),
-            slug=slug,
-        )
         query = self.request.GET.get("q", "").strip()
-        now = timezone.localtime()
+        if menu is None:
+            if query:
+                menu = self._search_menu(slug, query, timezone.localtime())
+            else:
+                snapshot = get_menu_snapshot(slug)
+                menu = snapshot["business"], snapshot["categories"]
+        if notes is None:
+            notes = guest_notes(self.request)
+        business, categories = menu
         categories_data = []
         total_items = 0
-        for category in business.categories.all():
-            items_qs = category.items.filter(is_active=True)
-            if query:
-                items_qs = items_qs.filter(
-                    Q(name__icontains=query)
-                    | Q(description__icontains=query)
-                    | Q(tags__icontains=query)
-                    | Q(badge__icontains=query)
-                )
-            visible_items = [item for item in items_qs if item.is_visible(now)]
-            total_items += len(visible_items)
+        for entry in categories:
+            total_items += len(entry["items"])
             categories_data.append(
                 {
-                    "category": category,
-                    "items": visible_items,
-                    "item_count": len(visible_items),
+                    "category": entry["category"],
+                    "items": entry["items"],
+                    "item_count": len(entry["items"]),
+                    "listed": fragments.listed(entry["items"]),
                 }
             )
-        notes = self.request.session.get("menu_notes", {})
-        note_map = {}
-        for key, value in notes.items():
-            try:
-                note_map[int(key)] = value
-            except (TypeError, ValueError):
-                continue
         context.update(
             {
                 "business": business,
                 "categories_data": categories_data,
                 "query": query,
                 "total_items": total_items,
+                "fragment_timeout": fragments.fragment_timeout(),
+                # Cached fragments are the same for everyone; notes.js marks
+                # this visitor's notes from here.
                 "notes": notes,
-                "note_map": note_map,
-                "note_count": len(note_map),
+                "note_state": {str(pk): note for pk, note in notes.items()},
+                "note_count": len(notes),
             }
         )
         return context
 
-
-class ItemDetailView(DetailView):
+    def _search_menu(self, slug, query, now):
+        business = load_business(slug)
+        if business is None:
+            raise Http404("No Business matches the given query.")
+        items = search_menu_items(menu_items(business).visible(now), query)
+        return business, assemble_menu(business, items)
+
+
+@method_decorator(revalidate, name="get")
+@method_decorator(
+    condition(
+        etag_func=conditional.item_detail_etag,
+        last_modified_func=conditional.item_detail_last_modified,
+    ),
+    name="get",
+)
+class ItemDetailView(CountViewMixin, DetailView):
     template_name = "menus/item_detail.html"
     context_object_name = "item"
+    slug_url_kwarg = "item_slug"
+    view_kind = "item_views"
+    business_slug_kwarg = "business_slug"
 
     def get_queryset(self):
         return MenuItem.objects.filter(
@@ -116,78 +217,126 @@ class ItemDetailView(DetailView):
             is_active=True,
         ).select_related("category", "category__business")
 
-    def get_context_data(self, **kwargs):
+    def get_context_data(self, related_items=None, notes=None, **kwargs):
         context = super().get_context_data(**kwargs)
         item = self.object
-        business = item.category.business
-        related_items = (
-            MenuItem.objects.filter(category=item.category, is_active=True)
-            .exclude(pk=item.pk)
-            .order_by("sort_order")[:4]
-        )
-        notes = self.request.session.get("menu_notes", {})
         context.update(
             {
-                "business": business,
-                "related_items": related_items,
-                "notes": notes,
+                "business": item.category.business,
+                "related_items": self.related_items() if related_items is None else related_items,
+                "notes": guest_notes(self.request) if notes is None else notes,
             }
         )
         return context
 
+    def related_items(self):
+        item = self.object
+        return (
+            MenuItem.objects.filter(category=item.category, is_active=True)
+            .exclude(pk=item.pk)
+            .order_by("sort_order")[:4]
+        )
+
 
 class SearchView(TemplateView):
     template_name = "menus/search_results.html"
+    page_size = 24
+    per_business = 6
 
-    def get_context_data(self, **kwargs):
+    def get_context_data(self, page=None, **kwargs):
         context = super().get_context_data(**kwargs)
         query = self.request.GET.get("q", "").strip()
         business_slug = self.request.GET.get("business")
-        items = MenuItem.objects.filter(is_active=True)
-        if business_slug:
-            items = items.filter(category__business__slug=business_slug)
-        if query:
-            items = items.filter(
-                Q(name__icontains=query)
-                | Q(description__icontains=query)
-                | Q(tags__icontains=query)
-                | Q(category__title__icontains=query)
-                | Q(category__business__name__icontains=query)
-            )
-        items = items.select_related("category", "category__business").order_by("category__business__name", "sort_order")
-        grouped = defaultdict(list)
-        for item in items:
-            if item.is_visible():
-                grouped[item.category.business].append(item)
-        grouped_list = sorted(grouped.items(), key=lambda entry: entry[0].name)
+        groups, next_cursor = self.search(query, business_slug) if page is None else page
+        next_url = None
+        if next_cursor is not None:
+            params = self.request.GET.copy()
+            params["cursor"] = encode_cursor(next_cursor)
+            next_url = f"?{params.urlencode()}"
         context.update(
             {
                 "query": query,
-                "grouped_results": grouped_list,
+                "grouped_results": [(group["business"], group["items"], group["has_more"]) for group in groups],
                 "business_filter": business_slug,
+                "next_url": next_url,
             }
         )
         return context
 
+    def search(self, query, business_slug):
+        items = MenuItem.objects.visible().select_related("category", "category__business")
+        if business_slug:
+            items = items.filter(category__business__slug=business_slug)
+        if query:
+            match = item_search_filter(query)
+            if match is None:
+                match = (
+                    Q(name__icontains=query)
+                    | Q(description__icontains=query)
+                    | Q(tags__icontains=query)
+                    | Q(category__title__icontains=query)
+                    | Q(category__business__name__icontains=query)
+                )
+            items = items.filter(match)
+        return paginate_by_business(
+            items,
+            decode_cursor(self.request.GET.get("cursor")),
+            page_size=self.page_size,
+            per_business=None if business_slug else self.per_business,
+        )
+
+
+# Menu API responses are identical for every client, so shared caches may keep
+# them as long as they revalidate with the strong ETag.
+api_revalidate = cache_control(public=True, no_cache=True)
+
+
+@method_decorator(api_revalidate, name="get")
+@method_decorator(
+    condition(etag_func=conditional.api_etag, last_modified_func=conditional.api_last_modified), name="get"
+)
+class MenuApiView(View):
+    def get(self, request, slug):
+        payload = conditional.api_payload(request, slug)
+        return HttpResponse(payload["body"], content_type="application/json; charset=utf-8")
+
+
+@method_decorator(api_revalidate, name="get")
+@method_decorator(condition(etag_func=conditional.api_version_etag), name="get")
+class MenuVersionView(View):
+    def get(self, request, slug):
+        probe = get_menu_probe(slug)
+        data = {"schema": SCHEMA_VERSION, "version": probe["etag"]}
+        if probe["expires_at"] is not None:
+            data["valid_until"] = probe["expires_at"].isoformat()
+        return JsonResponse(data)
+
 
 class NoteListView(TemplateView):
     template_name = "menus/notes.html"
 
-    def get_context_data(self, **kwargs):
+    def get_context_data(self, note_items=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        notes = self.request.session.get("menu_notes", {})
-        item_ids = [int(pk) for pk in notes.keys()]
-        items = MenuItem.objects.filter(pk__in=item_ids).select_related("category", "category__business")
-        items_map = {item.pk: item for item in items}
-        note_items = []
-        for pk, data in notes.items():
-            item = items_map.get(int(pk))
-            if item:
-                note_items.append({"item": item, "note": data.get("note"), "updated_at": data.get("updated_at")})
-        context.update({"note_items": note_items})
+        context.update({"note_items": guest_note_entries(self.request) if note_items is None else note_items})
         return context
 
 
+@method_decorator([never_cache, ensure_csrf_cookie], name="get")
+class NoteStateView(View):
+    # Published menus carry no per-visitor data; notes.js asks here instead.
+    def get(self, request):
+        return self._state(guest_notes(request))
+
+    @staticmethod
+    def _state(notes):
+        return JsonResponse(
+            {
+                "notes": {str(pk): note for pk, note in notes.items()},
+                "note_count": len(notes),
+            }
+        )
+
+
 class NoteAjaxMixin:
     @staticmethod
     def _is_ajax(request):
@@ -203,85 +352,113 @@ class NoteAjaxMixin:
             return payload
         return request.POST
 
+    @staticmethod
+    def _item_lookup(business_slug, item_id):
+        return MenuItem.objects.select_related("category__business").filter(
+            pk=item_id,
+            category__business__slug=business_slug,
+        )
+
+    def _get_item(self, business_slug, item_id):
+        return get_object_or_404(self._item_lookup(business_slug, item_id))
+
 
+# The note endpoints below read and write in post() and build their response
+# in a separate method, which the async views in menus/async_views.py share.
 class AddNoteView(NoteAjaxMixin, View):
     def post(self, request, business_slug, item_id):
-        business = get_object_or_404(Business, slug=business_slug)
-        item = get_object_or_404(MenuItem, pk=item_id, category__business=business)
-        data = self._get_data(request)
-        note_text = (data.get("note") or "").strip()
-        next_url = data.get("next") or item.get_absolute_url()
-        notes = request.session.get("menu_notes", {})
+        item = self._get_item(business_slug, item_id)
+        note_text, next_url = self._read(request, item)
+        token = ensure_guest_token(request)
 
-        key = str(item.pk)
         if note_text:
-            notes[key] = {
-                "note": note_text,
-                "updated_at": timezone.now().isoformat(),
-                "business": business.name,
-                "item_name": item.name,
-            }
-            message_text = "یادداشت ذخیره شد."
-            has_note = True
-            stored_note = note_text
+            save_note(token, item.pk, note_text)
         else:
-            if key in notes:
-                del notes[key]
-            message_text = "یادداشت حذف شد."
-            has_note = False
-            stored_note = ""
+            delete_notes(token, [item.pk])
+        return self._saved(request, note_text, next_url, note_count(token) if self._is_ajax(request) else None)
 
-        request.session["menu_notes"] = notes
-        note_count = len(notes)
+    def _read(self, request, item):
+        data = self._get_data(request)
+        return (data.get("note") or "").strip(), data.get("next") or item.get_absolute_url()
 
+    def _saved(self, request, note_text, next_url, count):
+        message_text = "یادداشت ذخیره شد." if note_text else "یادداشت حذف شد."
         if self._is_ajax(request):
-            return JsonResponse(
+            response = JsonResponse(
                 {
                     "success": True,
-                    "has_note": has_note,
-                    "note": stored_note,
-                    "note_count": note_count,
+                    "has_note": bool(note_text),
+                    "note": note_text,
+                    "note_count": count,
                     "message": message_text,
                 }
             )
-
-        messages.success(request, message_text)
-        return redirect(next_url)
+        else:
+            messages.success(request, message_text)
+            response = redirect(next_url)
+        return remember_guest(request, response)
 
 
 class RemoveNoteView(NoteAjaxMixin, View):
     def post(self, request, business_slug, item_id):
-        business = get_object_or_404(Business, slug=business_slug)
-        item = get_object_or_404(MenuItem, pk=item_id, category__business=business)
-        data = self._get_data(request)
-        next_url = data.get("next") or reverse("menu:notes")
-
-        notes = request.session.get("menu_notes", {})
-        key = str(item.pk)
-        removed = notes.pop(key, None)
-        request.session["menu_notes"] = notes
-        note_count = len(notes)
+        item = self._get_item(business_slug, item_id)
+        token = guest_token(request)
+        removed = delete_notes(token, [item.pk]) if token else 0
+        return self._removed(request, removed, note_count(token) if self._is_ajax(request) else None)
 
+    def _removed(self, request, removed, count):
         if self._is_ajax(request):
             return JsonResponse(
                 {
                     "success": True,
                     "has_note": False,
                     "note": "",
-                    "note_count": note_count,
+                    "note_count": count,
                     "message": "یادداشت حذف شد.",
                 }
             )
 
         if removed:
             messages.success(request, "یادداشت حذف شد.")
-        return redirect(next_url)
+        return redirect(self._get_data(request).get("next") or reverse("menu:notes"))
+
+
+class NoteBatchView(NoteAjaxMixin, View):
+    # notes.js collects edits for a moment and sends them here together.
+    def post(self, request):
+        try:
+            operations = parse_operations(self._get_data(request))
+        except NoteBatchError as error:
+            return self._rejected(error)
+        return self._applied(request, *apply_operations(request, operations))
+
+    @staticmethod
+    def _rejected(error):
+        return JsonResponse({"success": False, "message": str(error)}, status=400)
+
+    @staticmethod
+    def _applied(request, results, count):
+        failed = sum(not result["ok"] for result in results)
+        response = JsonResponse(
+            {
+                "success": not failed,
+                "results": results,
+                "note_count": count,
+                "message": "برخی یادداشت‌ها ذخیره نشدند." if failed else "یادداشت‌ها ذخیره شدند.",
+            }
+        )
+        return remember_guest(request, response)
 
 
 class ClearNotesView(View):
     def post(self, request):
-        if "menu_notes" in request.session:
-            del request.session["menu_notes"]
+        token = guest_token(request)
+        if token:
+            delete_notes(token)
+        return self._cleared(request)
+
+    @staticmethod
+    def _cleared(request):
         messages.success(request, "یادداشت‌ها پاک شدند.")
         next_url = request.POST.get("next") or reverse("menu:notes")
         return redirect(next_url)
@@ -1,16 +1,53 @@
 (function () {
     const buttons = document.querySelectorAll('.note-action');
-    if (!buttons.length) {
-        return;
-    }
-
     const fab = document.getElementById('notes-fab');
     const toast = document.getElementById('note-toast');
     const toastMessage = document.getElementById('toast-message');
-    const csrfToken = getCsrfToken();
+    const form = document.querySelector('.note-form-ajax');
+    const batch = document.querySelector('[data-notes-batch-url]');
+    let csrfToken = getCsrfToken();
+
+    // Edits are queued per item and sent together once typing pauses; the
+    // last edit of an item replaces any earlier one still in the queue.
+    const FLUSH_DELAY = 800;
+    const pending = new Map();
+    let flushTimer = null;
+
+    // Network errors and 5xx responses are retried with backoff; a rejected
+    // (4xx) batch is dropped.
+    const RETRY_DELAY = 2000;
+    const MAX_RETRY_DELAY = 60000;
+    let retries = 0;
+    let retryTimer = null;
+
+    // Published (static) menus are rendered without anyone's notes; fetch
+    // this visitor's notes and a CSRF cookie, then fill the page in.
+    const state = document.querySelector('[data-notes-state-url]');
+    if (state) {
+        hydrate(state.dataset.notesStateUrl);
+    }
+
+    // Live menus are built from cached fragments shared by every visitor and
+    // carry this visitor's notes alongside them.
+    const ownNotes = document.getElementById('guest-notes');
+    if (ownNotes) {
+        markNotes(JSON.parse(ownNotes.textContent));
+    }
+
+    if (!batch || (!buttons.length && !form)) {
+        return;
+    }
+
+    // Whatever is still queued goes out when the visitor leaves the page.
+    window.addEventListener('pagehide', () => flush({ keepalive: true }));
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            flush({ keepalive: true });
+        }
+    });
 
     buttons.forEach((button) => {
-        button.addEventListener('click', async () => {
+        button.addEventListener('click', () => {
             const hasNote = button.dataset.hasNote === 'true';
             const currentNote = button.dataset.note || '';
             const promptMessage = hasNote
@@ -22,41 +59,168 @@
                 return;
             }
 
-            // Show loading state
-            button.disabled = true;
-            button.textContent = '⏳ در حال ذخیره...';
-
-            try {
-                const response = await fetch(button.dataset.addUrl, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'X-Requested-With': 'XMLHttpRequest',
-                        'X-CSRFToken': csrfToken,
-                    },
-                    body: JSON.stringify({
-                        note: note,
-                        next: window.location.pathname,
-                    }),
-                });
-
-                if (!response.ok) {
-                    throw new Error('Network error');
-                }
-
-                const data = await response.json();
-                updateButtonState(button, data);
-                updateFab(data.note_count);
-                showToast(data.message, false);
-            } catch (error) {
-                showToast('خطا در ذخیره یادداشت', true);
-            } finally {
-                button.disabled = false;
-            }
+            const text = note.trim();
+            updateButtonState(button, { has_note: Boolean(text), note: text });
+            queue(button.dataset.item, text ? (hasNote ? 'update' : 'add') : 'remove', text);
         });
     });
 
+    if (form) {
+        const textarea = form.querySelector('textarea[name="note"]');
+        const submit = form.querySelector('button[type="submit"]');
+        const remove = form.querySelector('.note-remove-btn');
+
+        textarea.addEventListener('input', () => {
+            const text = textarea.value.trim();
+            queue(form.dataset.item, text ? 'update' : 'remove', text);
+        });
+
+        form.addEventListener('submit', async (event) => {
+            event.preventDefault();
+            const text = textarea.value.trim();
+            const originalText = submit.textContent;
+            queue(form.dataset.item, text ? 'update' : 'remove', text);
+            submit.disabled = true;
+            submit.textContent = '⏳ در حال ذخیره...';
+            const data = await flush();
+            submit.textContent = data?.success ? '✅ ذخیره شد!' : '❌ خطا';
+            window.setTimeout(() => {
+                submit.textContent = originalText;
+                submit.disabled = false;
+            }, 2000);
+        });
+
+        remove?.addEventListener('click', () => {
+            if (!window.confirm('آیا مطمئن هستید که می‌خواهید این یادداشت را حذف کنید؟')) {
+                return;
+            }
+            textarea.value = '';
+            queue(form.dataset.item, 'remove', '');
+            flush();
+        });
+    }
+
+    function queue(item, op, note) {
+        pending.set(String(item), { op: op, item: Number(item), note: note });
+        if (retryTimer) {
+            // Goes out with the retry that is already scheduled.
+            return;
+        }
+        window.clearTimeout(flushTimer);
+        flushTimer = window.setTimeout(flush, FLUSH_DELAY);
+    }
+
+    async function flush(options = {}) {
+        window.clearTimeout(flushTimer);
+        window.clearTimeout(retryTimer);
+        retryTimer = null;
+        if (!pending.size) {
+            return null;
+        }
+        const operations = Array.from(pending.values());
+        pending.clear();
+
+        let response;
+        try {
+            response = await fetch(batch.dataset.notesBatchUrl, {
+                method: 'POST',
+                credentials: 'same-origin',
+                keepalive: Boolean(options.keepalive),
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-Requested-With': 'XMLHttpRequest',
+                    'X-CSRFToken': csrfToken || getCsrfToken(),
+                },
+                body: JSON.stringify({ operations: operations }),
+            });
+        } catch (error) {
+            return retry(operations);
+        }
+
+        if (response.status >= 500) {
+            return retry(operations);
+        }
+        retries = 0;
+        const data = await response.json().catch(() => null);
+        if (!response.ok || !data) {
+            // The server refused the batch; sending it again would not help.
+            showToast(data?.message || 'خطا در ذخیره یادداشت', true);
+            return null;
+        }
+        applyResults(data);
+        return data;
+    }
+
+    function retry(operations) {
+        // Keep the edits for the next flush unless newer ones replaced them.
+        operations.forEach((operation) => {
+            const key = String(operation.item);
+            if (!pending.has(key)) {
+                pending.set(key, operation);
+            }
+        });
+        const delay = Math.min(RETRY_DELAY * 2 ** retries, MAX_RETRY_DELAY);
+        retries += 1;
+        window.clearTimeout(flushTimer);
+        retryTimer = window.setTimeout(flush, delay);
+        showToast('خطا در ذخیره یادداشت، دوباره تلاش می‌کنیم...', true);
+        return null;
+    }
+
+    function applyResults(data) {
+        const errors = [];
+        data.results.forEach((result) => {
+            if (!result.ok) {
+                errors.push(result.error);
+                return;
+            }
+            document.querySelectorAll(`.note-action[data-item="${result.item}"]`).forEach((button) => {
+                updateButtonState(button, result);
+            });
+            if (form && form.dataset.item === String(result.item)) {
+                form.querySelector('.note-remove-btn')?.classList.toggle('hidden', !result.has_note);
+            }
+        });
+        updateFab(data.note_count);
+        const details = [...new Set(errors)].join(' ');
+        showToast(details ? `${data.message} ${details}` : data.message, !data.success);
+    }
+
+    async function hydrate(url) {
+        try {
+            const response = await fetch(url, {
+                credentials: 'same-origin',
+                headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            });
+            if (!response.ok) {
+                return;
+            }
+            const data = await response.json();
+            csrfToken = getCsrfToken();
+            markNotes(data.notes);
+            const note = form ? data.notes[form.dataset.item] : null;
+            if (note) {
+                form.querySelector('textarea[name="note"]').value = note;
+                form.querySelector('.note-remove-btn')?.classList.remove('hidden');
+            }
+            updateFab(data.note_count);
+        } catch (error) {
+            // Notes are an enhancement; the menu itself is already on screen.
+        }
+    }
+
+    function markNotes(notes) {
+        buttons.forEach((button) => {
+            const note = notes[button.dataset.item];
+            updateButtonState(button, { has_note: Boolean(note), note: note || '' });
+        });
+    }
+
     function getCsrfToken() {
+        const field = document.querySelector('[name=csrfmiddlewaretoken]');
+        if (field) {
+            return field.value;
+        }
         const name = 'csrftoken=';
         const cookies = document.cookie.split(';');
         for (let cookie of cookies) {
@@ -88,7 +252,12 @@
             return;
         }
         
-        const badge = fab.querySelector('span.bg-red-500');
+        let badge = fab.querySelector('span.bg-red-500');
+        if (!badge && count > 0) {
+            badge = document.createElement('span');
+            badge.className = 'absolute -top-2 -right-2 bg-red-500 text-white text-xs font-bold rounded-full w-6 h-6 flex items-center justify-center';
+            fab.querySelector('.relative')?.appendChild(badge);
+        }
         if (badge) {
             badge.textContent = count;
         }